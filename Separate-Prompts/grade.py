@@ -0,0 +1,244 @@
+import os
+import json
+import datetime
+import argparse
+import threading
+
+from src.config_loader import load_config
+from src.results_store import ResultsStore
+from src.pipeline import build_pipeline
+from src.prompt_builder import build_grading_prefix, build_grading_prompt
+from src.output_processor import safe_json_parse
+from src.strategies import call_and_log
+from src.lazy_rubrics import has_thunk, materialize_rubric
+from src.token_budget import TokenBudget
+from src.progress import ProgressReporter, PROGRESS_DEFAULTS
+
+GRADING_DEFAULTS = {
+    "batch_size": 20,
+    "concurrency": 8,
+    "max_answer_chars": 4000,
+}
+
+_PREFIXES = {}
+_PREFIXES_LOCK = threading.Lock()
+_WRITE_LOCK = threading.Lock()
+
+
+def load_checkpoint(results_path):
+    """response_ids already graded in an earlier (possibly interrupted) run."""
+    done = set()
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                if row.get("level"):
+                    done.add(str(row["response_id"]))
+    return done
+
+
+def read_batches(responses_path, store, done, batch_size, max_answer_chars):
+    """
+    Reads the responses JSONL ({"response_id", "question_id", "answer", ...})
+    and groups the ungraded ones into batches of responses to the same question.
+    """
+    by_question, skipped = {}, 0
+    with open(responses_path) as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if "response_id" not in row or "question_id" not in row:
+                raise ValueError(f"{responses_path}:{line_no}: every response needs response_id and question_id")
+            if str(row["response_id"]) in done:
+                skipped += 1
+                continue
+            row["response_id"] = str(row["response_id"])
+            row["answer"] = str(row.get("answer") or "")[:max_answer_chars]
+            by_question.setdefault(int(row["question_id"]), []).append(row)
+
+    batches = []
+    for question_id, responses in by_question.items():
+        item = store.get_item(question_id)
+        if item is None:
+            print(f"Warning: question {question_id} is not in the question bank; "
+                  f"skipping {len(responses)} responses.")
+            continue
+        for start in range(0, len(responses), batch_size):
+            batches.append({"item": item, "responses": responses[start:start + batch_size]})
+    print(f"{sum(len(b['responses']) for b in batches)} responses to grade in {len(batches)} batches "
+          f"({skipped} already graded).")
+    return batches
+
+
+def grading_prefix(item, section_format):
+    """The static prompt prefix (instructions, reference answer, rubric) for a question, built once."""
+    with _PREFIXES_LOCK:
+        if item["id"] not in _PREFIXES:
+            payload = item["payload"]
+            rubric = payload.get("rubric") or {}
+            levels = [str(lvl.get("level", "")).strip() for lvl in rubric.get("levels", []) if isinstance(lvl, dict)]
+            _PREFIXES[item["id"]] = (
+                build_grading_prefix(item["question"], item["bloom_level"], payload.get("answer", ""),
+                                     rubric, section_format),
+                levels,
+            )
+        return _PREFIXES[item["id"]]
+
+
+def match_level(value, levels):
+    """Maps the model's level ("Competent" or "Competent Response") to a rubric level index (0 = best)."""
+    value = str(value or "").strip().lower()
+    for index, level in enumerate(levels):
+        if value == level.lower():
+            return index
+    for index, level in enumerate(levels):
+        if value and value.split()[0] == level.lower().split()[0]:
+            return index
+    return None
+
+
+def grade_responses(item, responses, ctx):
+    """One grading call for a batch. Returns {response_id: grade}; each grade names the model that gave it."""
+    if has_thunk(item):
+        # Lazy rubrics: written (once, then stored) the first time the question is graded
+        materialize_rubric(ctx["store"], item, ctx)
+        item = ctx["store"].get_item(item["id"])
+    prefix, levels = grading_prefix(item, ctx["config"].get('prompt_format'))
+    job = {
+        "params": {"subject": item["subject"], "topic": item["topic"], "subtopic": item["subtopic"],
+                   "bloom_level": item["bloom_level"], "num_questions": len(responses)},
+        "subject": item["subject"],
+        "log_file": ctx["log_file"],
+    }
+    response = call_and_log(build_grading_prompt(prefix, responses), job, ctx, "grade", item["bloom_level"])
+    try:
+        parsed = safe_json_parse(response['choices'][0]['message']['content'])
+    except ValueError as e:
+        print(f"Unparseable grades for question {item['id']} ({len(responses)} responses): {e}")
+        parsed = []
+    grades = parsed.get("grades", []) if isinstance(parsed, dict) else parsed
+
+    graded = {}
+    for grade in grades if isinstance(grades, list) else []:
+        if not isinstance(grade, dict):
+            continue
+        index = match_level(grade.get("level"), levels)
+        if index is None:
+            continue
+        graded[str(grade.get("response_id"))] = {
+            "level": levels[index],
+            "score": len(levels) - index,
+            "feedback": grade.get("feedback", ""),
+            "model": response["routed_model"],
+        }
+    return graded
+
+
+def grade_stage(batch, ctx):
+    """
+    Grades a batch; responses missing from the model's output are retried
+    once in a smaller call. If the call returned no grades at all (e.g.
+    malformed JSON), the batch is retried as two halves.
+    """
+    item, responses = batch["item"], batch["responses"]
+    graded = grade_responses(item, responses, ctx)
+    missing = [r for r in responses if r["response_id"] not in graded]
+    if len(missing) == len(responses) and len(missing) > 1:
+        retries = [missing[:len(missing) // 2], missing[len(missing) // 2:]]
+    else:
+        retries = [missing] if missing else []
+    for part in retries:
+        graded.update(grade_responses(item, part, ctx))
+
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    rows = []
+    for r in responses:
+        row = {key: value for key, value in r.items() if key != "answer"}
+        row["graded_at"] = now
+        if r["response_id"] in graded:
+            row.update(graded[r["response_id"]])
+        else:
+            row["error"] = "no valid grade returned"
+        rows.append(row)
+    yield {"rows": rows}
+
+
+def write_stage(batch, ctx):
+    """Appends a batch's grades to the results file; the file doubles as the checkpoint."""
+    with _WRITE_LOCK:
+        with open(ctx["results_path"], 'a') as f:
+            for row in batch["rows"]:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    yield batch
+
+
+GRADING_GRAPH = [
+    ("grade", grade_stage, GRADING_DEFAULTS["concurrency"]),
+    ("write", write_stage, 1),
+]
+
+
+def main():
+    config = load_config()
+    settings = dict(GRADING_DEFAULTS, **(config.get('grading') or {}))
+    parser = argparse.ArgumentParser(
+        description="Grade student responses (JSONL keyed by question-bank item ID) against the stored answers and rubrics."
+    )
+    parser.add_argument("responses", help='JSONL with one {"response_id", "question_id", "answer"} object per line.')
+    parser.add_argument("--out", help="Results JSONL (defaults to <responses>.grades.jsonl). Also the checkpoint.")
+    parser.add_argument("--batch-size", type=int, default=settings["batch_size"])
+    parser.add_argument("--concurrency", type=int, default=settings["concurrency"])
+    args = parser.parse_args()
+
+    results_path = args.out or os.path.splitext(args.responses)[0] + ".grades.jsonl"
+    out_dir = os.path.dirname(os.path.abspath(results_path))
+    config.setdefault('stage_concurrency', {})['grade'] = args.concurrency
+
+    with ResultsStore(config.get('results_db')) as store:
+        batches = read_batches(args.responses, store, load_checkpoint(results_path),
+                               args.batch_size, settings["max_answer_chars"])
+        if not batches:
+            print(f"Nothing to grade. Results are in {results_path}")
+            return
+
+        pipeline = build_pipeline(GRADING_GRAPH, config)
+        ctx = {
+            "config": config,
+            "store": store,
+            "results_path": results_path,
+            "log_file": os.path.join(out_dir, 'token_log.csv'),
+            "token_budget": TokenBudget(config.get('token_budget')),
+        }
+        progress_settings = dict(PROGRESS_DEFAULTS, **(config.get('progress') or {}))
+        if progress_settings['enabled']:
+            ctx["progress"] = ProgressReporter(
+                [name for name, _, _ in GRADING_GRAPH],
+                status_file=os.path.join(out_dir, 'grading_progress.json'),
+                expected_items=len(batches),
+                prices=config.get('prices'),
+                interval_sec=progress_settings['interval_sec'],
+                window=progress_settings['window'],
+            )
+            pipeline.add_listener(ctx["progress"])
+            ctx["progress"].start()
+
+        try:
+            results = pipeline.run(batches, ctx)
+        finally:
+            if "progress" in ctx:
+                ctx["progress"].stop()
+
+    rows = [row for batch in results for row in batch["rows"]]
+    failed = sum(1 for row in rows if "error" in row)
+    pipeline.print_summary()
+    print(f"Graded {len(rows) - failed} responses ({failed} without a valid grade). Results: {results_path}")
+
+
+if __name__ == "__main__":
+    main()
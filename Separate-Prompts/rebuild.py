@@ -0,0 +1,98 @@
+import os
+import json
+import argparse
+from collections import Counter
+
+from src.config_loader import load_config
+from src.results_store import ResultsStore
+from src.pipeline import build_pipeline
+from src.strategies import REBUILD_GRAPH, load_stage, retrieve_stage, plan_rebuild, prepare_job
+from src.token_budget import TokenBudget
+from src.question_filter import report_rejections
+
+
+def select_runs(store, args):
+    if args.run_id:
+        run = store.get_run(args.run_id)
+        if not run:
+            raise ValueError(f"Run '{args.run_id}' is not in the question bank.")
+        return [run]
+    runs = store.latest_runs(strategy="separate-prompts", subject=args.subject)
+    if args.output_folder:
+        runs = [run for run in runs if run["output_folder"] == args.output_folder]
+    return runs
+
+
+def current_job(run):
+    """A job with the current data files loaded, for the run's parameters."""
+    params = json.loads(run["params_json"] or "{}")
+    job = {"params": params, "subject": run["subject"]}
+    for stage in (load_stage, retrieve_stage):
+        job = next(stage(job, None))
+    return job
+
+
+def print_plan(run, plan):
+    print(f"\n{run['output_folder']} (run {run['run_id']}):")
+    print(f"  {len(plan['unchanged'])} unchanged, skipped")
+    if plan["untracked"]:
+        print(f"  {len(plan['untracked'])} without recorded inputs (generated before input tracking), skipped")
+    for action, label in (("answers", "answers/rubrics"), ("questions", "questions with answers/rubrics")):
+        if plan[action]:
+            changed = Counter(name for _, names in plan[action] for name in names)
+            print(f"  {len(plan[action])} {label} to regenerate; changed: "
+                  + ", ".join(f"{name} ({count})" for name, count in changed.most_common()))
+
+
+def rebuild_run(run, config, store):
+    """Runs the rebuild graph for one earlier run; returns the new run ID."""
+    job = prepare_job(json.loads(run["params_json"]), config, store, "separate-prompts",
+                      output_folder=run["output_folder"])
+    job["rebuild_from"] = run["run_id"]
+    pipeline = build_pipeline(REBUILD_GRAPH, config)
+    ctx = {"config": config, "store": store, "token_budget": TokenBudget(config.get('token_budget'))}
+    results = pipeline.run([job], ctx)
+    pipeline.print_summary()
+    report_rejections(job)
+
+    output_file = os.path.join(job['output_folder_path'], 'output.json')
+    store.export_output_json(job['run_id'], output_file)
+    print(f"Rebuilt {run['output_folder']} as run {job['run_id']} ({len(results)} Q&As); saved to {output_file}")
+    return job['run_id']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regenerate only the Q&As whose inputs (data files, templates, models) changed."
+    )
+    parser.add_argument("--output-folder", help="Rebuild this output folder only (default: every folder).")
+    parser.add_argument("--subject", help="Rebuild this subject only.")
+    parser.add_argument("--run-id", help="Rebuild this run instead of each folder's latest run.")
+    parser.add_argument("--apply", action="store_true", help="Regenerate (default: only report what would change).")
+    args = parser.parse_args()
+
+    config = load_config()
+    with ResultsStore(config.get('results_db')) as store:
+        runs = select_runs(store, args)
+        if not runs:
+            print("No Separate-Prompts runs to rebuild.")
+            return
+
+        stale = []
+        for run in runs:
+            plan = plan_rebuild(current_job(run), config, store, store.query(run_id=run["run_id"]))
+            print_plan(run, plan)
+            if plan["answers"] or plan["questions"]:
+                stale.append(run)
+
+        print(f"\n{len(stale)} of {len(runs)} runs need a rebuild.")
+        if not args.apply:
+            if stale:
+                print("Run again with --apply to regenerate them.")
+        else:
+            for run in stale:
+                rebuild_run(run, config, store)
+
+
+if __name__ == "__main__":
+    main()
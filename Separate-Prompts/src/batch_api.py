@@ -0,0 +1,412 @@
+# Batch mode for sweeps: provider batch APIs (OpenAI Batch, Anthropic Message Batches) and a local file-based stand-in
+
+import os
+import json
+import time
+import hashlib
+import datetime
+import argparse
+import threading
+
+from .config_loader import load_config
+from .llm_api_client import (
+    DEFAULT_MAX_TOKENS, call_llm_api, normalize_finish_reason, usage_record
+)
+
+BATCH_DEFAULTS = {
+    "backend": "auto",          # "auto" (by provider), "openai", "anthropic" or "local"
+    "poll_min_sec": 30,
+    "poll_max_sec": 600,
+    "backoff": 1.5,
+    "max_requests": 10000,      # per submitted batch
+    "max_rounds": 10,
+    "completion_window": "24h",
+}
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+# Provider batch states after which no more results will arrive
+_ENDED = {"completed", "failed", "expired", "cancelled", "ended"}
+
+
+class BatchPending(Exception):
+    """A call was queued for the next batch; the job is replayed once its results are downloaded."""
+
+
+def request_id(job_id, stage, model, prompt):
+    """custom_id of a request: the sweep job ID, the stage and a hash of model + prompt (at most 64 chars)."""
+    digest = hashlib.sha1(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:20]
+    return f"j{job_id}-{stage}-{digest}"[:64]
+
+
+# =========================
+# Request and result formats
+# =========================
+def openai_request_line(custom_id, model, prompt, max_tokens):
+    """One line of an OpenAI Batch input file, with the same body as call_openai_api."""
+    body = {"model": model, "messages": [{"role": "system", "content": SYSTEM_PROMPT},
+                                         {"role": "user", "content": prompt}]}
+    if any(m in model.lower() for m in ["gpt-4o", "gpt-5"]):
+        body["max_completion_tokens"] = max_tokens or DEFAULT_MAX_TOKENS
+    else:
+        body["max_tokens"] = max_tokens or DEFAULT_MAX_TOKENS
+    return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+
+def anthropic_request_line(custom_id, model, prompt, max_tokens):
+    """One Message Batches request, with the same parameters as call_claude_api."""
+    return {"custom_id": custom_id, "params": {
+        "model": model, "max_tokens": max_tokens or DEFAULT_MAX_TOKENS, "temperature": 0.7,
+        "system": SYSTEM_PROMPT, "messages": [{"role": "user", "content": prompt}],
+    }}
+
+
+def parse_openai_result(line):
+    """
+    Converts an OpenAI Batch output line to (custom_id, response, tokens, error)
+    with response shaped like call_llm_api's. Batch results carry no latency.
+    """
+    body = ((line.get("response") or {}).get("body")) or {}
+    error = line.get("error") or body.get("error")
+    if error or not body.get("choices"):
+        message = error.get("message") if isinstance(error, dict) else error
+        return line.get("custom_id"), None, None, str(message or "no choices")
+    usage = body.get("usage") or {}
+    tokens = (usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), usage.get("total_tokens", 0))
+    choice = body["choices"][0]
+    response = {
+        "choices": [{"message": {"content": choice["message"]["content"]}}],
+        "finish_reason": normalize_finish_reason(choice.get("finish_reason")),
+        "usage": usage_record(*tokens, 0.0,
+                              cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+                              reasoning_tokens=(usage.get("completion_tokens_details") or {}).get("reasoning_tokens")),
+    }
+    return line.get("custom_id"), response, tokens, None
+
+
+# =========================
+# Backends
+# =========================
+class OpenAIBatchBackend:
+    name = "openai"
+    format_line = staticmethod(openai_request_line)
+
+    def __init__(self, config, settings):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=config["api_key"])
+        self.settings = settings
+
+    def submit(self, input_path, lines):
+        with open(input_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions",
+                                           completion_window=self.settings["completion_window"])
+        return batch.id
+
+    def poll(self, batch_id):
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for raw in self.client.files.content(file_id).text.splitlines():
+                    if raw.strip():
+                        yield parse_openai_result(json.loads(raw))
+
+
+class AnthropicBatchBackend:
+    name = "anthropic"
+    format_line = staticmethod(anthropic_request_line)
+
+    def __init__(self, config, settings):
+        import anthropic
+        self.client = anthropic.Anthropic(api_key=config["api_key"])
+
+    def submit(self, input_path, lines):
+        return self.client.messages.batches.create(requests=lines).id
+
+    def poll(self, batch_id):
+        return self.client.messages.batches.retrieve(batch_id).processing_status
+
+    def results(self, batch_id):
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None)
+                yield entry.custom_id, None, None, f"{result.type}: {getattr(error, 'error', error) or ''}".strip(": ")
+                continue
+            message = result.message
+            usage = message.usage
+            cached = getattr(usage, "cache_read_input_tokens", None)
+            prompt_tokens = usage.input_tokens + (cached or 0) + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+            tokens = (prompt_tokens, usage.output_tokens, prompt_tokens + usage.output_tokens)
+            response = {
+                "choices": [{"message": {"content": message.content[0].text if message.content else ""}}],
+                "finish_reason": normalize_finish_reason(message.stop_reason),
+                "usage": usage_record(*tokens, 0.0, cached_tokens=cached),
+            }
+            yield entry.custom_id, response, tokens, None
+
+
+class LocalBatchBackend:
+    """
+    Stand-in for a provider batch API: a batch is a folder under local_dir
+    holding an OpenAI-format input.jsonl and a status.json. serve() (another
+    process, or a thread) answers it into output.jsonl.
+    """
+    name = "local"
+    format_line = staticmethod(openai_request_line)
+
+    def __init__(self, config, settings):
+        self.local_dir = settings["local_dir"]
+
+    def submit(self, input_path, lines):
+        batch_id = f"local-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.urandom(3).hex()}"
+        folder = os.path.join(self.local_dir, batch_id)
+        os.makedirs(folder)
+        with open(os.path.join(folder, "input.jsonl"), "w") as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        write_json_atomic(os.path.join(folder, "status.json"), {"status": "validating"})
+        return batch_id
+
+    def poll(self, batch_id):
+        with open(os.path.join(self.local_dir, batch_id, "status.json")) as f:
+            return json.load(f)["status"]
+
+    def results(self, batch_id):
+        path = os.path.join(self.local_dir, batch_id, "output.jsonl")
+        if os.path.exists(path):
+            with open(path) as f:
+                for raw in f:
+                    if raw.strip():
+                        yield parse_openai_result(json.loads(raw))
+
+
+BACKENDS = {"openai": OpenAIBatchBackend, "anthropic": AnthropicBatchBackend, "local": LocalBatchBackend}
+PROVIDER_BACKENDS = {"openai": "openai", "claude": "anthropic"}
+
+
+def backend_name(provider, settings):
+    if settings["backend"] != "auto":
+        return settings["backend"]
+    if provider not in PROVIDER_BACKENDS:
+        raise ValueError(f"No batch API for provider '{provider}'. Use OpenAI or Claude models, "
+                         f"or the \"local\" batch backend.")
+    return PROVIDER_BACKENDS[provider]
+
+
+def write_json_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+# =========================
+# Sweep-side state
+# =========================
+class BatchState:
+    """
+    A sweep's batch bookkeeping in batch_dir: the submitted batches
+    (batches.json), the downloaded results keyed by custom_id (results.jsonl)
+    and the request files. Survives restarts, so a stopped run resumes polling.
+    """
+
+    def __init__(self, batch_dir, settings=None):
+        self.batch_dir = batch_dir
+        self.settings = dict(BATCH_DEFAULTS, **(settings or {}))
+        self.settings.setdefault("local_dir", os.path.join(batch_dir, "local_server"))
+        os.makedirs(batch_dir, exist_ok=True)
+        self.batches_path = os.path.join(batch_dir, "batches.json")
+        self.results_path = os.path.join(batch_dir, "results.jsonl")
+        self.batches = []
+        self.results = {}
+        self.consumed = set()
+        self.pending = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.batches_path):
+            with open(self.batches_path) as f:
+                self.batches = json.load(f)
+        if os.path.exists(self.results_path):
+            with open(self.results_path) as f:
+                for raw in f:
+                    try:
+                        row = json.loads(raw)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    self.results[row["custom_id"]] = row
+        self.in_flight_ids = {cid for b in self.in_flight() for cid in b["custom_ids"]}
+
+    def in_flight(self):
+        return [b for b in self.batches if b["status"] not in _ENDED]
+
+    def for_job(self, job_id):
+        return JobBatch(self, job_id)
+
+    def client(self, backend, model):
+        # The local stand-in needs no API key
+        config = load_config(model) if backend != "local" else None
+        return BACKENDS[backend](config, self.settings)
+
+    def _save_batches(self):
+        write_json_atomic(self.batches_path, self.batches)
+        with self._lock:
+            self.in_flight_ids = {cid for b in self.in_flight() for cid in b["custom_ids"]}
+
+    def submit_pending(self):
+        """Writes the queued requests into batch files, one per backend and model, and submits them."""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        groups = {}
+        for cid, request in pending.items():
+            key = (backend_name(request["provider"], self.settings), request["model"])
+            groups.setdefault(key, []).append((cid, request))
+
+        for (backend, model), requests in groups.items():
+            client = self.client(backend, model)
+            for start in range(0, len(requests), self.settings["max_requests"]):
+                chunk = requests[start:start + self.settings["max_requests"]]
+                lines = [client.format_line(cid, r["model"], r["prompt"], r["max_tokens"]) for cid, r in chunk]
+                input_path = os.path.join(self.batch_dir, f"{len(self.batches) + 1:04d}-{backend}-{model.split('/')[-1]}.jsonl")
+                with open(input_path, "w") as f:
+                    for line in lines:
+                        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                batch_id = client.submit(input_path, lines)
+                self.batches.append({
+                    "id": batch_id, "backend": backend, "model": model, "status": "submitted",
+                    "input_file": os.path.basename(input_path), "custom_ids": [cid for cid, _ in chunk],
+                    "submitted_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                })
+                self._save_batches()
+                print(f"Submitted batch {batch_id} ({backend}, {model}): {len(chunk)} requests")
+
+    def download(self, batch, client):
+        """Appends a finished batch's results to results.jsonl. Returns the number of results."""
+        count = 0
+        with open(self.results_path, "a") as f:
+            for cid, response, tokens, error in client.results(batch["id"]):
+                row = {"custom_id": cid, "response": response, "tokens": tokens, "error": error}
+                self.results[cid] = row
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        missing = len(set(batch["custom_ids"]) - self.results.keys())
+        print(f"Batch {batch['id']} {batch['status']}: {count} results"
+              + (f", {missing} missing (requeued on replay)" if missing else ""))
+        return count
+
+    def wait(self, tick=None, tick_sec=60):
+        """
+        Polls the in-flight batches with exponential backoff until at least one
+        has ended, then downloads its results. tick() is called at least every
+        tick_sec while waiting (e.g. to renew work-queue leases).
+        """
+        delay = self.settings["poll_min_sec"]
+        while True:
+            ended = 0
+            for batch in self.in_flight():
+                client = self.client(batch["backend"], batch["model"])
+                batch["status"] = client.poll(batch["id"])
+                if batch["status"] in _ENDED:
+                    self.download(batch, client)
+                    ended += 1
+            self._save_batches()
+            if ended or not self.in_flight():
+                return ended
+            print(f"{len(self.in_flight())} batches in flight; next poll in {delay:.0f}s")
+            deadline = time.time() + delay
+            while time.time() < deadline:
+                if tick:
+                    tick()
+                time.sleep(max(0.0, min(tick_sec, deadline - time.time())))
+            delay = min(delay * self.settings["backoff"], self.settings["poll_max_sec"])
+
+
+class JobBatch:
+    """
+    ctx["batch"] for one replay of a sweep job. call() answers from downloaded
+    results, or queues the request and raises BatchPending. deferred counts
+    the requests this replay could not answer.
+    """
+
+    def __init__(self, state, job_id):
+        self.state = state
+        self.job_id = job_id
+        self.deferred = 0
+
+    def call(self, prompt, config, stage, max_tokens=None):
+        """Returns (response, tokens, duration, first) where first is True the first time a result is used."""
+        cid = request_id(self.job_id, stage, config["model"], prompt)
+        state = self.state
+        with state._lock:
+            row = state.results.get(cid)
+            if row is None:
+                if cid not in state.in_flight_ids:
+                    state.pending[cid] = {"model": config["model"], "provider": config["provider"],
+                                          "prompt": prompt, "max_tokens": max_tokens}
+                self.deferred += 1
+                raise BatchPending(f"queued for batch ({cid})")
+            first = cid not in state.consumed
+            state.consumed.add(cid)
+        if row["error"]:
+            raise RuntimeError(f"Batch request {cid} failed: {row['error']}")
+        # A fresh copy: stages add their own keys to the response
+        return json.loads(json.dumps(row["response"])), tuple(row["tokens"]), 0.0, first
+
+
+# =========================
+# Local stand-in server
+# =========================
+def answer_local_batch(folder, model=None):
+    """Answers one local batch with call_llm_api (use a llama model to stay offline)."""
+    write_json_atomic(os.path.join(folder, "status.json"), {"status": "in_progress"})
+    with open(os.path.join(folder, "input.jsonl")) as f:
+        requests = [json.loads(raw) for raw in f if raw.strip()]
+    with open(os.path.join(folder, "output.jsonl"), "w") as out:
+        for request in requests:
+            body = request["body"]
+            try:
+                config = load_config(model or body["model"])
+                limit = body.get("max_completion_tokens") or body.get("max_tokens")
+                response, tokens, _ = call_llm_api(body["messages"][-1]["content"], config, {}, max_tokens=limit)
+                usage = response.get("usage") or {}
+                line = {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": {
+                    "choices": [{"message": {"content": response["choices"][0]["message"]["content"]},
+                                 "finish_reason": response.get("finish_reason")}],
+                    "usage": {"prompt_tokens": tokens[0], "completion_tokens": tokens[1], "total_tokens": tokens[2],
+                              "prompt_tokens_details": {"cached_tokens": usage.get("cached_tokens")},
+                              "completion_tokens_details": {"reasoning_tokens": usage.get("reasoning_tokens")}},
+                }}}
+            except Exception as e:
+                line = {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+            out.write(json.dumps(line, ensure_ascii=False) + "\n")
+    write_json_atomic(os.path.join(folder, "status.json"), {"status": "completed"})
+
+
+def serve(local_dir, model=None, stop=None, poll_sec=2.0, once=False):
+    """Answers submitted local batches in order until stop is set (or, with once, until none are waiting)."""
+    os.makedirs(local_dir, exist_ok=True)
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        waiting = []
+        for name in sorted(os.listdir(local_dir)):
+            status_path = os.path.join(local_dir, name, "status.json")
+            if os.path.exists(status_path):
+                with open(status_path) as f:
+                    if json.load(f)["status"] == "validating":
+                        waiting.append(name)
+        for name in waiting:
+            print(f"Local batch server: answering {name}")
+            answer_local_batch(os.path.join(local_dir, name), model)
+        if once and not waiting:
+            return
+        stop.wait(poll_sec)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for a provider batch API.")
+    parser.add_argument("local_dir", help="Folder the sweep submits local batches to (data/sweeps/<sweep>/batches/local_server).")
+    parser.add_argument("--model", help="Answer every request with this model (e.g. a local llama model) instead of the requested one.")
+    parser.add_argument("--once", action="store_true", help="Answer the waiting batches and exit.")
+    args = parser.parse_args()
+    serve(args.local_dir, args.model, once=args.once)
@@ -0,0 +1,399 @@
+# Builds a subject's book.json (and a passage-chunked index) from plain-text/Markdown chapters
+
+import os
+import re
+import csv
+import json
+import math
+import hashlib
+import argparse
+import tempfile
+import unicodedata
+from difflib import SequenceMatcher
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .data_loader import DATA_DIR
+
+STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "are", "was", "were", "its",
+    "their", "into", "between", "using", "use", "role", "ref", "range", "relate",
+    "investigate", "factors", "affecting", "structure", "function", "functions",
+}
+
+HEADING_RE = re.compile(r'^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"(])')
+WORD_RE = re.compile(r"[a-z][a-z0-9'-]+")
+ALIGN_WORD_RE = re.compile(r"\w+")
+
+# Subtopic index shared with worker processes (set once per process by _init_worker)
+_SUBTOPIC_INDEX = None
+
+
+def load_mapping(mapping_path):
+    """
+    Reads a mapping CSV with columns cur_topic, cur_subtopic and returns
+    an ordered list of (topic, subtopic) pairs.
+    """
+    pairs = []
+    with open(mapping_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            topic = (row.get('cur_topic') or '').strip()
+            subtopic = (row.get('cur_subtopic') or '').strip()
+            if topic and subtopic:
+                pairs.append((topic, subtopic))
+    return pairs
+
+
+def tokenize(text):
+    return [w for w in WORD_RE.findall(text.lower()) if len(w) > 2 and w not in STOPWORDS]
+
+
+def normalize_text(text):
+    """
+    Normalizes a raw paragraph: Unicode NFKC, soft hyphens, line-break
+    hyphenation, Markdown emphasis/links and runs of whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text).replace("\u00ad", "")
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+    text = re.sub(r'!?\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'(\*\*|__|\*|`)', '', text)
+    text = re.sub(r'^\s*(?:[-+*]|\d+\.)\s+', '', text, flags=re.MULTILINE)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def segment_text(text, max_chars):
+    """
+    Splits a normalized paragraph into passages of at most max_chars,
+    breaking on sentence boundaries where possible.
+    """
+    if len(text) <= max_chars:
+        return [text] if text else []
+    segments, current = [], ""
+    for sentence in SENTENCE_SPLIT_RE.split(text):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+def segment_spans(raw, segments):
+    """
+    (start, end) character span within the raw paragraph of each segment of
+    its normalized text. Normalization can join, drop or change words, so
+    the segments' words are aligned with the raw words rather than searched
+    for; a segment with no aligned word gets the span left after the
+    previous one.
+    """
+    raw_words = list(ALIGN_WORD_RE.finditer(raw))
+    raw_tokens = [unicodedata.normalize("NFKC", m.group()).lower() for m in raw_words]
+    seg_tokens, owner = [], []
+    for i, segment in enumerate(segments):
+        words = [w.lower() for w in ALIGN_WORD_RE.findall(segment)]
+        seg_tokens.extend(words)
+        owner.extend([i] * len(words))
+
+    aligned = [[] for _ in segments]
+    matcher = SequenceMatcher(None, seg_tokens, raw_tokens, autojunk=False)
+    for a, b, size in matcher.get_matching_blocks():
+        for k in range(size):
+            aligned[owner[a + k]].append(b + k)
+
+    spans, floor = [], 0
+    for i, indices in enumerate(aligned):
+        if not indices:
+            spans.append((floor, len(raw) if i == len(segments) - 1 else floor))
+            continue
+        start, end = raw_words[min(indices)].start(), raw_words[max(indices)].end()
+        # Take in punctuation and markup touching the first and last words
+        while start > floor and not raw[start - 1].isspace():
+            start -= 1
+        while end < len(raw) and not raw[end].isspace():
+            end += 1
+        spans.append((start, end))
+        floor = end
+    return spans
+
+
+def build_subtopic_index(mapping):
+    """
+    Precomputes IDF-weighted keyword sets for every subtopic in the mapping.
+    Subtopic-name words weigh twice as much as topic-name words.
+    """
+    docs = []
+    for topic, subtopic in mapping:
+        weights = Counter()
+        for w in tokenize(subtopic):
+            weights[w] += 2.0
+        for w in tokenize(topic):
+            weights[w] += 1.0
+        docs.append(weights)
+
+    df = Counter(w for weights in docs for w in weights)
+    n = len(docs)
+    index = []
+    for (topic, subtopic), weights in zip(mapping, docs):
+        idf_weights = {w: wt * math.log(1 + n / df[w]) for w, wt in weights.items()}
+        norm = sum(idf_weights.values()) or 1.0
+        index.append({
+            "topic": topic,
+            "subtopic": subtopic,
+            "weights": idf_weights,
+            "norm": norm,
+            "name_tokens": set(tokenize(subtopic)),
+        })
+    return index
+
+
+def _init_worker(mapping):
+    global _SUBTOPIC_INDEX
+    _SUBTOPIC_INDEX = build_subtopic_index(mapping)
+
+
+def _match_heading(heading):
+    """Returns the index of the subtopic a heading names, or None."""
+    tokens = set(tokenize(heading))
+    if not tokens:
+        return None
+    best, best_score = None, 0.0
+    for i, entry in enumerate(_SUBTOPIC_INDEX):
+        names = entry["name_tokens"]
+        if not names:
+            continue
+        score = len(tokens & names) / len(tokens | names)
+        if score > best_score:
+            best, best_score = i, score
+    return best if best_score >= 0.5 else None
+
+
+def _assign_passage(text):
+    """Scores a passage against every subtopic; returns (index, score)."""
+    counts = Counter(tokenize(text))
+    best, best_score = None, 0.0
+    for i, entry in enumerate(_SUBTOPIC_INDEX):
+        score = sum(wt for w, wt in entry["weights"].items() if w in counts) / entry["norm"]
+        if score > best_score:
+            best, best_score = i, score
+    return best, best_score
+
+
+def process_batch(batch, max_chars):
+    """
+    Worker entry point: normalizes, segments and assigns a batch of raw
+    paragraphs. Each input is (source, start, end, heading, raw_text);
+    each passage gets its own span within the source file.
+    """
+    results = []
+    for source, start, _, heading, raw in batch:
+        heading_match = _match_heading(heading) if heading else None
+        segments = segment_text(normalize_text(raw), max_chars)
+        for segment, (seg_start, seg_end) in zip(segments, segment_spans(raw, segments)):
+            index, score = _assign_passage(segment)
+            results.append({
+                "source": source,
+                "source_start": start + seg_start,
+                "source_end": start + seg_end,
+                "heading": heading,
+                "heading_match": heading_match,
+                "match": index,
+                "score": round(score, 4),
+                "text": segment,
+            })
+    return results
+
+
+def iter_paragraphs(chapters_dir):
+    """
+    Streams (source, start, end, heading, raw_text) paragraphs from every
+    .txt/.md file in chapters_dir, in filename order. Offsets are character
+    offsets within the source file; only one paragraph is held at a time.
+    """
+    files = sorted(f for f in os.listdir(chapters_dir) if f.lower().endswith(('.txt', '.md', '.markdown')))
+    for filename in files:
+        path = os.path.join(chapters_dir, filename)
+        heading = os.path.splitext(filename)[0]
+        buffer, start, pos = [], None, 0
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                heading_match = HEADING_RE.match(line)
+                if heading_match or not line.strip():
+                    if buffer:
+                        yield filename, start, pos, heading, "".join(buffer)
+                        buffer, start = [], None
+                    if heading_match:
+                        heading = heading_match.group(1)
+                else:
+                    if start is None:
+                        start = pos
+                    buffer.append(line)
+                pos += len(line)
+        if buffer:
+            yield filename, start, pos, heading, "".join(buffer)
+
+
+def iter_batches(paragraphs, batch_size):
+    batch = []
+    for paragraph in paragraphs:
+        batch.append(paragraph)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def passage_id(source, text):
+    """Stable passage ID: source file stem + content hash of the normalized text."""
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+    return f"{os.path.splitext(source)[0]}:{digest}"
+
+
+def ingest(chapters_dir, mapping_path, out_dir, workers=None, batch_size=64,
+           max_chars=1200, min_score=0.15, max_open_spools=128):
+    """
+    Streams chapters through a process pool and writes book.json and
+    passages.jsonl into out_dir. Returns a summary dict.
+
+    Passages whose heading names a subtopic are assigned to it; others go to
+    the best-scoring subtopic, or stay with the previous passage's subtopic
+    when no subtopic scores at least min_score.
+    """
+    mapping = load_mapping(mapping_path)
+    if not mapping:
+        raise ValueError(f"No (cur_topic, cur_subtopic) rows found in {mapping_path}")
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    passages_path = os.path.join(out_dir, 'passages.jsonl')
+    spool_dir = tempfile.mkdtemp(prefix='book_ingest_', dir=out_dir)
+    book_offsets = [0] * len(mapping)
+    counts = [0] * len(mapping)
+    seen_ids = Counter()
+    previous = None
+    unassigned = 0
+    # Open spool files, least recently written first (bounded to stay under the fd limit)
+    spools = OrderedDict()
+
+    def spool_for(index):
+        spool = spools.pop(index, None)
+        if spool is None:
+            if len(spools) >= max_open_spools:
+                spools.popitem(last=False)[1].close()
+            spool = open(os.path.join(spool_dir, f"{index}.txt"), 'a', encoding='utf-8')
+        spools[index] = spool
+        return spool
+
+    def consume(results, passages_file):
+        nonlocal previous, unassigned
+        for p in results:
+            index = p["heading_match"]
+            if index is None:
+                index = p["match"] if p["score"] >= min_score else previous
+            if index is None:
+                unassigned += 1
+                continue
+            previous = index
+            topic, subtopic = mapping[index]
+            separator = "\n\n" if counts[index] else ""
+            book_start = book_offsets[index] + len(separator)
+            spool_for(index).write(separator + p["text"])
+            book_offsets[index] = book_start + len(p["text"])
+            counts[index] += 1
+
+            pid = passage_id(p["source"], p["text"])
+            seen_ids[pid] += 1
+            if seen_ids[pid] > 1:
+                pid = f"{pid}-{seen_ids[pid]}"
+            passages_file.write(json.dumps({
+                "id": pid,
+                "topic": topic,
+                "subtopic": subtopic,
+                "source": p["source"],
+                "source_start": p["source_start"],
+                "source_end": p["source_end"],
+                "book_start": book_start,
+                "book_end": book_offsets[index],
+                "score": p["score"],
+                "text": p["text"],
+            }, ensure_ascii=False) + "\n")
+
+    # Keep a bounded number of batches in flight so input is streamed, not preloaded
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mapping,)) as pool, \
+                open(passages_path, 'w', encoding='utf-8') as passages_file:
+            pending = deque()
+            for batch in iter_batches(iter_paragraphs(chapters_dir), batch_size):
+                pending.append(pool.submit(process_batch, batch, max_chars))
+                if len(pending) >= workers * 2:
+                    consume(pending.popleft().result(), passages_file)
+            while pending:
+                consume(pending.popleft().result(), passages_file)
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+    _write_book_json(os.path.join(out_dir, 'book.json'), mapping, counts, spool_dir)
+
+    summary = {
+        "passages": sum(counts),
+        "subtopics_filled": sum(1 for c in counts if c),
+        "subtopics_total": len(mapping),
+        "unassigned": unassigned,
+    }
+    print(f"Ingested {summary['passages']} passages into {summary['subtopics_filled']}/"
+          f"{summary['subtopics_total']} subtopics ({unassigned} unassigned).")
+    return summary
+
+
+def _write_book_json(book_path, mapping, counts, spool_dir, chunk_chars=1 << 16):
+    """
+    Writes book.json as topic -> subtopic -> text, copying each subtopic's
+    spool file in chunks so no subtopic text is held in memory whole.
+    """
+    by_topic = {}
+    for index, (topic, subtopic) in enumerate(mapping):
+        if counts[index]:
+            by_topic.setdefault(topic, []).append((index, subtopic))
+
+    with open(book_path, 'w', encoding='utf-8') as out:
+        out.write("{")
+        for t_num, (topic, entries) in enumerate(by_topic.items()):
+            out.write(("," if t_num else "") + f"\n  {json.dumps(topic, ensure_ascii=False)}: {{")
+            for s_num, (index, subtopic) in enumerate(entries):
+                out.write(("," if s_num else "") + f"\n    {json.dumps(subtopic, ensure_ascii=False)}: \"")
+                spool_path = os.path.join(spool_dir, f"{index}.txt")
+                with open(spool_path, 'r', encoding='utf-8') as spool:
+                    while True:
+                        chunk = spool.read(chunk_chars)
+                        if not chunk:
+                            break
+                        # JSON string escaping is per-character, so chunks can be escaped independently
+                        out.write(json.dumps(chunk, ensure_ascii=False)[1:-1])
+                os.remove(spool_path)
+                out.write("\"")
+            out.write("\n  }")
+        out.write("\n}\n")
+    os.rmdir(spool_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build book.json and passages.jsonl from textbook chapters.")
+    parser.add_argument("--chapters", required=True, help="Directory of .txt/.md chapter files.")
+    parser.add_argument("--mapping", required=True, help="CSV with cur_topic,cur_subtopic columns.")
+    parser.add_argument("--subject", help="Write into data/<subject>/ (ignored if --out-dir is given).")
+    parser.add_argument("--out-dir", help="Output directory for book.json and passages.jsonl.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-chars", type=int, default=1200, help="Maximum passage length.")
+    parser.add_argument("--min-score", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if not args.out_dir and not args.subject:
+        parser.error("one of --out-dir or --subject is required")
+    out_dir = args.out_dir or os.path.join(DATA_DIR, args.subject.lower())
+    ingest(args.chapters, args.mapping, out_dir, workers=args.workers, batch_size=args.batch_size,
+           max_chars=args.max_chars, min_score=args.min_score)
@@ -0,0 +1,149 @@
+# Escalation cascade for answer/rubric generation: draft on a cheap model, escalate on local validation failure
+
+import os
+import csv
+import threading
+
+from .book_ingest import tokenize
+from .pricing import call_cost
+
+CASCADE_DEFAULTS = {
+    "enabled": False,
+    "models": [],             # cheapest first, e.g. ["gpt-4o-mini", "gpt-4o"]
+    "min_answer_words": 15,
+    "max_answer_words": 400,
+    "min_context_support": 0.3,
+}
+
+
+def expected_rubric_levels(rubrics_data):
+    """Rubric level names from rubrics.json (e.g. Comprehensive/Competent/Partial/Limited Response)."""
+    levels = (rubrics_data or {}).get("rubric", {}).get("levels", [])
+    return [lvl.get("level", "").strip().lower() for lvl in levels if isinstance(lvl, dict)]
+
+
+def context_support(answer, focused_context):
+    """Share of the answer's content words that appear in the focused context."""
+    answer_words = set(tokenize(answer))
+    if not answer_words:
+        return 0.0
+    return len(answer_words & set(tokenize(focused_context))) / len(answer_words)
+
+
+def check_qna(qna, focused_context, expected_levels, settings=None):
+    """
+    Local checks on an answer/rubric response. Returns the list of failed
+    checks (empty if it passes): invalid_json, answer_too_short,
+    answer_too_long, ungrounded_answer, rubric_levels.
+    """
+    settings = dict(CASCADE_DEFAULTS, **(settings or {}))
+    if not isinstance(qna, dict) or not isinstance(qna.get('answer'), str):
+        return ["invalid_json"]
+
+    reasons = []
+    words = len(qna['answer'].split())
+    if words < settings["min_answer_words"]:
+        reasons.append("answer_too_short")
+    elif words > settings["max_answer_words"]:
+        reasons.append("answer_too_long")
+    if focused_context and context_support(qna['answer'], focused_context) < settings["min_context_support"]:
+        reasons.append("ungrounded_answer")
+
+    rubric = qna.get('rubric')
+    levels = rubric.get('levels') if isinstance(rubric, dict) else None
+    if not isinstance(levels, list) or len(levels) != (len(expected_levels) or 4):
+        reasons.append("rubric_levels")
+    else:
+        names = [str(lvl.get('level', '')).strip().lower() if isinstance(lvl, dict) else "" for lvl in levels]
+        described = all(isinstance(lvl, dict) and str(lvl.get('description', '')).strip() for lvl in levels)
+        if (expected_levels and names != expected_levels) or not described:
+            reasons.append("rubric_levels")
+    return reasons
+
+
+class CascadeStats:
+    """
+    Collects one record per cascaded item and compares what it cost against
+    sending every item straight to the strongest model.
+    """
+
+    def __init__(self, models, prices=None):
+        self.models = list(models)
+        self.prices = prices or {}
+        self.items = []
+        self._lock = threading.Lock()
+
+    def record(self, bloom_level, question, attempts, passed):
+        """attempts: one dict per call (model, prompt_tokens, completion_tokens, duration_sec, reasons)."""
+        with self._lock:
+            self.items.append({"bloom_level": bloom_level, "question": question,
+                               "attempts": attempts, "passed": passed})
+
+    def summary(self):
+        strong = self.models[-1] if self.models else None
+        with self._lock:
+            items = list(self.items)
+        if not items:
+            return None
+
+        strong_durations = [a["duration_sec"] for i in items for a in i["attempts"] if a["model"] == strong]
+        strong_latency = sum(strong_durations) / len(strong_durations) if strong_durations else None
+
+        cost, baseline_cost, latency, baseline_latency = 0.0, 0.0, 0.0, 0.0
+        costs_known = True
+        for item in items:
+            for a in item["attempts"]:
+                c = call_cost(a["model"], a["prompt_tokens"], a["completion_tokens"], self.prices)
+                costs_known = costs_known and c is not None
+                cost += c or 0.0
+                latency += a["duration_sec"]
+            # Baseline: the strong model's own call if it was made, else the draft's tokens at strong-model prices
+            ref = next((a for a in item["attempts"] if a["model"] == strong), item["attempts"][0])
+            c = call_cost(strong, ref["prompt_tokens"], ref["completion_tokens"], self.prices)
+            costs_known = costs_known and c is not None
+            baseline_cost += c or 0.0
+            baseline_latency += ref["duration_sec"] if ref["model"] == strong else (strong_latency or 0.0)
+
+        escalated = sum(1 for i in items if len(i["attempts"]) > 1)
+        n = len(items)
+        return {
+            "items": n,
+            "escalated": escalated,
+            "escalation_rate": escalated / n,
+            "failed_after_cascade": sum(1 for i in items if not i["passed"]),
+            "cost_per_item": cost / n if costs_known else None,
+            "baseline_cost_per_item": baseline_cost / n if costs_known else None,
+            "latency_per_item": latency / n,
+            "baseline_latency_per_item": baseline_latency / n if strong_latency is not None else None,
+        }
+
+    def report(self, output_folder_path):
+        """Prints the escalation summary and writes cascade_log.csv (one row per item)."""
+        s = self.summary()
+        if not s:
+            return
+        fmt = lambda v, unit: f"{v:.4f}{unit}" if v is not None else "n/a"
+        print(f"Cascade ({' -> '.join(self.models)}): {s['escalated']}/{s['items']} items escalated "
+              f"({100 * s['escalation_rate']:.1f}%), {s['failed_after_cascade']} still failing")
+        print(f"  Cost per item:    {fmt(s['cost_per_item'], ' $')} (always {self.models[-1]}: {fmt(s['baseline_cost_per_item'], ' $')})")
+        print(f"  Latency per item: {fmt(s['latency_per_item'], ' s')} (always {self.models[-1]}: {fmt(s['baseline_latency_per_item'], ' s')})")
+        if s['cost_per_item'] is None:
+            print("  (add every cascade model to \"prices\" in config.json to compare costs)")
+
+        with open(os.path.join(output_folder_path, 'cascade_log.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["bloom_level", "question", "models", "escalated", "passed", "reasons",
+                             "prompt_tokens", "completion_tokens", "duration_sec", "cost"])
+            for item in self.items:
+                attempts = item["attempts"]
+                costs = [call_cost(a["model"], a["prompt_tokens"], a["completion_tokens"], self.prices) for a in attempts]
+                writer.writerow([
+                    item["bloom_level"], item["question"],
+                    " -> ".join(a["model"] for a in attempts),
+                    len(attempts) > 1, item["passed"],
+                    " | ".join(",".join(a["reasons"]) for a in attempts if a["reasons"]),
+                    sum(a["prompt_tokens"] for a in attempts),
+                    sum(a["completion_tokens"] for a in attempts),
+                    round(sum(a["duration_sec"] for a in attempts), 2),
+                    round(sum(costs), 6) if None not in costs else "",
+                ])
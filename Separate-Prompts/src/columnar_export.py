@@ -0,0 +1,174 @@
+# Columnar export of the question bank (Parquet or Arrow IPC with pyarrow, CSV otherwise)
+
+import os
+import csv
+import json
+import datetime
+
+EXPORT_FORMATS = ("parquet", "arrow", "csv")
+STATE_FILE = "_export_state.json"
+
+# (column, pyarrow type factory); one row per Q&A and rubric level
+COLUMNS = [
+    ("item_id", "int64"),
+    ("run_id", "string"),
+    ("run_date", "date32"),
+    ("subject", "string"),
+    ("topic", "string"),
+    ("subtopic", "string"),
+    ("bloom_level", "string"),
+    ("model", "string"),
+    ("status", "string"),
+    ("question", "string"),
+    ("answer", "string"),
+    ("source_text", "string"),
+    ("grounding_score", "float64"),
+    ("grounded", "bool_"),
+    ("rubric_level_index", "int16"),
+    ("rubric_level", "string"),
+    ("rubric_description", "string"),
+    ("prompt_tokens", "int32"),
+    ("completion_tokens", "int32"),
+    ("duration_sec", "float64"),
+]
+
+
+def has_pyarrow():
+    import importlib.util
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def item_rows(item):
+    """Flattens a question-bank item into one row per rubric level (one row if it has no rubric)."""
+    payload = item["payload"]
+    grounding = payload.get("grounding") if isinstance(payload.get("grounding"), dict) else {}
+    usage = payload.get("usage") if isinstance(payload.get("usage"), dict) else {}
+    run_date = (item.get("run_created_at") or item.get("created_at") or "")[:10]
+    base = {
+        "item_id": item["id"],
+        "run_id": item["run_id"],
+        "run_date": datetime.date.fromisoformat(run_date) if run_date else None,
+        "subject": item["subject"],
+        "topic": item["topic"],
+        "subtopic": item["subtopic"],
+        "bloom_level": item["bloom_level"],
+        "model": item["model"],
+        "status": item["status"],
+        "question": item["question"],
+        "answer": item["answer"],
+        "source_text": item["source_text"],
+        "grounding_score": grounding.get("score"),
+        "grounded": grounding.get("grounded"),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "duration_sec": usage.get("duration_sec"),
+    }
+    rubric = payload.get("rubric") if isinstance(payload.get("rubric"), dict) else {}
+    levels = [lvl for lvl in rubric.get("levels") or [] if isinstance(lvl, dict)]
+    if not levels:
+        yield dict(base, rubric_level_index=None, rubric_level=None, rubric_description=None)
+    for index, level in enumerate(levels):
+        yield dict(base, rubric_level_index=index, rubric_level=str(level.get("level", "")),
+                   rubric_description=str(level.get("description", "")))
+
+
+def partition_dir(out_dir, row):
+    """Hive-style partition folder: <out_dir>/subject=<subject>/run_date=<YYYY-MM-DD>."""
+    return os.path.join(out_dir, f"subject={row['subject'] or 'unknown'}",
+                        f"run_date={row['run_date'] or 'unknown'}")
+
+
+class _CsvPart:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=[name for name, _ in COLUMNS])
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ArrowPart:
+    def __init__(self, path, fmt):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in COLUMNS])
+        if fmt == "parquet":
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        columns = {name: [row[name] for row in rows] for name, _ in COLUMNS}
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_columnar(store, out_dir, fmt=None, chunk_rows=5000):
+    """
+    Streams every question-bank item added since the last export into
+    out_dir, partitioned by subject and run date. Each export adds a new part
+    file per partition; _export_state.json remembers the last item exported.
+    Returns the number of rows written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, STATE_FILE)
+    state = {"format": None, "last_item_id": 0, "exports": []}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    fmt = fmt or state["format"] or ("parquet" if has_pyarrow() else "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Expected one of: {', '.join(EXPORT_FORMATS)}")
+    if state["format"] and fmt != state["format"]:
+        raise ValueError(f"{out_dir} holds a {state['format']} export; use the same format or another folder.")
+    if fmt != "csv" and not has_pyarrow():
+        raise ImportError(f"The {fmt} format needs pyarrow (pip install pyarrow); use --format csv instead.")
+
+    # Part names also carry the first item ID, so two exports in the same second never collide
+    stamp = f"{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{state['last_item_id'] + 1}"
+    extension = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}[fmt]
+    parts, buffers = {}, {}
+    rows_written, items, last_id = 0, 0, state["last_item_id"]
+
+    def flush(folder):
+        if folder not in parts:
+            os.makedirs(folder, exist_ok=True)
+            # Hidden until the export succeeds; readers skip files starting with "."
+            path = os.path.join(folder, f".part-{stamp}.{extension}")
+            parts[folder] = _CsvPart(path) if fmt == "csv" else _ArrowPart(path, fmt)
+        parts[folder].write(buffers.pop(folder))
+
+    try:
+        for item in store.iter_items(after_id=state["last_item_id"]):
+            items += 1
+            last_id = item["id"]
+            for row in item_rows(item):
+                folder = partition_dir(out_dir, row)
+                buffers.setdefault(folder, []).append(row)
+                rows_written += 1
+                if len(buffers[folder]) >= chunk_rows:
+                    flush(folder)
+        for folder in list(buffers):
+            flush(folder)
+    finally:
+        for part in parts.values():
+            part.close()
+
+    for folder in parts:
+        os.replace(os.path.join(folder, f".part-{stamp}.{extension}"), os.path.join(folder, f"part-{stamp}.{extension}"))
+    if items:
+        state.update(format=fmt, last_item_id=last_id)
+        state["exports"].append({"at": stamp, "items": items, "rows": rows_written, "partitions": len(parts)})
+        tmp = f"{state_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, state_path)
+    return rows_written
@@ -4,6 +4,8 @@ import json
 import re
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+# Subject files not duplicated here (mapping.csv) are read from the Single-Prompt tree
+SINGLE_PROMPT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Single-Prompt', 'data')
 
 # In src/data_loader.py
 
@@ -47,6 +49,18 @@ def load_json_safe_from_subject(subject, filename):
             raise json.JSONDecodeError(f"Error parsing JSON in {subject}/{filename}: {e}", e.doc, e.pos)
 
 
+def find_mapping_file(subject):
+    """
+    Path of a subject's mapping.csv (cur_topic,cur_subtopic): data/<subject>/
+    when it has one, otherwise the one kept with the Single-Prompt data.
+    """
+    for data_dir in (DATA_DIR, SINGLE_PROMPT_DATA_DIR):
+        file_path = os.path.join(data_dir, subject.lower(), 'mapping.csv')
+        if os.path.exists(file_path):
+            return file_path
+    raise FileNotFoundError(f"File not found: {subject}/mapping.csv")
+
+
 def find_subtopic_text(structured_book, subtopic_name):
     for topic_data in structured_book.values():
         if isinstance(topic_data, dict) and subtopic_name in topic_data:
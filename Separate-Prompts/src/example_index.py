@@ -0,0 +1,168 @@
+# Relevance-ranked few-shot examples from examples.json and accepted question-bank items
+
+import json
+import math
+import hashlib
+import threading
+from collections import Counter
+
+from .book_ingest import tokenize
+from .prompt_render import render_section, count_tokens
+
+EXAMPLE_DEFAULTS = {
+    "enabled": False,
+    "k": 3,
+    "max_tokens": 800,        # cap on the rendered examples per prompt
+    "include_bank": True,     # also draw on items marked "accepted" in the question bank
+    "level_weight": 0.5,      # score bonus for an example at a requested Bloom level
+    "min_score": 0.05,
+}
+
+# ExampleIndex per (subject, bank), rebuilt when examples.json or the accepted items change
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def iter_examples(examples_data):
+    """
+    Flattens examples.json ({name: example or [examples]}) into
+    (name, example) pairs. Names are usually subtopics.
+    """
+    for name, value in (examples_data or {}).items():
+        for example in value if isinstance(value, list) else [value]:
+            if isinstance(example, dict) and example.get("question"):
+                yield name, example
+
+
+class ExampleIndex:
+    """
+    Scores examples against a subtopic, topic and keywords by IDF-weighted
+    word overlap, with bonuses for a matching Bloom level and subtopic name.
+    """
+
+    def __init__(self, entries):
+        # entries: (name, bloom_level or None, example dict)
+        self.entries = []
+        df = Counter()
+        for name, bloom_level, example in entries:
+            words = set(tokenize(f"{name} {example.get('question', '')} {example.get('answer', '')}"))
+            self.entries.append((name, bloom_level, example, words))
+            df.update(words)
+        n = max(len(self.entries), 1)
+        self.idf = {word: math.log(1 + n / count) for word, count in df.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rank(self, subtopic, bloom_levels=(), topic="", keywords="", level_weight=0.5):
+        """Returns (score, name, bloom_level, example) for every example, best first."""
+        query = set(tokenize(f"{subtopic} {topic} {keywords or ''}"))
+        query_weight = sum(self.idf.get(word, 1.0) for word in query) or 1.0
+        levels = set(bloom_levels)
+        ranked = []
+        for name, bloom_level, example, words in self.entries:
+            score = sum(self.idf[word] for word in query & words) / query_weight
+            if name == subtopic:
+                score += 1.0
+            if bloom_level and bloom_level in levels:
+                score += level_weight
+            ranked.append((score, name, bloom_level, example))
+        ranked.sort(key=lambda r: -r[0])
+        return ranked
+
+    def select(self, subtopic, bloom_levels=(), topic="", keywords="", settings=None,
+               section_format=None, model=None):
+        """
+        The k best examples that fit in settings["max_tokens"] (as rendered
+        in the prompt), skipping near-duplicate questions.
+        """
+        settings = dict(EXAMPLE_DEFAULTS, **(settings or {}))
+        chosen, seen, used = [], set(), 0
+        for score, name, bloom_level, example in self.rank(subtopic, bloom_levels, topic, keywords,
+                                                           settings["level_weight"]):
+            if len(chosen) >= settings["k"] or score < settings["min_score"]:
+                break
+            key = " ".join(tokenize(example["question"]))
+            if key in seen:
+                continue
+            tokens = count_tokens(render_section(example, section_format), model)
+            if used + tokens > settings["max_tokens"]:
+                continue
+            seen.add(key)
+            chosen.append(example)
+            used += tokens
+        return chosen
+
+
+def bank_examples(store, subject):
+    """
+    Accepted question-bank items as (subtopic, bloom_level, {question,
+    answer, bloom_level}) entries. Items are marked accepted with
+    `python -m src.results_store status accepted <item IDs>`.
+    """
+    return [(item["subtopic"], item["bloom_level"],
+             {"question": item["question"], "answer": item["answer"], "bloom_level": item["bloom_level"]})
+            for item in store.query(subject=subject, status="accepted") if item["answer"]]
+
+
+def get_example_index(subject, examples_data, store=None, include_bank=True):
+    """
+    Returns the (cached) ExampleIndex over a subject's examples and,
+    optionally, its accepted items. The cache is checked with one aggregate
+    query; the accepted items are only read when they changed.
+    """
+    use_bank = store is not None and include_bank
+    key = (subject, store.db_path if use_bank else None)
+    examples_hash = hashlib.sha1(json.dumps(examples_data, sort_keys=True).encode("utf-8")).hexdigest()
+    fingerprint = (examples_hash, store.status_fingerprint(subject, "accepted") if use_bank else None)
+    with _INDEXES_LOCK:
+        cached = _INDEXES.get(key)
+        if cached is None or cached[0] != fingerprint:
+            entries = [(name, example.get("bloom_level"), example) for name, example in iter_examples(examples_data)]
+            cached = (fingerprint, ExampleIndex(entries + (bank_examples(store, subject) if use_bank else [])))
+            _INDEXES[key] = cached
+        return cached[1]
+
+
+def examples_for(job, config, store, bloom_levels):
+    """
+    examples_data for the prompt builders, which look examples up by
+    subtopic name: the subject's examples.json as is, or, with
+    example_selection enabled, {subtopic: the best examples for these levels}.
+    """
+    settings = dict(EXAMPLE_DEFAULTS, **(config.get('example_selection') or {}))
+    examples_data = job["data"]["examples"]
+    if not settings["enabled"]:
+        return examples_data
+    params = job["params"]
+    index = get_example_index(job["subject"], examples_data, store, settings["include_bank"])
+    selected = index.select(params.get('subtopic', ''), bloom_levels, params.get('topic', ''),
+                            params.get('user_keywords', ''), settings,
+                            config.get('prompt_format'), config.get('model'))
+    return {params.get('subtopic', ''): selected}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from .data_loader import load_json_safe_from_subject
+
+    parser = argparse.ArgumentParser(description="Show the few-shot examples selected for a subtopic.")
+    parser.add_argument("--subject", default="biology")
+    parser.add_argument("--subtopic", required=True)
+    parser.add_argument("--topic", default="")
+    parser.add_argument("--bloom-level", default="Understanding")
+    parser.add_argument("--keywords", default="")
+    parser.add_argument("--k", type=int, default=EXAMPLE_DEFAULTS["k"])
+    parser.add_argument("--max-tokens", type=int, default=EXAMPLE_DEFAULTS["max_tokens"])
+    args = parser.parse_args()
+
+    index = ExampleIndex((name, ex.get("bloom_level"), ex)
+                         for name, ex in iter_examples(load_json_safe_from_subject(args.subject, 'examples.json')))
+    levels = [b.strip() for b in args.bloom_level.split(',') if b.strip()]
+    print(f"{len(index)} examples indexed.")
+    for score, name, level, example in index.rank(args.subtopic, levels, args.topic, args.keywords)[:args.k * 2]:
+        print(f"{score:6.2f}  {name[:30]:<30} {str(level or '-'):<14} {example['question'][:70]}")
+    selected = index.select(args.subtopic, levels, args.topic, args.keywords,
+                            {"k": args.k, "max_tokens": args.max_tokens})
+    print(f"\nSelected {len(selected)} within {args.max_tokens} tokens.")
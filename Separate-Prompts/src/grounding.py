@@ -0,0 +1,167 @@
+# Checks that each question's "source_text" really comes from the textbook/curriculum
+
+import re
+from collections import Counter
+
+from .data_loader import find_subtopic_text, find_topic_text
+
+WORD_RE = re.compile(r"\w+")
+NGRAM = 3
+FRAGMENT_SEPARATOR = " | "
+
+# Per-subtopic indexes, keyed by content so edited data is re-indexed
+_INDEX_CACHE = {}
+
+
+def flatten_text(value):
+    """Flattens nested curriculum structures (dicts/lists of strings) into one string."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "\n".join(flatten_text(v) for v in value.values())
+    if isinstance(value, list):
+        return "\n".join(flatten_text(v) for v in value)
+    return "" if value is None else str(value)
+
+
+class PassageIndex:
+    """
+    Word n-gram index over a single passage of text. Matches are reported
+    as character offsets into the original (unnormalised) text.
+    """
+
+    def __init__(self, text, source):
+        self.source = source
+        self.text = text or ""
+        self.spans = []
+        words = []
+        for m in WORD_RE.finditer(self.text.lower()):
+            words.append(m.group(0))
+            self.spans.append((m.start(), m.end()))
+        self.words = words
+        self.joined = " ".join(words)
+        self.ngrams = {}
+        for i in range(len(words) - NGRAM + 1):
+            self.ngrams.setdefault(tuple(words[i:i + NGRAM]), []).append(i)
+
+    def match(self, fragment_words):
+        """
+        Returns (score, start, end) for the best alignment of fragment_words,
+        where score is the share of the fragment's n-grams found on one diagonal.
+        """
+        if not fragment_words or not self.words:
+            return 0.0, None, None
+
+        if len(fragment_words) < NGRAM:
+            pos = f" {self.joined} ".find(f" {' '.join(fragment_words)} ")
+            if pos < 0:
+                return 0.0, None, None
+            first = self.joined.count(" ", 0, pos)
+            return (1.0,) + self._char_span(first, len(fragment_words))
+
+        votes = Counter()
+        total = len(fragment_words) - NGRAM + 1
+        for j in range(total):
+            for i in self.ngrams.get(tuple(fragment_words[j:j + NGRAM]), ()):
+                votes[i - j] += 1
+        if not votes:
+            return 0.0, None, None
+
+        # Allow small insertions/deletions by pooling neighbouring diagonals
+        best_diag, best_votes = None, 0
+        for diag in votes:
+            pooled = sum(votes.get(diag + d, 0) for d in (-2, -1, 0, 1, 2))
+            if pooled > best_votes:
+                best_diag, best_votes = diag, pooled
+        score = min(1.0, best_votes / total)
+        return (score,) + self._char_span(max(best_diag, 0), len(fragment_words))
+
+    def _char_span(self, first_word, length):
+        last_word = min(first_word + length, len(self.spans)) - 1
+        return self.spans[first_word][0], self.spans[last_word][1]
+
+
+def get_grounding_indexes(textbook_data, curriculum_data, subtopic, topic):
+    """
+    Returns the [book, curriculum] PassageIndex pair for a subtopic/topic,
+    building it on first use.
+    """
+    book_text = flatten_text(find_subtopic_text(textbook_data, subtopic))
+    curriculum_text = flatten_text(find_topic_text(curriculum_data, topic))
+    key = (subtopic, topic, hash(book_text), hash(curriculum_text))
+    if key not in _INDEX_CACHE:
+        _INDEX_CACHE[key] = [
+            PassageIndex(book_text, "book"),
+            PassageIndex(curriculum_text, "curriculum"),
+        ]
+    return _INDEX_CACHE[key]
+
+
+def check_source_text(source_text, indexes):
+    """
+    Fuzzy-matches a source_text (possibly several ' | '-joined fragments)
+    against the indexes. Returns a grounding record:
+    {"score": float, "fragments": [{"text", "score", "source", "start", "end"}]}
+    The overall score is the length-weighted mean of the fragment scores.
+    """
+    fragments = [f.strip() for f in (source_text or "").split(FRAGMENT_SEPARATOR.strip()) if f.strip()]
+    results = []
+    weighted, total_words = 0.0, 0
+    for fragment in fragments:
+        words = WORD_RE.findall(fragment.lower())
+        best = {"text": fragment, "score": 0.0, "source": None, "start": None, "end": None}
+        for index in indexes:
+            score, start, end = index.match(words)
+            if score > best["score"]:
+                best.update(score=round(score, 3), source=index.source, start=start, end=end)
+                if score >= 1.0:
+                    break
+        results.append(best)
+        weighted += best["score"] * len(words)
+        total_words += len(words)
+    overall = round(weighted / total_words, 3) if total_words else 0.0
+    return {"score": overall, "fragments": results}
+
+
+def validate_questions(questions_by_bloom, indexes, min_score=0.6, drop_ungrounded=False):
+    """
+    Attaches a "grounding" record to every question object and optionally
+    drops those scoring below min_score. Returns (questions_by_bloom, stats).
+    """
+    checked, dropped = 0, 0
+    validated = {}
+    for bloom_level, questions in questions_by_bloom.items():
+        kept = []
+        for q_obj in questions:
+            if not isinstance(q_obj, dict):
+                kept.append(q_obj)
+                continue
+            grounding = check_source_text(q_obj.get('source_text', ''), indexes)
+            grounding["grounded"] = grounding["score"] >= min_score
+            q_obj['grounding'] = grounding
+            checked += 1
+            if drop_ungrounded and not grounding["grounded"]:
+                dropped += 1
+                print(f"  Dropping ungrounded question (score {grounding['score']}): {q_obj.get('question', '')[:60]}...")
+                continue
+            kept.append(q_obj)
+        validated[bloom_level] = kept
+    stats = {"checked": checked, "dropped": dropped}
+    return validated, stats
+
+
+if __name__ == '__main__':
+    import time
+
+    mock_book = {"Cells": {"Cell Organelles": "Mitochondria are the powerhouse of the cell. "
+                                              "The nucleus contains the genetic material of the cell."}}
+    mock_curriculum = {"Cells": {"Students learn about": ["the structure of plant and animal cells"]}}
+    idx = get_grounding_indexes(mock_book, mock_curriculum, "Cell Organelles", "Cells")
+
+    for text in ["The nucleus contains the genetic material of the cell.",
+                 "Mitochondria are the powerhouse of a cell | the structure of plant and animal cells",
+                 "Ribosomes are made in the Golgi apparatus."]:
+        start = time.perf_counter()
+        result = check_source_text(text, idx)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{result['score']:.2f} ({elapsed_ms:.3f} ms) {text}")
@@ -0,0 +1,140 @@
+# Content hashes of everything a generated Q&A depends on, for incremental rebuilds
+
+import json
+import hashlib
+import threading
+
+from .prompt_builder import (
+    build_questions_prompt,
+    build_level_questions_prompt,
+    build_AnswerRubrics_prompt,
+    build_answer_prompt,
+    build_rubric_prompt,
+    build_rubric_skeleton_prompt,
+    build_answer_criteria_prompt
+)
+from .prompt_render import DEFAULT_SECTION_FORMAT
+from .model_router import route_model
+from .cascade import CASCADE_DEFAULTS
+from .example_index import examples_for
+from .lazy_rubrics import LAZY_RUBRICS_DEFAULTS
+
+# Inputs of Step 1 (questions) and Step 2 (answer and rubric). A change to a
+# Step 1 input means new questions; a change to a Step 2 input only means new
+# answers/rubrics for the existing questions.
+STEP1_INPUTS = ("subtopic_text", "curriculum", "examples", "glossary_verbs", "questions_template", "questions_model")
+STEP2_INPUTS = ("rubrics", "answer_rubric_template", "answer_model")
+
+_TEMPLATE_VERSIONS = {}
+_TEMPLATE_LOCK = threading.Lock()
+
+# Fixed inputs for fingerprinting the templates themselves
+_SAMPLE_PARAMS = {"grade_level": "grade", "topic": "topic", "subtopic": "subtopic",
+                  "bloom_level": "level", "num_questions": 1, "user_keywords": "keywords"}
+_SAMPLE_RUBRIC = {"rubric": {"levels": [{"level": "level", "description": "description"}]}}
+
+
+def content_hash(value):
+    """Short, stable hash of a string or JSON-serialisable value."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()[:12]
+
+
+def template_version(kind, subject, section_format=None):
+    """
+    Fingerprint of a prompt template ("questions", "level_questions",
+    "answer_rubric", "answer", "rubric", "rubric_skeleton" or
+    "answer_criteria"): the hash of the prompt it builds from fixed sample
+    inputs. Any wording or serialisation change gives a new version.
+    """
+    section_format = section_format or DEFAULT_SECTION_FORMAT
+    key = (kind, subject, section_format)
+    with _TEMPLATE_LOCK:
+        if key not in _TEMPLATE_VERSIONS:
+            # The builders look up the subject's glossary; "level" has no verbs, so none end up in the hash
+            params = dict(_SAMPLE_PARAMS, subject=subject)
+            if kind == "questions":
+                prompt = build_questions_prompt(params, {}, {}, {}, {}, section_format=section_format)
+            elif kind == "level_questions":
+                prompt = build_level_questions_prompt(params, {}, {}, {}, "level", section_format=section_format)
+            elif kind == "answer":
+                prompt = build_answer_prompt("question", "level", "context", section_format=section_format)
+            elif kind == "rubric":
+                prompt = build_rubric_prompt("question", "level", "context", "answer", _SAMPLE_RUBRIC,
+                                             section_format=section_format)
+            elif kind == "rubric_skeleton":
+                prompt = build_rubric_skeleton_prompt(params, "level", [], _SAMPLE_RUBRIC,
+                                                      section_format=section_format)
+            elif kind == "answer_criteria":
+                prompt = build_answer_criteria_prompt("question", "level", "context", _SAMPLE_RUBRIC["rubric"]["levels"],
+                                                      section_format=section_format)
+            else:
+                prompt = build_AnswerRubrics_prompt("question", "level", "context", _SAMPLE_RUBRIC,
+                                                    section_format=section_format)
+            _TEMPLATE_VERSIONS[key] = content_hash(prompt)
+        return _TEMPLATE_VERSIONS[key]
+
+
+def item_inputs(job, bloom_level, config):
+    """
+    The inputs a Separate-Prompts Q&A for bloom_level is generated from,
+    as hashes (models by name). job needs the fields set by load/retrieve.
+    """
+    data = job["data"]
+    subtopic = job["params"].get('subtopic', '')
+    section_format = config.get('prompt_format')
+    # generate_questions_stage only fans out when more than one level is requested
+    fan_out = (config.get('fan_out_levels') or {}).get('enabled', False) and len(job["bloom_levels"]) > 1
+    cascade = dict(CASCADE_DEFAULTS, **(config.get('cascade') or {}))
+    # Lazy rubrics: Step 2 writes only the answer (or nothing, leaving the full prompt for later)
+    lazy = dict(LAZY_RUBRICS_DEFAULTS, **(config.get('lazy_rubrics') or {}))
+    answer_template = "answer" if lazy['enabled'] and lazy['answers'] else "answer_rubric"
+    skeletons = (config.get('rubric_skeletons') or {}).get('enabled') and not lazy['enabled']
+    if skeletons:
+        answer_template = "answer_criteria"
+    if cascade["enabled"] and cascade["models"] and not lazy['enabled'] and not skeletons:
+        answer_model = "cascade:" + ",".join(cascade["models"])
+    else:
+        answer_model = route_model(config, "answer_rubric", bloom_level, job["subject"])[0]
+    return {
+        "subtopic_text": content_hash(job["full_subtopic_text"]),
+        "curriculum": content_hash(job["curriculum_content"] or ""),
+        # examples.json only: accepting bank items changes future prompts, not earlier Q&As
+        "examples": content_hash(examples_for(job, config, None, [bloom_level] if fan_out else job["bloom_levels"])
+                                 .get(subtopic) or []),
+        "glossary_verbs": content_hash(job["glossary_verbs"].get(bloom_level) or []),
+        "questions_template": template_version("level_questions" if fan_out else "questions",
+                                               job["subject"], section_format),
+        # One Step 1 call covers every level unless fanned out, so it is routed without one
+        "questions_model": route_model(config, "generate_questions", bloom_level if fan_out else None,
+                                       job["subject"])[0],
+        "rubrics": content_hash(data["rubrics"]),
+        "answer_rubric_template": (
+            content_hash([template_version(kind, job["subject"], section_format)
+                          for kind in ("rubric_skeleton", "answer_criteria")])
+            if answer_template == "answer_criteria"
+            else template_version(answer_template, job["subject"], section_format)
+        ),
+        "answer_model": answer_model,
+    }
+
+
+def changed_inputs(recorded, current):
+    """Names of the inputs whose recorded hash differs from the current one."""
+    return [name for name in STEP1_INPUTS + STEP2_INPUTS if recorded.get(name) != current.get(name)]
+
+
+def rebuild_action(recorded, current):
+    """
+    What an item needs: "untracked" (no recorded inputs), "questions" (a
+    Step 1 input changed), "answers" (only Step 2 inputs changed) or "unchanged".
+    """
+    if not recorded:
+        return "untracked"
+    changed = changed_inputs(recorded, current)
+    if any(name in STEP1_INPUTS for name in changed):
+        return "questions"
+    if changed:
+        return "answers"
+    return "unchanged"
@@ -0,0 +1,131 @@
+# Lazy rubrics: writes the rubric of a question-bank item the first time it is requested
+
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .data_loader import DATA_DIR
+from .prompt_builder import build_rubric_prompt, build_AnswerRubrics_prompt
+from .prompt_render import render_subject_file
+from .output_processor import parse_qna_response
+from .token_budget import TokenBudget
+
+LAZY_RUBRICS_DEFAULTS = {
+    "enabled": False,
+    "answers": True,          # false: no Step 2 call at all; the answer is written with the rubric
+    "workers": 4,             # parallel calls when rubrics are materialized in bulk
+}
+
+# One lock per item, so concurrent requests for the same rubric make a single call
+_ITEM_LOCKS = {}
+_ITEM_LOCKS_LOCK = threading.Lock()
+
+
+def _item_lock(item_id):
+    with _ITEM_LOCKS_LOCK:
+        return _ITEM_LOCKS.setdefault(item_id, threading.Lock())
+
+
+def has_thunk(item):
+    return bool(item["payload"].get("rubric_thunk"))
+
+
+def item_job(store, item):
+    """A job for call_and_log: the item's run parameters and its output folder's token log."""
+    run = store.get_run(item["run_id"]) or {}
+    params = json.loads(run.get("params_json") or "{}") or {
+        "subject": item["subject"], "topic": item["topic"], "subtopic": item["subtopic"]
+    }
+    folder = os.path.join(DATA_DIR, item["subject"], 'results', run.get("output_folder") or 'default')
+    os.makedirs(folder, exist_ok=True)
+    return {"params": params, "subject": item["subject"], "log_file": os.path.join(folder, 'token_log.csv')}
+
+
+def materialize_rubric(store, item, ctx):
+    """
+    Returns the item's rubric. If it is still a thunk, the rubric (and the
+    answer, when Step 2 wrote none) is generated now with the current
+    rubrics.json and stored in the item, so later requests are free.
+    """
+    # strategies imports this module for its settings
+    from .strategies import call_and_log
+
+    with _item_lock(item["id"]):
+        item = store.get_item(item["id"])
+        payload = item["payload"]
+        thunk = payload.get("rubric_thunk")
+        if not thunk:
+            return payload.get("rubric")
+
+        rubrics = render_subject_file(item["subject"], 'rubrics.json', thunk.get("section_format"))
+        if thunk.get("with_answer") or not payload.get("answer"):
+            prompt = build_AnswerRubrics_prompt(thunk["question"], thunk["bloom_level"], thunk["focused_context"],
+                                                rubrics, section_format=thunk.get("section_format"))
+        else:
+            prompt = build_rubric_prompt(thunk["question"], thunk["bloom_level"], thunk["focused_context"],
+                                         payload["answer"], rubrics, section_format=thunk.get("section_format"))
+        response = call_and_log(prompt, item_job(store, item), ctx, "rubric", thunk["bloom_level"])
+        parsed = parse_qna_response(response)
+        rubric = parsed.get("rubric") if isinstance(parsed, dict) else None
+        if not isinstance(rubric, dict):
+            raise ValueError(f"No rubric returned for item {item['id']}.")
+
+        if not payload.get("answer"):
+            payload["answer"] = parsed.get("answer")
+        payload["rubric"] = rubric
+        payload["rubric_generated"] = {
+            "model": response["routed_model"],
+            "template_version": thunk.get("template_version"),
+            "prompt_tokens": response["call_usage"].get("prompt_tokens"),
+            "completion_tokens": response["call_usage"].get("completion_tokens"),
+        }
+        payload.pop("rubric_thunk")
+        store.update_payload(item["id"], payload)
+        return rubric
+
+
+def materialize_items(store, items, config, workers=None):
+    """
+    Generates the pending rubrics of items in parallel (e.g. before an
+    export). Returns (generated, failed).
+    """
+    pending = [item for item in items if has_thunk(item)]
+    if not pending:
+        return 0, 0
+    settings = dict(LAZY_RUBRICS_DEFAULTS, **(config.get('lazy_rubrics') or {}))
+    ctx = {"config": config, "store": store, "token_budget": TokenBudget(config.get('token_budget'))}
+    print(f"Generating {len(pending)} pending rubrics...")
+    generated, failed = 0, 0
+    with ThreadPoolExecutor(max_workers=max(1, workers or settings["workers"])) as pool:
+        futures = {pool.submit(materialize_rubric, store, item, ctx): item for item in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                generated += 1
+            except Exception as e:
+                print(f"Rubric for item {futures[future]['id']} failed: {e}")
+                failed += 1
+    return generated, failed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from .config_loader import load_config
+    from .results_store import ResultsStore
+
+    parser = argparse.ArgumentParser(description="Show (generating it on first request) the rubric of question-bank items.")
+    parser.add_argument("item_ids", nargs="+", type=int)
+    args = parser.parse_args()
+
+    config = load_config()
+    with ResultsStore(config.get('results_db')) as store:
+        ctx = {"config": config, "store": store, "token_budget": TokenBudget(config.get('token_budget'))}
+        for item_id in args.item_ids:
+            item = store.get_item(item_id)
+            if item is None:
+                print(f"Item {item_id} is not in the question bank.")
+                continue
+            print(json.dumps({"id": item_id, "question": item["question"],
+                              "rubric": materialize_rubric(store, item, ctx)}, indent=2, ensure_ascii=False))
@@ -1,25 +1,62 @@
 import requests
 import os
 import time
+import threading
 from openai import OpenAI
 import google.generativeai as genai
 import ollama
 import anthropic
 
+DEFAULT_MAX_TOKENS = 4000
+GEMINI_DEFAULT_MAX_TOKENS = 65000
 
-def call_mistral_api(prompt, api_key, params_data):
+# Provider-specific "ran out of output tokens" finish reasons, normalised to "length"
+_TRUNCATED_FINISH_REASONS = {"length", "max_tokens", "MAX_TOKENS"}
+
+
+def normalize_finish_reason(raw):
+    if raw is None:
+        return None
+    raw = getattr(raw, "name", raw)
+    return "length" if str(raw) in _TRUNCATED_FINISH_REASONS else str(raw).lower()
+
+
+def usage_record(prompt_tokens, completion_tokens, total_tokens, duration, cached_tokens=None,
+                 reasoning_tokens=None, ttft_sec=None):
+    """
+    The normalised usage record every adapter returns in response["usage"].
+    prompt_tokens includes cached_tokens and completion_tokens includes
+    reasoning_tokens, as they are billed. Fields a provider does not report
+    are None; ttft_sec is only known for streamed (or Ollama) calls.
+    tok_per_sec is the output rate after the first token (or over the whole
+    call when ttft_sec is unknown).
+    """
+    generation_sec = duration - ttft_sec if ttft_sec is not None else duration
+    return {
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "total_tokens": total_tokens or 0,
+        "cached_tokens": cached_tokens,
+        "reasoning_tokens": reasoning_tokens,
+        "ttft_sec": round(ttft_sec, 3) if ttft_sec is not None else None,
+        "duration_sec": round(duration, 3),
+        "tok_per_sec": round(completion_tokens / generation_sec, 2) if completion_tokens and generation_sec > 0 else None,
+    }
+
+
+def call_mistral_api(prompt, api_key, model_name, params_data, max_tokens=None):
     url = "https://api.mistral.ai/v1/chat/completions"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}"
     }
     data = {
-        "model": "mistral-large-latest",
+        "model": model_name,
         "messages": [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ],
-        "max_tokens": 4000,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
         "temperature": 0.7,
     }
 
@@ -37,17 +74,19 @@ def call_mistral_api(prompt, api_key, params_data):
     prompt_tokens = usage.get("prompt_tokens", 0)
     completion_tokens = usage.get("completion_tokens", 0)
     total_tokens = usage.get("total_tokens", 0)
+    choices = result.get("choices") or [{}]
+    result["finish_reason"] = normalize_finish_reason(choices[0].get("finish_reason"))
+    result["usage"] = usage_record(prompt_tokens, completion_tokens, total_tokens, duration,
+                                   cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens"))
 
     return result, (prompt_tokens, completion_tokens, total_tokens), duration
 
 
-import time
-from openai import OpenAI
-
-def call_openai_api(prompt, api_key, model_name, params_data):
+def call_openai_api(prompt, api_key, model_name, params_data, max_tokens=None, stream=False):
     """
     Calls the OpenAI chat completion API, automatically handling the
-    parameter name change for new and future models.
+    parameter name change for new and future models. With stream=True the
+    response is streamed so the time to first token can be measured.
     """
     client = OpenAI(api_key=api_key)
     start_time = time.time()
@@ -61,135 +100,311 @@ def call_openai_api(prompt, api_key, model_name, params_data):
         "messages": messages
     }
 
+    limit = max_tokens or params_data.get("max_tokens", DEFAULT_MAX_TOKENS)
     # Use a flexible check for newer models
     if any(m in model_name.lower() for m in ["gpt-4o", "gpt-5"]):
-        kwargs["max_completion_tokens"] = params_data.get("max_tokens", 4000)
+        kwargs["max_completion_tokens"] = limit
     else:
-        kwargs["max_tokens"] = params_data.get("max_tokens", 4000)
+        kwargs["max_tokens"] = limit
 
+    ttft = None
     try:
-        response = client.chat.completions.create(**kwargs)
+        if stream:
+            parts, finish_reason, usage = [], None, None
+            for chunk in client.chat.completions.create(**kwargs, stream=True, stream_options={"include_usage": True}):
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                    parts.append(delta)
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+            content = "".join(parts)
+        else:
+            response = client.chat.completions.create(**kwargs)
+            content = response.choices[0].message.content
+            finish_reason = response.choices[0].finish_reason
+            usage = response.usage
     except Exception as e:
         print(f"OpenAI API call failed: {e}")
         raise
 
     duration = time.time() - start_time
-    usage = response.usage
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    total_tokens = usage.total_tokens if usage else 0
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    completion_details = getattr(usage, "completion_tokens_details", None)
 
-    return {"choices": [{"message": {"content": response.choices[0].message.content}}]}, \
-           (usage.prompt_tokens, usage.completion_tokens, usage.total_tokens), duration
-def call_gemini_api(prompt, api_key, model_name, params_data):
+    return {"choices": [{"message": {"content": content}}],
+            "finish_reason": normalize_finish_reason(finish_reason),
+            "usage": usage_record(prompt_tokens, completion_tokens, total_tokens, duration,
+                                  cached_tokens=getattr(prompt_details, "cached_tokens", None),
+                                  reasoning_tokens=getattr(completion_details, "reasoning_tokens", None),
+                                  ttft_sec=ttft)}, \
+           (prompt_tokens, completion_tokens, total_tokens), duration
+
+
+def call_gemini_api(prompt, api_key, model_name, params_data, max_tokens=None, stream=False):
     genai.configure(api_key=api_key)
     if not model_name.startswith("models/"):
         model_name = "models/" + model_name
     model = genai.GenerativeModel(model_name)
     start_time = time.time()
+    ttft = None
+    response = None
     try:
         response = model.generate_content(
             contents=prompt,
             generation_config={
-                "max_output_tokens": 65000,
+                "max_output_tokens": max_tokens or GEMINI_DEFAULT_MAX_TOKENS,
                 "temperature": 0.7,
                 "response_mime_type": "application/json"
-            }
+            },
+            stream=stream
         )
+        if stream:
+            for _ in response:
+                if ttft is None:
+                    ttft = time.time() - start_time
         duration = time.time() - start_time
         message = response.text
         usage = response.usage_metadata
-        prompt_tokens = usage.prompt_token_count if hasattr(usage, 'prompt_token_count') else 0
-        completion_tokens = usage.candidates_token_count if hasattr(usage, 'candidates_token_count') else 0
-        total_tokens = usage.total_token_count if hasattr(usage, 'total_token_count') else 0
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        # Thinking tokens are billed as output but reported apart from the candidates
+        thoughts_tokens = getattr(usage, 'thoughts_token_count', None)
+        completion_tokens = (getattr(usage, 'candidates_token_count', 0) or 0) + (thoughts_tokens or 0)
+        total_tokens = getattr(usage, 'total_token_count', 0) or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', None)
+        finish_reason = normalize_finish_reason(response.candidates[0].finish_reason) if response.candidates else None
     except Exception as e:
         print(f"Error during Gemini API call: {e}")
         if hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
             print(f"Gemini API call blocked: {response.prompt_feedback.block_reason}")
         raise
 
-    return {"choices": [{"message": {"content": message}}]}, \
+    return {"choices": [{"message": {"content": message}}], "finish_reason": finish_reason,
+            "usage": usage_record(prompt_tokens, completion_tokens, total_tokens, duration,
+                                  cached_tokens=cached_tokens, reasoning_tokens=thoughts_tokens, ttft_sec=ttft)}, \
         (prompt_tokens, completion_tokens, total_tokens), duration
 
 
-def call_llama_api(prompt, model_name, ollama_host, params_data):
-    client = ollama.Client(host=ollama_host)
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant."},
-        {"role": "user", "content": prompt}
-    ]
+# Local-inference (Ollama) state shared across calls: one client and one
+# parallel-slot semaphore per host, and a per-model context-size high-water mark
+_OLLAMA_CLIENTS = {}
+_OLLAMA_SLOTS = {}
+_OLLAMA_NUM_CTX = {}
+_OLLAMA_LOCK = threading.Lock()
+
+OLLAMA_DEFAULTS = {
+    "keep_alive": "30m",
+    "num_parallel": 1,
+    "num_predict": 4000,
+    "min_ctx": 2048,
+    "max_ctx": 32768,
+    "chars_per_token": 3.0,
+}
+
+
+def get_ollama_client(ollama_host, num_parallel=1):
+    """Returns the shared client and parallel-slot semaphore for an Ollama host."""
+    with _OLLAMA_LOCK:
+        if ollama_host not in _OLLAMA_CLIENTS:
+            _OLLAMA_CLIENTS[ollama_host] = ollama.Client(host=ollama_host)
+            _OLLAMA_SLOTS[ollama_host] = threading.Semaphore(max(1, int(num_parallel)))
+        return _OLLAMA_CLIENTS[ollama_host], _OLLAMA_SLOTS[ollama_host]
+
+
+def ollama_num_ctx(model_name, prompt, options):
+    """
+    Sizes num_ctx from the prompt: estimated prompt tokens + num_predict,
+    rounded up to a power of two. The value never shrinks for a model, because
+    every change of num_ctx makes Ollama reload the model.
+    """
+    estimated = int(len(prompt) / options["chars_per_token"]) + options["num_predict"] + 256
+    num_ctx = options["min_ctx"]
+    while num_ctx < estimated and num_ctx < options["max_ctx"]:
+        num_ctx *= 2
+    num_ctx = min(num_ctx, options["max_ctx"])
+    with _OLLAMA_LOCK:
+        num_ctx = max(num_ctx, _OLLAMA_NUM_CTX.get(model_name, 0))
+        _OLLAMA_NUM_CTX[model_name] = num_ctx
+    return num_ctx
+
+
+def ollama_metrics(response):
+    """Per-call timings reported by Ollama (durations are in nanoseconds)."""
+    def seconds(key):
+        return (response.get(key) or 0) / 1e9
+
+    prompt_eval_sec = seconds('prompt_eval_duration')
+    eval_sec = seconds('eval_duration')
+    return {
+        "load_sec": round(seconds('load_duration'), 3),
+        "prompt_eval_tok_per_sec": round(response.get('prompt_eval_count', 0) / prompt_eval_sec, 2) if prompt_eval_sec else "",
+        "gen_tok_per_sec": round(response.get('eval_count', 0) / eval_sec, 2) if eval_sec else "",
+    }
+
+
+def warm_up_ollama(model_name, ollama_host, ollama_options=None):
+    """
+    Loads the model into memory before the first real call and pins it
+    there for keep_alive, so load time is paid once per run.
+    """
+    options = dict(OLLAMA_DEFAULTS, **(ollama_options or {}))
+    client, _ = get_ollama_client(ollama_host, options["num_parallel"])
+    num_ctx = ollama_num_ctx(model_name, "", options)
     start_time = time.time()
     try:
-        response = client.chat(
+        response = client.generate(
             model=model_name,
-            messages=messages,
-            options={
-                "temperature": 0.7,
-                "num_predict": 4000
-            }
+            prompt="",
+            keep_alive=options["keep_alive"],
+            options={"num_ctx": num_ctx}
         )
     except Exception as e:
-        print(f"Ollama API call failed: {e}")
+        print(f"Ollama warm-up failed: {e}")
         raise
-    duration = time.time() - start_time
+    load_sec = (response.get('load_duration') or 0) / 1e9
+    print(f"Ollama model '{model_name}' loaded in {load_sec:.2f}s "
+          f"(warm-up {time.time() - start_time:.2f}s, keep_alive={options['keep_alive']}, num_ctx={num_ctx}).")
+
+
+def call_llama_api(prompt, model_name, ollama_host, params_data, ollama_options=None, max_tokens=None):
+    options = dict(OLLAMA_DEFAULTS, **(ollama_options or {}))
+    if max_tokens:
+        options["num_predict"] = max_tokens
+    client, slots = get_ollama_client(ollama_host, options["num_parallel"])
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+    num_ctx = ollama_num_ctx(model_name, prompt, options)
+
+    # Never queue more requests on the server than it has parallel slots
+    with slots:
+        start_time = time.time()
+        try:
+            response = client.chat(
+                model=model_name,
+                messages=messages,
+                keep_alive=options["keep_alive"],
+                options={
+                    "temperature": 0.7,
+                    "num_predict": options["num_predict"],
+                    "num_ctx": num_ctx
+                }
+            )
+        except Exception as e:
+            print(f"Ollama API call failed: {e}")
+            raise
+        duration = time.time() - start_time
     prompt_tokens = response.get('prompt_eval_count', 0)
     completion_tokens = response.get('eval_count', 0)
     total_tokens = prompt_tokens + completion_tokens
     generated_content = response['message']['content']
 
-    return {"choices": [{"message": {"content": generated_content}}]}, \
+    metrics = ollama_metrics(response)
+    # Ollama reports its own timings: the first token follows model load and prompt evaluation
+    ttft = ((response.get('load_duration') or 0) + (response.get('prompt_eval_duration') or 0)) / 1e9
+    print(f"🦙 Ollama: load {metrics['load_sec']}s, prompt eval {metrics['prompt_eval_tok_per_sec']} tok/s, "
+          f"generation {metrics['gen_tok_per_sec']} tok/s (num_ctx={num_ctx})")
+
+    return {"choices": [{"message": {"content": generated_content}}], "metrics": metrics,
+            "finish_reason": normalize_finish_reason(response.get('done_reason')),
+            "usage": usage_record(prompt_tokens, completion_tokens, total_tokens, duration,
+                                  ttft_sec=min(ttft, duration) if ttft else None)}, \
         (prompt_tokens, completion_tokens, total_tokens), duration
 
 
-def call_claude_api(prompt, api_key, model_name, params_data):
+def call_claude_api(prompt, api_key, model_name, params_data, max_tokens=None, stream=False):
     client = anthropic.Anthropic(api_key=api_key)
     messages = [
         {"role": "user", "content": prompt}
     ]
+    kwargs = {
+        "model": model_name,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
+        "temperature": 0.7,
+        "system": "You are a helpful assistant.",
+        "messages": messages
+    }
     start_time = time.time()
+    ttft = None
     try:
-        response = client.messages.create(
-            model=model_name,
-            max_tokens=4000,
-            temperature=0.7,
-            system="You are a helpful assistant.",
-            messages=messages
-        )
+        if stream:
+            with client.messages.stream(**kwargs) as message_stream:
+                for _ in message_stream.text_stream:
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                response = message_stream.get_final_message()
+        else:
+            response = client.messages.create(**kwargs)
     except Exception as e:
         print(f"Claude API call failed: {e}")
         raise
 
     duration = time.time() - start_time
     usage = response.usage
-    prompt_tokens = usage.input_tokens
+    # input_tokens excludes prompt-cache reads and writes; count them as prompt tokens like other providers
+    cached_tokens = getattr(usage, 'cache_read_input_tokens', None)
+    prompt_tokens = usage.input_tokens + (cached_tokens or 0) + (getattr(usage, 'cache_creation_input_tokens', None) or 0)
     completion_tokens = usage.output_tokens
     total_tokens = prompt_tokens + completion_tokens
     content = response.content[0].text if response.content else ""
 
-    return {"choices": [{"message": {"content": content}}]}, \
+    return {"choices": [{"message": {"content": content}}],
+            "finish_reason": normalize_finish_reason(response.stop_reason),
+            "usage": usage_record(prompt_tokens, completion_tokens, total_tokens, duration,
+                                  cached_tokens=cached_tokens, ttft_sec=ttft)}, \
         (prompt_tokens, completion_tokens, total_tokens), duration
 
 
-def call_llm_api(prompt, config, params_data, log_file_path=None):
+def call_llm_api(prompt, config, params_data, log_file_path=None, max_tokens=None):
+    """
+    Dispatches to the provider adapter for config['model']. max_tokens
+    overrides the adapter's default output limit. Returns
+    (response, (prompt, completion, total tokens), duration); response
+    carries a normalised "finish_reason" ("length" when truncated) and the
+    normalised usage record in "usage" (see usage_record). config["stream"]
+    streams OpenAI, Claude and Gemini calls to measure time to first token.
+    """
     model_name = config.get("model", "").lower()
     api_key = config.get("api_key")
+    stream = bool(config.get("stream"))
 
     if "claude" in model_name:
-        response, tokens, duration = call_claude_api(prompt, api_key, model_name, params_data)
+        response, tokens, duration = call_claude_api(prompt, api_key, model_name, params_data, max_tokens=max_tokens, stream=stream)
     elif "mistral" in model_name:
-        response, tokens, duration = call_mistral_api(prompt, api_key, params_data)
+        response, tokens, duration = call_mistral_api(prompt, api_key, model_name, params_data, max_tokens=max_tokens)
     elif "gpt" in model_name or model_name.startswith("o"):
-        response, tokens, duration = call_openai_api(prompt, api_key, model_name, params_data)
+        response, tokens, duration = call_openai_api(prompt, api_key, model_name, params_data, max_tokens=max_tokens, stream=stream)
     elif "gemini" in model_name:
         if not model_name.startswith("models/"):
             model_name = "models/" + model_name
-        response, tokens, duration = call_gemini_api(prompt, api_key, model_name, params_data)
+        response, tokens, duration = call_gemini_api(prompt, api_key, model_name, params_data, max_tokens=max_tokens, stream=stream)
     elif "llama" in model_name:
         ollama_host = config.get("ollama_host", "http://localhost:11434")
-        response, tokens, duration = call_llama_api(prompt, model_name, ollama_host, params_data)
+        response, tokens, duration = call_llama_api(
+            prompt, model_name, ollama_host, params_data, ollama_options=config.get("ollama"), max_tokens=max_tokens
+        )
     else:
         raise ValueError(f"Unsupported model: {model_name}")
 
     # Capture the formatted strings
     token_usage_str = f"🔢 {config.get('provider').capitalize()} Token Usage: Prompt={tokens[0]}, Completion={tokens[1]}, Total={tokens[2]}"
+    usage = response.get("usage") or {}
+    for key, label in (("cached_tokens", "Cached"), ("reasoning_tokens", "Reasoning")):
+        if usage.get(key):
+            token_usage_str += f", {label}={usage[key]}"
     duration_str = f"⏱️ Duration: {duration:.2f} seconds"
+    if usage.get("ttft_sec") is not None:
+        duration_str += f" (first token {usage['ttft_sec']:.2f}s)"
+    if usage.get("tok_per_sec"):
+        duration_str += f", {usage['tok_per_sec']:.1f} tok/s"
 
     # Print to console as a record
     print(token_usage_str)
@@ -0,0 +1,78 @@
+# Routes each LLM call to a model by stage, Bloom level and subject ("routing" rules in config.json)
+
+import threading
+
+from .config_loader import load_config
+
+_MODEL_CONFIGS = {}
+_MODEL_CONFIGS_LOCK = threading.Lock()
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [v.strip().lower() for v in value.split(',') if v.strip()]
+    return [str(v).strip().lower() for v in value]
+
+
+def rule_matches(rule, stage, bloom_level, subject):
+    """
+    A rule matches when each of its conditions (stage, bloom_level, subject)
+    is absent or holds. A call covering several Bloom levels only matches a
+    rule that lists all of them.
+    """
+    stages = _as_list(rule.get('stage'))
+    if stages and str(stage).lower() not in stages:
+        return False
+    subjects = _as_list(rule.get('subject'))
+    if subjects and str(subject).lower() not in subjects:
+        return False
+    levels = _as_list(rule.get('bloom_level'))
+    if levels:
+        call_levels = _as_list(bloom_level) or []
+        if not call_levels or any(level not in levels for level in call_levels):
+            return False
+    return True
+
+
+def route_model(config, stage, bloom_level=None, subject=None):
+    """
+    Returns (model, route) for a call: the model of the first matching rule
+    in config["routing"] and a label for the rule ("rule 2"), or
+    (config["model"], "default") if none matches.
+    """
+    for index, rule in enumerate(config.get('routing') or [], start=1):
+        if rule.get('model') and rule_matches(rule, stage, bloom_level, subject):
+            return rule['model'].lower(), f"rule {index}"
+    return config['model'], "default"
+
+
+def config_for_model(config, model):
+    """
+    The run's config with model, provider and API key switched to the routed
+    model. Provider configs are resolved once per model.
+    """
+    if model == config['model']:
+        return config
+    with _MODEL_CONFIGS_LOCK:
+        if model not in _MODEL_CONFIGS:
+            _MODEL_CONFIGS[model] = load_config(model)
+        resolved = _MODEL_CONFIGS[model]
+    return dict(config, model=resolved['model'], provider=resolved['provider'], api_key=resolved['api_key'])
+
+
+if __name__ == '__main__':
+    example = {
+        "model": "gpt-4o",
+        "routing": [
+            {"stage": "generate_questions", "model": "gpt-4o-mini"},
+            {"stage": "answer_rubric", "bloom_level": ["Remembering", "Understanding"], "model": "gpt-4o-mini"},
+            {"stage": "answer_rubric", "bloom_level": "Evaluating, Creating", "model": "claude-3-5-sonnet-latest"},
+        ],
+    }
+    for stage, level in [("generate_questions", "Remembering, Creating"),
+                         ("answer_rubric", "Understanding"),
+                         ("answer_rubric", "Creating"),
+                         ("answer_rubric", "Applying")]:
+        print(f"{stage:<20} {level:<24} -> {route_model(example, stage, level, 'biology')}")
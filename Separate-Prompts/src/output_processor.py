@@ -107,6 +107,27 @@ def save_questions_with_content(questions_data, filename):
     except IOError as e:
         print(f"Error saving file: {e}")
 
+def iter_qna_items(data, bloom_levels, current_level=None):
+    """
+    Walks the model's (free-form) JSON output and yields (bloom_level, qna) for
+    every object that carries a "question". The Bloom level is taken from the
+    nearest enclosing key that names a requested level, or from a "bloom_level" field.
+    bloom_levels may also be the comma-separated string from parameters.json.
+    """
+    if isinstance(bloom_levels, str):
+        bloom_levels = [b.strip() for b in bloom_levels.split(',') if b.strip()]
+    if isinstance(data, dict):
+        if 'question' in data:
+            yield data.get('bloom_level', current_level), data
+            return
+        for key, value in data.items():
+            level = key if key in bloom_levels else current_level
+            yield from iter_qna_items(value, bloom_levels, level)
+    elif isinstance(data, list):
+        for value in data:
+            yield from iter_qna_items(value, bloom_levels, current_level)
+
+
 # Example of how to use this function after getting a response from the LLM:
 #
 # # Assuming you have a response from the LLM after calling build_questions_prompt
@@ -0,0 +1,199 @@
+# Stage-graph pipeline engine: stages connected by bounded queues, each with its own concurrency
+
+import time
+import queue
+import threading
+import traceback
+
+_STOP = object()
+
+
+class Stage:
+    """
+    A pipeline stage.
+
+    fn(item, ctx) processes one item and returns an iterable of items for the
+    next stage (a list, a generator, or None to emit nothing). concurrency is
+    the number of worker threads; queue_size bounds the stage's input queue,
+    so a slow stage blocks its upstream (back-pressure).
+    """
+
+    def __init__(self, name, fn, concurrency=1, queue_size=16):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(1, int(concurrency))
+        self.queue_size = max(1, int(queue_size))
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, concurrency={self.concurrency})"
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+        self.emitted = 0
+        self.in_flight = 0
+        self.cancelled = 0
+        self.busy_sec = 0.0
+        self.errors = []
+
+    def as_dict(self):
+        return {
+            "received": self.received,
+            "completed": self.completed,
+            "failed": self.failed,
+            "emitted": self.emitted,
+            "in_flight": self.in_flight,
+            "cancelled": self.cancelled,
+            "busy_sec": round(self.busy_sec, 3),
+        }
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages. Each stage pulls from its own
+    bounded input queue with `concurrency` worker threads and pushes results
+    into the next stage's queue. Items that raise are counted as failed and
+    dropped; the rest of the run carries on.
+
+    listeners are called as listener(event, stage_name, payload) with events
+    "start", "done", "error" and "finish"; they must be thread-safe.
+
+    If ctx["cancel"] (a threading.Event) is set, items that reach a stage
+    afterwards are dropped unprocessed, so the run stops at the next stage
+    boundary.
+    """
+
+    def __init__(self, stages, listeners=None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self.stages = list(stages)
+        self.listeners = list(listeners or [])
+        self.stats = {s.name: StageStats(s.name) for s in self.stages}
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _emit(self, event, stage_name, payload=None):
+        for listener in self.listeners:
+            try:
+                listener(event, stage_name, payload)
+            except Exception as e:
+                print(f"Pipeline listener error ({event}/{stage_name}): {e}")
+
+    def run(self, inputs, ctx):
+        """
+        Feeds inputs into the first stage and blocks until every stage has
+        drained. Returns the items emitted by the last stage.
+        """
+        queues = [queue.Queue(maxsize=s.queue_size) for s in self.stages]
+        outputs = []
+        remaining = [s.concurrency for s in self.stages]
+        threads = []
+
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.concurrency):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(index, queues, outputs, remaining, ctx),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        for item in inputs:
+            queues[0].put(item)
+        for _ in range(self.stages[0].concurrency):
+            queues[0].put(_STOP)
+
+        for t in threads:
+            t.join()
+        self._emit("finish", None, self.summary())
+        return outputs
+
+    def _worker(self, index, queues, outputs, remaining, ctx):
+        stage = self.stages[index]
+        stats = self.stats[stage.name]
+        is_last = index == len(self.stages) - 1
+        cancel = ctx.get("cancel")
+        while True:
+            item = queues[index].get()
+            if item is _STOP:
+                break
+            if cancel is not None and cancel.is_set():
+                with self._lock:
+                    stats.received += 1
+                    stats.cancelled += 1
+                continue
+            with self._lock:
+                stats.received += 1
+                stats.in_flight += 1
+            self._emit("start", stage.name, item)
+            started = time.perf_counter()
+            try:
+                produced = list(stage.fn(item, ctx) or [])
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    stats.in_flight -= 1
+                    stats.failed += 1
+                    stats.busy_sec += elapsed
+                    stats.errors.append(str(e))
+                print(f"[{stage.name}] failed: {e}")
+                if ctx.get("debug"):
+                    traceback.print_exc()
+                self._emit("error", stage.name, {"item": item, "error": str(e), "duration_sec": elapsed})
+                continue
+
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats.in_flight -= 1
+                stats.completed += 1
+                stats.emitted += len(produced)
+                stats.busy_sec += elapsed
+            self._emit("done", stage.name, {"item": item, "emitted": len(produced), "duration_sec": elapsed})
+
+            for out in produced:
+                if is_last:
+                    with self._lock:
+                        outputs.append(out)
+                else:
+                    queues[index + 1].put(out)
+
+        # The last worker of a stage to finish shuts down the next stage
+        with self._lock:
+            remaining[index] -= 1
+            last_out = remaining[index] == 0
+        if last_out and not is_last:
+            for _ in range(self.stages[index + 1].concurrency):
+                queues[index + 1].put(_STOP)
+
+    def summary(self):
+        with self._lock:
+            return {name: s.as_dict() for name, s in self.stats.items()}
+
+    def print_summary(self):
+        print(f"{'Stage':<20} {'Done':>6} {'Failed':>6} {'Out':>6} {'Busy s':>8}")
+        for name, s in self.summary().items():
+            print(f"{name:<20} {s['completed']:>6} {s['failed']:>6} {s['emitted']:>6} {s['busy_sec']:>8.2f}")
+
+
+def build_pipeline(graph, config, listeners=None):
+    """
+    Builds a Pipeline from a graph declaration: a list of
+    (stage_name, fn, default_concurrency) tuples. Concurrency and queue size
+    can be overridden per stage in config ("stage_concurrency",
+    "stage_queue_size").
+    """
+    concurrency = config.get("stage_concurrency", {})
+    queue_sizes = config.get("stage_queue_size", {})
+    stages = [
+        Stage(name, fn, concurrency.get(name, default), queue_sizes.get(name, 16))
+        for name, fn, default in graph
+    ]
+    return Pipeline(stages, listeners)
@@ -0,0 +1,30 @@
+# Call costs from the 'prices' config: {model or name prefix: {"input": $/1M tokens, "output": $/1M tokens}}
+
+
+def price_for(model, prices):
+    """
+    Looks up a model's {"input": $/1M tokens, "output": $/1M tokens} entry.
+    Falls back to the longest configured name that prefixes the model.
+    """
+    prices = prices or {}
+    if model in prices:
+        return prices[model]
+    candidates = [name for name in prices if model.startswith(name)]
+    if candidates:
+        return prices[max(candidates, key=len)]
+    return None
+
+
+def call_costs(model, prompt_tokens, completion_tokens, prices):
+    """(input cost, output cost) of a call in dollars, or None if the model has no price."""
+    price = price_for(model, prices)
+    if not price:
+        return None
+    return (prompt_tokens * price.get("input", 0) / 1_000_000,
+            completion_tokens * price.get("output", 0) / 1_000_000)
+
+
+def call_cost(model, prompt_tokens, completion_tokens, prices):
+    """Total cost of a call in dollars, or None if the model has no price."""
+    costs = call_costs(model, prompt_tokens, completion_tokens, prices)
+    return sum(costs) if costs else None
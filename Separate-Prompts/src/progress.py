@@ -0,0 +1,188 @@
+# Live progress for long runs: a pipeline listener that aggregates stage events and LLM calls
+
+import os
+import json
+import time
+import datetime
+import threading
+from collections import deque
+
+from .pricing import call_cost
+from .token_budget import percentile
+
+PROGRESS_DEFAULTS = {
+    "enabled": True,
+    "interval_sec": 5,
+    "window": 200,
+}
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class ProgressReporter:
+    """
+    Listener for Pipeline events plus a hook for LLM calls (record_call).
+
+    Keeps completed/failed/in-flight counts and a rolling window of
+    latencies per stage, token throughput and spend. While running it
+    prints a one-line status and rewrites status_file (JSON) every
+    interval_sec. stage_names fixes the stage order (the last stage's
+    completions count as finished items); the ETA needs expected_items.
+    """
+
+    def __init__(self, stage_names=(), status_file=None, expected_items=None, prices=None, interval_sec=5, window=200):
+        self.status_file = status_file
+        self.expected_items = expected_items
+        self.prices = prices or {}
+        self.interval_sec = interval_sec
+        self.window = window
+        self.started = time.time()
+        self.stages = {}
+        self.calls = {"in_flight": 0, "completed": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                      "cost": 0.0, "unpriced_calls": 0, "latencies": deque(maxlen=window)}
+        self.finished = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for name in stage_names:
+            self._stage(name)
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {"completed": 0, "failed": 0, "in_flight": 0,
+                                 "latencies": deque(maxlen=self.window)}
+        return self.stages[name]
+
+    # ------------------------------------------------------------------
+    # Event sources
+    # ------------------------------------------------------------------
+    def __call__(self, event, stage_name, payload):
+        with self._lock:
+            if event == "finish":
+                self.finished = True
+            elif event == "start":
+                self.finished = False
+                self._stage(stage_name)["in_flight"] += 1
+            elif event in ("done", "error"):
+                stage = self._stage(stage_name)
+                stage["in_flight"] -= 1
+                stage["completed" if event == "done" else "failed"] += 1
+                stage["latencies"].append(payload.get("duration_sec", 0.0))
+        if event == "finish":
+            self.write_status()
+
+    def call_started(self):
+        with self._lock:
+            self.calls["in_flight"] += 1
+
+    def record_call(self, model, prompt_tokens, completion_tokens, duration_sec, failed=False):
+        cost = call_cost(model, prompt_tokens, completion_tokens, self.prices)
+        with self._lock:
+            calls = self.calls
+            calls["in_flight"] -= 1
+            if failed:
+                calls["failed"] += 1
+                return
+            calls["completed"] += 1
+            calls["prompt_tokens"] += prompt_tokens or 0
+            calls["completion_tokens"] += completion_tokens or 0
+            calls["latencies"].append(duration_sec)
+            if cost is None:
+                calls["unpriced_calls"] += 1
+            else:
+                calls["cost"] += cost
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def snapshot(self):
+        """The status document written to status_file."""
+        now = time.time()
+        elapsed = max(now - self.started, 1e-6)
+
+        def latency(values):
+            values = sorted(values)
+            if not values:
+                return {"p50": None, "p95": None}
+            return {"p50": round(percentile(values, 0.5), 3), "p95": round(percentile(values, 0.95), 3)}
+
+        with self._lock:
+            stages = {
+                name: {"completed": s["completed"], "failed": s["failed"], "in_flight": s["in_flight"],
+                       "latency_sec": latency(s["latencies"])}
+                for name, s in self.stages.items()
+            }
+            calls = dict(self.calls, latency_sec=latency(self.calls["latencies"]))
+            del calls["latencies"]
+            last = list(self.stages)[-1] if self.stages else None
+            done_items = self.stages[last]["completed"] if last else 0
+            finished = self.finished
+
+        eta = None
+        if finished:
+            eta = 0
+        elif self.expected_items and done_items:
+            eta = (self.expected_items - done_items) * elapsed / done_items
+        calls["cost"] = round(calls["cost"], 6)
+        return {
+            "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "elapsed_sec": round(elapsed, 1),
+            "finished": finished,
+            "items_done": done_items,
+            "items_expected": self.expected_items,
+            "eta_sec": round(max(eta, 0), 1) if eta is not None else None,
+            "tokens_per_sec": round((calls["prompt_tokens"] + calls["completion_tokens"]) / elapsed, 1),
+            "completion_tokens_per_sec": round(calls["completion_tokens"] / elapsed, 1),
+            "calls": calls,
+            "stages": stages,
+        }
+
+    def status_line(self, snap=None):
+        snap = snap or self.snapshot()
+        in_flight = ", ".join(f"{name} {s['in_flight']}" for name, s in snap["stages"].items() if s["in_flight"])
+        failed = sum(s["failed"] for s in snap["stages"].values())
+        lat = snap["calls"]["latency_sec"]
+        expected = f"/{snap['items_expected']}" if snap["items_expected"] else ""
+        spend = f"${snap['calls']['cost']:.4f}" + ("+" if snap["calls"]["unpriced_calls"] else "")
+        return (f"[progress] {snap['items_done']}{expected} items, {failed} failed | "
+                f"in flight: {in_flight or 'none'} | calls {snap['calls']['completed']} "
+                f"(p50 {lat['p50'] or 0:.1f}s, p95 {lat['p95'] or 0:.1f}s) | "
+                f"{snap['tokens_per_sec']:.0f} tok/s | {spend} | "
+                f"ETA {format_duration(snap['eta_sec'])}")
+
+    def write_status(self, snap=None):
+        if not self.status_file:
+            return
+        snap = snap or self.snapshot()
+        os.makedirs(os.path.dirname(os.path.abspath(self.status_file)), exist_ok=True)
+        # Written to a temporary file and renamed, so a poller never reads half a document
+        tmp = f"{self.status_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(snap, f, indent=2)
+        os.replace(tmp, self.status_file)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_sec):
+            snap = self.snapshot()
+            print(self.status_line(snap))
+            self.write_status(snap)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        snap = self.snapshot()
+        self.write_status(snap)
+        print(self.status_line(snap))
@@ -0,0 +1,211 @@
+# Offline prompt-size benchmark: builds every prompt for a curriculum mapping and counts tokens locally
+
+import os
+import re
+import math
+import json
+import time
+import argparse
+import datetime
+
+from .config_loader import read_config_file
+from .data_loader import (
+    DATA_DIR, load_json_safe_from_subject, load_glossary_verbs, find_subtopic_text, find_focused_context, find_mapping_file
+)
+from .book_ingest import load_mapping
+from .prompt_builder import build_prompt, build_questions_prompt, build_level_questions_prompt, build_AnswerRubrics_prompt
+from .prompt_render import DEFAULT_SECTION_FORMAT, SECTION_FORMATS, count_tokens, has_tiktoken
+from .prompt_sections import section_manifest
+
+PROMPT_KINDS = ("single", "questions", "level_questions", "answer_rubric")
+DEFAULT_BASELINE = os.path.join(DATA_DIR, 'prompt_bench_baseline.json')
+
+
+def representative_question(subtopic, bloom_level, verbs):
+    """A fixed Step 2 question per subtopic and level, so runs are comparable."""
+    verb = re.sub(r"\(.*?\)", "", verbs[0]).strip() if verbs else "Explain"
+    return f"{verb} the key ideas of {subtopic.lower()} using an example."
+
+
+def build_all(subject, mapping, bloom_levels, section_format, num_questions=4):
+    """
+    Yields (kind, topic, subtopic, bloom_level, prompt, build_sec) for every
+    prompt the pipelines would send for each mapping row and Bloom level.
+    """
+    textbook = load_json_safe_from_subject(subject, 'book.json')
+    curriculum = load_json_safe_from_subject(subject, 'curriculum.json')
+    examples = load_json_safe_from_subject(subject, 'examples.json')
+    rubrics = load_json_safe_from_subject(subject, 'rubrics.json')
+    verbs_by_level = load_glossary_verbs(subject).get("glossary_verbs_by_bloom_level", {})
+
+    for topic, subtopic in mapping:
+        subtopic_text = find_subtopic_text(textbook, subtopic) or ""
+        for level in bloom_levels:
+            params = {"subject": subject, "grade_level": "16-18", "topic": topic, "subtopic": subtopic,
+                      "bloom_level": level, "num_questions": num_questions}
+            question = representative_question(subtopic, level, verbs_by_level.get(level))
+            builders = {
+                "single": lambda: build_prompt(params, textbook, curriculum, examples, rubrics,
+                                               section_format=section_format),
+                "questions": lambda: build_questions_prompt(params, textbook, curriculum, examples, None,
+                                                            section_format=section_format),
+                "level_questions": lambda: build_level_questions_prompt(params, textbook, curriculum, examples,
+                                                                        level, section_format=section_format),
+                "answer_rubric": lambda: build_AnswerRubrics_prompt(
+                    question, level, find_focused_context(question, subtopic_text), rubrics,
+                    section_format=section_format),
+            }
+            for kind in PROMPT_KINDS:
+                start = time.perf_counter()
+                prompt = builders[kind]()
+                yield kind, topic, subtopic, level, prompt, time.perf_counter() - start
+
+
+def run_benchmark(subject, mapping, bloom_levels, models, section_format):
+    """Returns the benchmark document: one record per prompt with its token count for each model."""
+    prompts = []
+    for kind, topic, subtopic, level, prompt, build_sec in build_all(subject, mapping, bloom_levels, section_format):
+        prompts.append({
+            "key": f"{kind}|{topic}|{subtopic}|{level}",
+            "kind": kind,
+            "subtopic": subtopic,
+            "bloom_level": level,
+            "chars": len(prompt),
+            "build_ms": round(build_sec * 1000, 3),
+            "tokens": {model: count_tokens(prompt, model) for model in models},
+            "sections": {model: {entry["section"]: entry["tokens"] for entry in section_manifest(prompt, model)}
+                         for model in models},
+        })
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "subject": subject,
+        "section_format": section_format,
+        "tokenizer": "tiktoken" if has_tiktoken() else "estimate",
+        "models": models,
+        "prompts": prompts,
+    }
+
+
+def distribution(values):
+    values = sorted(values)
+    if not values:
+        return {"n": 0, "mean": 0, "p95": 0, "max": 0, "total": 0}
+    # Nearest-rank p95, as in token_budget (not imported here so no provider SDK is needed)
+    p95 = values[max(1, math.ceil(0.95 * len(values))) - 1]
+    return {"n": len(values), "mean": sum(values) / len(values), "p95": p95,
+            "max": values[-1], "total": sum(values)}
+
+
+def print_report(bench, top=10):
+    models = bench["models"]
+    prompts = bench["prompts"]
+    print(f"{len(prompts)} prompts, format={bench['section_format']}, "
+          f"tokens {'from tiktoken' if bench['tokenizer'] == 'tiktoken' else 'estimated (tiktoken not installed)'}")
+
+    print(f"\n{'Prompt':<16} {'Model':<20} {'N':>5} {'Mean':>8} {'p95':>7} {'Max':>7} {'Total':>10} {'Build ms':>9}")
+    for kind in PROMPT_KINDS:
+        rows = [p for p in prompts if p["kind"] == kind]
+        build_ms = sum(p["build_ms"] for p in rows) / len(rows) if rows else 0
+        for model in models:
+            d = distribution([p["tokens"][model] for p in rows])
+            print(f"{kind:<16} {str(model):<20} {d['n']:>5} {d['mean']:>8.0f} {d['p95']:>7} {d['max']:>7} "
+                  f"{d['total']:>10} {build_ms:>9.2f}")
+
+    # Where each prompt type's tokens go, for the first model
+    model = models[0]
+    print(f"\nTokens per section ({model}):")
+    print(f"{'Prompt':<16} {'Section':<18} {'Mean':>8} {'Share':>7}")
+    for kind in PROMPT_KINDS:
+        rows = [p["sections"][model] for p in prompts if p["kind"] == kind and "sections" in p]
+        totals = {}
+        for row in rows:
+            for section, tokens in row.items():
+                totals[section] = totals.get(section, 0) + tokens
+        overall = sum(totals.values()) or 1
+        for section, tokens in sorted(totals.items(), key=lambda kv: -kv[1]):
+            print(f"{kind:<16} {section:<18} {tokens / len(rows):>8.0f} {100 * tokens / overall:>6.1f}%")
+
+    # Per subtopic: every prompt it needs across Bloom levels, for the first model
+    by_subtopic = {}
+    for p in prompts:
+        by_subtopic.setdefault(p["subtopic"], []).append(p["tokens"][model])
+    print(f"\nLargest subtopics ({model}):")
+    print(f"{'Subtopic':<60} {'Mean':>8} {'p95':>7} {'Max':>7} {'Total':>9}")
+    ranked = sorted(by_subtopic.items(), key=lambda kv: -sum(kv[1]))
+    for subtopic, values in ranked[:top]:
+        d = distribution(values)
+        print(f"{subtopic[:60]:<60} {d['mean']:>8.0f} {d['p95']:>7} {d['max']:>7} {d['total']:>9}")
+
+
+def print_diff(bench, baseline, top=10):
+    """Compares token counts with a saved baseline, per prompt kind and per prompt."""
+    old = {p["key"]: p for p in baseline["prompts"]}
+    models = [m for m in bench["models"] if m in baseline["models"]]
+    if not models:
+        print(f"\nBaseline ({baseline['created_at']}) has none of the models {bench['models']}; nothing to compare.")
+        return
+    if baseline.get("tokenizer") != bench["tokenizer"]:
+        print(f"\nWarning: the baseline was counted with {baseline.get('tokenizer')}, this run with {bench['tokenizer']}.")
+
+    print(f"\nAgainst baseline from {baseline['created_at']} (format={baseline.get('section_format')}):")
+    print(f"{'Prompt':<16} {'Model':<20} {'Before':>10} {'After':>10} {'Change':>9}")
+    for kind in PROMPT_KINDS:
+        for model in models:
+            pairs = [(old[p["key"]]["tokens"][model], p["tokens"][model])
+                     for p in bench["prompts"] if p["kind"] == kind and p["key"] in old]
+            before, after = sum(b for b, _ in pairs), sum(a for _, a in pairs)
+            change = 100 * (after - before) / before if before else 0.0
+            print(f"{kind:<16} {str(model):<20} {before:>10} {after:>10} {change:>+8.1f}%")
+
+    model = models[0]
+    changed = sorted(
+        ((p["tokens"][model] - old[p["key"]]["tokens"][model], p["key"]) for p in bench["prompts"] if p["key"] in old),
+        key=lambda dk: -abs(dk[0]),
+    )
+    changed = [(delta, key) for delta, key in changed if delta][:top]
+    if changed:
+        print(f"\nLargest per-prompt changes ({model}):")
+        for delta, key in changed:
+            print(f"{delta:>+7}  {key}")
+    added = sum(1 for p in bench["prompts"] if p["key"] not in old)
+    removed = len(old.keys() - {p["key"] for p in bench["prompts"]})
+    if added or removed:
+        print(f"{added} prompts not in the baseline, {removed} baseline prompts no longer built.")
+
+
+def main():
+    config = read_config_file()
+    default_models = config.get('sweep_models') or [config.get('model') or "gpt-4o"]
+    parser = argparse.ArgumentParser(
+        description="Build every prompt for a curriculum mapping and count tokens locally (no API calls)."
+    )
+    parser.add_argument("--mapping", help="CSV with cur_topic,cur_subtopic columns (defaults to the subject's mapping.csv).")
+    parser.add_argument("--subject", default="biology")
+    parser.add_argument("--bloom-levels", help="Comma-separated levels (default: every level in GlossaryVerbs.json).")
+    parser.add_argument("--models", nargs="+", default=default_models, help="Models whose tokenizers to count with.")
+    parser.add_argument("--format", default=config.get('prompt_format') or DEFAULT_SECTION_FORMAT,
+                        choices=SECTION_FORMATS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Saved benchmark to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Save this run as the new baseline.")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.bloom_levels:
+        bloom_levels = [b.strip() for b in args.bloom_levels.split(',') if b.strip()]
+    else:
+        bloom_levels = list(load_glossary_verbs(args.subject).get("glossary_verbs_by_bloom_level", {}))
+
+    bench = run_benchmark(args.subject, load_mapping(args.mapping or find_mapping_file(args.subject)), bloom_levels, args.models, args.format)
+    print_report(bench, args.top)
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            print_diff(bench, json.load(f), args.top)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(bench, f, indent=1)
+        print(f"\nBaseline saved to {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
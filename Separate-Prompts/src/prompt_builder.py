@@ -1,8 +1,22 @@
 from .data_loader import find_subtopic_text, find_topic_text,get_verbs_for_bloom_level
+from .prompt_render import render_section
+from .prompt_sections import with_sections
 
-def build_questions_prompt(params, textbook_data, curriculum_data, examples_data, glossary_verbs):
+# Fixed rubric-writing guidance of the answer/rubric prompt
+RUBRIC_PRINCIPLES = """When generating the rubric and answers, strictly follow these core principles:
+1. Alignment with Learning Objectives: Each criterion must map directly to a learning outcome. Use Bloom's verbs for clarity.
+2. Clarity and Specificity: Use precise, observable indicators; limit to 4–8 criteria and 3–5 performance levels.
+3. Descriptive Performance Levels: Use detailed, developmental language showing growth.
+4. Validity, Reliability, and Fairness: Ensure the rubric is valid, reliable, and transparent.
+5. Logical Progression: Each level reflects a meaningful step up, framed as stages of mastery.
+6. Concise but Complete: Focus on critical elements; test and revise as needed.
+7. Rubric Format: Prefer Analytic, Holistic, or Single-point based on the use case."""
+
+
+def build_questions_prompt(params, textbook_data, curriculum_data, examples_data, glossary_verbs, section_format=None):
     """
     Constructs the prompt string for the LLM to generate questions, grouped by Bloom's level.
+    Structured sections are serialised with render_section (section_format "json", "terse" or "repr").
     """
     subject = params.get('subject', 'Unknown Subject')
     bloomlevels_raw = params.get('bloom_level', "Analyzing")  # e.g., "Creating, Evaluating"
@@ -20,6 +34,8 @@ def build_questions_prompt(params, textbook_data, curriculum_data, examples_data
     example_qas = examples_data.get(subtopic) or []
     # Keep JSON example outside the f-string to avoid brace escaping issues
     json_example = """ ... """  # same as yours
+    examples_section = render_section(example_qas, section_format)
+    verbs_section = render_section(glossary_verbs, section_format)
 
     prompt = f"""
 You are an expert curriculum designer.
@@ -39,9 +55,9 @@ Each question must:
 Context:
 - Textbook Content: {textbook_content}
 - Curriculum Guidance: {curriculum_content}
-- Example Q&As: {example_qas}
+- Example Q&As: {examples_section}
 - User Keywords: {user_keywords}
-- Glossary Verbs for Bloom level "{', '.join(bloom_levels)}": {glossary_verbs}
+- Glossary Verbs for Bloom level "{', '.join(bloom_levels)}": {verbs_section}
 
 Format your output as a valid JSON object.
 Each question must include:
@@ -50,10 +66,63 @@ Each question must include:
 
 {json_example}
 """
-    return prompt.strip()
+    return with_sections(prompt.strip(), textbook=textbook_content, curriculum=curriculum_content,
+                         examples=examples_section, user_keywords=user_keywords, glossary_verbs=verbs_section)
 
 
-def build_AnswerRubrics_prompt(question, bloom_level, focused_context, rubric_structre):
+def build_level_questions_prompt(params, textbook_data, curriculum_data, examples_data, bloom_level, section_format=None):
+    """
+    Constructs the question prompt for a single Bloom level. Everything
+    except the last paragraph is identical for every level of a request, so
+    parallel per-level calls share a prefix that providers can cache.
+    """
+    subject = params.get('subject', 'Unknown Subject')
+    num_questions = params.get('num_questions')
+    grade_level = params.get('grade_level', 'Unknown Grade')
+    topic = params.get('topic', 'Unknown Topic')
+    subtopic = params.get('subtopic', 'Unknown Subtopic')
+    user_keywords = params.get('user_keywords', '')
+    textbook_content = find_subtopic_text(textbook_data, subtopic) or "Use general knowledge."
+    curriculum_content = find_topic_text(curriculum_data, topic) or "Use curriculum expectations."
+    example_qas = examples_data.get(subtopic) or []
+    level_verbs = get_verbs_for_bloom_level(bloom_level, subject)
+    examples_section = render_section(example_qas, section_format)
+    verbs_section = render_section(level_verbs, section_format)
+
+    prompt = f"""
+You are an expert curriculum designer.
+Using the following context, generate questions for the Bloom's Taxonomy level given at the end.
+
+Each question must:
+- Be appropriate for Subject: {subject}, Grade: {grade_level}
+- Focus on the Topic: {topic} and Subtopic: {subtopic}
+- Be fully self-contained and **must never** mention or reference a textbook, passage, context, or guidance in the wording.
+- Use the textbook/curriculum content internally to create the question, but keep that hidden from students.
+- Always include the supporting "source_text" (the exact sentence/paragraph from the textbook or curriculum used).
+- "source_text" must always be a single string (if multiple relevant points, join them with ' | ').
+- If no supporting content is available, skip generating the question.
+- Do NOT add explanations, examples, or reasoning outside the required fields.
+- Ensure questions use clear, age-appropriate language for students under 18.
+
+Context:
+- Textbook Content: {textbook_content}
+- Curriculum Guidance: {curriculum_content}
+- Example Q&As: {examples_section}
+- User Keywords: {user_keywords}
+
+Format your output as a valid JSON object with the Bloom level as its only key, mapping to a list of questions.
+Each question must include:
+- "question": the student-facing question (self-contained, no references to text/context)
+- "source_text": the exact snippet from textbook/curriculum that supports it (hidden from students)
+
+Bloom level: generate exactly {num_questions} questions for the Bloom's Taxonomy level "{bloom_level}", using the glossary verbs {verbs_section}.
+Output shape: {{"questions": {{"{bloom_level}": [{{"question": "...", "source_text": "..."}}]}}}}
+"""
+    return with_sections(prompt.strip(), textbook=textbook_content, curriculum=curriculum_content,
+                         examples=examples_section, user_keywords=user_keywords, glossary_verbs=verbs_section)
+
+
+def build_AnswerRubrics_prompt(question, bloom_level, focused_context, rubric_structre, section_format=None):
     """
     Constructs the prompt string for the LLM to generate an answer and rubric for a single question.
     The answer must ONLY use the provided focused_context.
@@ -87,6 +156,8 @@ def build_AnswerRubrics_prompt(question, bloom_level, focused_context, rubric_st
 }
 """
 
+    rubric_section = render_section(rubric_structre, section_format)
+
     prompt = f"""
 You are an expert educator and grader.
 Given the following question and Bloom's Taxonomy level, generate a detailed answer and a 4-level rubric.
@@ -98,14 +169,7 @@ Do NOT add explanations, examples, or extra reasoning beyond what is requested.
 - The rubric must be objective, transparent, and aligned with Bloom’s verbs.
 - Do not include subjective, biased, or culturally sensitive assumptions.
 
-When generating the rubric and answers, strictly follow these core principles:
-1. Alignment with Learning Objectives: Each criterion must map directly to a learning outcome. Use Bloom's verbs for clarity.
-2. Clarity and Specificity: Use precise, observable indicators; limit to 4–8 criteria and 3–5 performance levels.
-3. Descriptive Performance Levels: Use detailed, developmental language showing growth.
-4. Validity, Reliability, and Fairness: Ensure the rubric is valid, reliable, and transparent.
-5. Logical Progression: Each level reflects a meaningful step up, framed as stages of mastery.
-6. Concise but Complete: Focus on critical elements; test and revise as needed.
-7. Rubric Format: Prefer Analytic, Holistic, or Single-point based on the use case.
+{RUBRIC_PRINCIPLES}
 
 
 
@@ -114,12 +178,246 @@ Bloom's Taxonomy Level: {bloom_level}
 
 Context:
 - Textbook Content: {focused_context}
-- Rubric Structure: {rubric_structre}
+- Rubric Structure: {rubric_section}
 
 Format your output as valid JSON using the structure below:
 
 {rubric_example}
 
 Do not include any extra text or markdown.
+"""
+    return with_sections(prompt.strip(), rubric_principles=RUBRIC_PRINCIPLES, question=question,
+                         focused_context=focused_context, rubric_structure=rubric_section,
+                         output_format=rubric_example.strip())
+
+
+def build_answer_prompt(question, bloom_level, focused_context, section_format=None):
+    """
+    Constructs the Step 2 prompt for an answer only (lazy rubrics): the
+    rubric is generated later with build_rubric_prompt, if it is ever needed.
+    """
+    prompt = f"""
+You are an expert educator.
+Given the following question and Bloom's Taxonomy level, generate a detailed answer.
+The answer must be based **only on the provided context** (do not invent information outside it).
+The answer must be aligned with the question's difficulty and the specified Bloom's Taxonomy level, and must not be too complex.
+Do NOT add explanations, examples, or extra reasoning beyond what is requested.
+- Make sure the answer is written in age-appropriate language for students under 18.
+- Do not include subjective, biased, or culturally sensitive assumptions.
+
+Question: {question}
+Bloom's Taxonomy Level: {bloom_level}
+
+Context:
+- Textbook Content: {focused_context}
+
+Format your output as valid JSON: {{"question": "...", "answer": "..."}}
+Do not include any extra text or markdown.
+"""
+    return with_sections(prompt.strip(), question=question, focused_context=focused_context)
+
+
+def build_rubric_prompt(question, bloom_level, focused_context, answer, rubric_structre, section_format=None):
+    """
+    Constructs the prompt for the 4-level rubric of a question that already
+    has an answer (lazy rubrics, generated on first request).
+    """
+    rubric_section = render_section(rubric_structre, section_format)
+    answer_section = render_section(answer, section_format)
+
+    prompt = f"""
+You are an expert educator and grader.
+Given the following question, its Bloom's Taxonomy level and its reference answer, generate a 4-level rubric.
+The rubric should be aligned with the question's difficulty, the specified Bloom's Taxonomy level and the reference answer.
+The rubric must not be too complex.
+Do NOT add explanations, examples, or extra reasoning beyond what is requested. Only provide the JSON fields exactly as specified.
+- Make sure the rubric is written in age-appropriate language for students under 18.
+- The rubric must be objective, transparent, and aligned with Bloom’s verbs.
+- Do not include subjective, biased, or culturally sensitive assumptions.
+
+{RUBRIC_PRINCIPLES}
+
+Question: {question}
+Bloom's Taxonomy Level: {bloom_level}
+Reference Answer: {answer_section}
+
+Context:
+- Textbook Content: {focused_context}
+- Rubric Structure: {rubric_section}
+
+Format your output as valid JSON: {{"rubric": {{"levels": [{{"level": "Comprehensive Response", "description": "..."}}, {{"level": "Competent Response", "description": "..."}}, {{"level": "Partial Response", "description": "..."}}, {{"level": "Limited Response", "description": "..."}}]}}}}
+Do not include any extra text or markdown.
+"""
+    return with_sections(prompt.strip(), rubric_principles=RUBRIC_PRINCIPLES, question=question,
+                         answer=answer_section, focused_context=focused_context, rubric_structure=rubric_section)
+
+
+def build_rubric_skeleton_prompt(params, bloom_level, level_verbs, rubric_structre, section_format=None):
+    """
+    Constructs the prompt for a rubric skeleton: the 4 level descriptions
+    shared by every question of a subtopic and Bloom level. Per-question
+    calls then only add criteria (see build_answer_criteria_prompt).
+    """
+    subject = params.get('subject', 'Unknown Subject')
+    grade_level = params.get('grade_level', 'Unknown Grade')
+    topic = params.get('topic', 'Unknown Topic')
+    subtopic = params.get('subtopic', 'Unknown Subtopic')
+    verbs_section = render_section(level_verbs, section_format)
+    rubric_section = render_section(rubric_structre, section_format)
+
+    prompt = f"""
+You are an expert educator and grader.
+Write a 4-level rubric that applies to ANY question at the Bloom's Taxonomy level "{bloom_level}" on this subtopic.
+Do not refer to a specific question; describe what each level of performance looks like for this subtopic and Bloom level.
+- Be appropriate for Subject: {subject}, Grade: {grade_level}
+- Focus on the Topic: {topic} and Subtopic: {subtopic}
+- Make sure the rubric is written in age-appropriate language for students under 18.
+- The rubric must be objective, transparent, and aligned with Bloom’s verbs.
+
+{RUBRIC_PRINCIPLES}
+
+Context:
+- Glossary Verbs for Bloom level "{bloom_level}": {verbs_section}
+- Rubric Structure: {rubric_section}
+
+Format your output as valid JSON: {{"rubric": {{"levels": [{{"level": "Comprehensive Response", "description": "..."}}, {{"level": "Competent Response", "description": "..."}}, {{"level": "Partial Response", "description": "..."}}, {{"level": "Limited Response", "description": "..."}}]}}}}
+Do not include any extra text or markdown.
+"""
+    return with_sections(prompt.strip(), rubric_principles=RUBRIC_PRINCIPLES, glossary_verbs=verbs_section,
+                         rubric_structure=rubric_section)
+
+
+def build_answer_criteria_prompt(question, bloom_level, focused_context, skeleton, section_format=None):
+    """
+    Constructs the Step 2 prompt for rubric skeleton mode: the answer plus
+    one short question-specific criterion per rubric level. The full rubric
+    is assembled locally from the skeleton and these criteria.
+    """
+    skeleton_section = render_section(skeleton, section_format)
+
+    prompt = f"""
+You are an expert educator and grader.
+Given the following question and Bloom's Taxonomy level, generate a detailed answer and, for each level of the shared rubric below, one short criterion specific to this question.
+The answer must be based **only on the provided context** (do not invent information outside it).
+Answer and criteria must not be too complex. Each criterion is one sentence naming what a response at that level contains for THIS question; do not repeat the shared description.
+- Make sure the answer and criteria are written in age-appropriate language for students under 18.
+- Do not include subjective, biased, or culturally sensitive assumptions.
+
+Question: {question}
+Bloom's Taxonomy Level: {bloom_level}
+
+Context:
+- Textbook Content: {focused_context}
+- Shared Rubric: {skeleton_section}
+
+Format your output as valid JSON: {{"question": "...", "answer": "...", "criteria": {{"<rubric level>": "...", ...}}}}
+Use the level names of the shared rubric as the keys of "criteria". Do not include any extra text or markdown.
+"""
+    return with_sections(prompt.strip(), question=question, focused_context=focused_context,
+                         rubric_skeleton=skeleton_section)
+
+
+def build_grading_prefix(question, bloom_level, reference_answer, rubric, section_format=None):
+    """
+    Constructs the static part of a grading prompt for one question: the
+    instructions, reference answer and rubric. It is the same for every batch
+    of responses to that question, so it is built once and can be cached by providers.
+    """
+    prompt = f"""
+You are an experienced, fair examiner grading student answers with a 4-level rubric.
+For each student response, choose the single rubric level it best matches, based only on the rubric and the reference answer.
+Judge the content, not spelling or grammar. Do not reward length. A blank or off-topic response is at the lowest level.
+Feedback must be one or two sentences addressed to the student, in age-appropriate language for students under 18.
+
+Question: {question}
+Bloom's Taxonomy Level: {bloom_level}
+Reference Answer: {render_section(reference_answer, section_format)}
+Rubric: {render_section(rubric, section_format)}
+
+Format your output as valid JSON: {{"grades": [{{"response_id": "...", "level": "<rubric level name>", "feedback": "..."}}]}}
+Include exactly one entry for every response_id below. Do not include any extra text or markdown.
 """
     return prompt.strip()
+
+
+def build_grading_prompt(prefix, responses):
+    """Appends a batch of student responses ({"response_id", "answer"} dicts) to a grading prefix."""
+    lines = "\n".join(
+        f"- response_id: {r['response_id']}\n  answer: {' '.join(str(r.get('answer') or '').split())}"
+        for r in responses
+    )
+    return f"{prefix}\n\nStudent responses:\n{lines}"
+
+
+def build_prompt(params, textbook_data, curriculum_data, examples_data, rubric_data, section_format=None):
+    """
+    Constructs the single-call prompt (questions, answers and rubrics for every
+    Bloom level at once), as used by the Single-Prompt strategy.
+    """
+    bloom_levels_raw = params.get('bloom_level', '')
+    bloom_levels = [b.strip() for b in bloom_levels_raw.split(',') if b.strip()]
+
+    subject = params.get('subject', 'Unknown Subject')
+    grade_level = params.get('grade_level', 'Unknown Grade')
+    topic = params.get('topic', 'Unknown Topic')
+    subtopic = params.get('subtopic', 'Unknown Subtopic')
+    num_questions = params.get('num_questions')
+    user_keywords = params.get('user_keywords', '')
+
+    textbook_content = find_subtopic_text(textbook_data, subtopic) or "Use general knowledge."
+    curriculum_content = find_topic_text(curriculum_data, topic) or "Use curriculum expectations."
+    example_qas = examples_data.get(subtopic) or []
+    examples_section = render_section(example_qas, section_format)
+    rubric_section = render_section(rubric_data, section_format)
+
+    prompt = f"""
+You are a skilled educational content designer.
+
+Using the textbook, curriculum, and examples provided, generate Q&A pairs with rubrics for each of the following Bloom's Taxonomy levels: {', '.join(bloom_levels)}.
+Each Bloom level should have exactly {num_questions} questions generated.
+
+Each Q&A must:
+- Be appropriate for Subject: {subject}, Grade: {grade_level}
+- Focus on the Topic: {topic} and Subtopic: {subtopic}
+- Use verbs from the rubric structure for each Bloom level
+- Include a rubric aligned with the question's Bloom level and verb used
+
+Context of Q&A must:
+- Textbook Content: {textbook_content}
+- Curriculum Guidance: {curriculum_content}
+- Example Q&As: {examples_section}
+- Rubric Structure (with glossary verbs): {rubric_section}
+- User Keywords: {user_keywords}
+
+Format your output as valid JSON:
+{{
+  "question": "...",
+  "answer": "...",
+  "rubric": {{
+    "levels": [
+      {{
+        "level": "Comprehensive Response",
+        "description": "..."
+      }},
+      {{
+        "level": "Partial Response",
+        "description": "..."
+      }},
+      {{
+        "level": "Limited Response",
+        "description": "..."
+      }}
+    ]
+  }}
+}}
+
+Only include Bloom levels from this list: {bloom_levels}
+Generate a balanced set of questions by Bloom’s level. You must include questions for each Bloom’s Taxonomy Levels: {", ".join(bloom_levels)}
+Do not include any Bloom level not mentioned.
+Skip any other levels.
+If rubric is not applicable, return `"rubric": null`.
+IMPORTANT: ONLY return the valid JSON object described above. No extra text or markdown.
+
+"""
+    return with_sections(prompt.strip(), textbook=textbook_content, curriculum=curriculum_content,
+                         examples=examples_section, rubric_structure=rubric_section, user_keywords=user_keywords)
@@ -0,0 +1,177 @@
+# Compact, deterministic rendering of structured data inserted into prompt templates
+
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+
+from .data_loader import DATA_DIR
+
+# "json": minified JSON, "terse": indented key: value lines, "repr": legacy Python repr
+SECTION_FORMATS = ("json", "terse", "repr")
+DEFAULT_SECTION_FORMAT = "json"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# Whitespace the estimate counts as its own token: any run containing a newline,
+# and runs of spaces/tabs not directly followed by a word (BPE merges " word")
+_SPACE_RE = re.compile(r"\s*\n\s*|[^\S\n]+(?!\w)")
+
+# Rendered subject data files keyed by (subject, filename, content hash, format);
+# the content hash is recomputed only when the file's mtime or size changes
+_FILE_RENDERS = {}
+_FILE_HASHES = {}
+_RENDER_LOCK = threading.Lock()
+
+
+def to_terse(value, indent=0):
+    """Renders nested dicts/lists as 'key: value' and '- item' lines."""
+    pad = " " * indent
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                lines.append(f"{pad}{key}:")
+                lines.append(to_terse(item, indent + 1))
+            else:
+                lines.append(f"{pad}{key}: {to_terse(item)}")
+        return "\n".join(lines)
+    if isinstance(value, list):
+        if not value:
+            return "none"
+        return "\n".join(
+            f"{pad}-\n{to_terse(item, indent + 1)}" if isinstance(item, (dict, list)) and item
+            else f"{pad}- {to_terse(item)}"
+            for item in value
+        )
+    if value is None:
+        return "none"
+    return str(value)
+
+
+def render_section(value, section_format=None):
+    """
+    Serialises a structured prompt section. Strings pass through unchanged;
+    other values are rendered in section_format.
+    """
+    section_format = section_format or DEFAULT_SECTION_FORMAT
+    if isinstance(value, str):
+        return value
+    if section_format == "repr":
+        return str(value)
+    if section_format == "json":
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    if section_format == "terse":
+        return to_terse(value)
+    raise ValueError(f"Unknown section format '{section_format}'. Expected one of: {', '.join(SECTION_FORMATS)}")
+
+
+def _file_hash(path):
+    stat = os.stat(path)
+    with _RENDER_LOCK:
+        cached = _FILE_HASHES.get(path)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with _RENDER_LOCK:
+        _FILE_HASHES[path] = ((stat.st_mtime_ns, stat.st_size), digest)
+    return digest
+
+
+def render_subject_file(subject, filename, section_format=None):
+    """
+    Returns a subject data file (e.g. rubrics.json) rendered as a prompt
+    section. The rendering is made once per file content and format, so the
+    static sections of every prompt for the subject reuse the same string.
+    """
+    section_format = section_format or DEFAULT_SECTION_FORMAT
+    path = os.path.join(DATA_DIR, subject.lower(), filename)
+    key = (subject.lower(), filename, _file_hash(path), section_format)
+    with _RENDER_LOCK:
+        if key in _FILE_RENDERS:
+            return _FILE_RENDERS[key]
+
+    with open(path, 'r') as f:
+        rendered = render_section(json.load(f), section_format)
+    with _RENDER_LOCK:
+        # Drop renderings of older versions of the file
+        for old in [k for k in _FILE_RENDERS if k[:2] == key[:2] and k[2] != key[2]]:
+            del _FILE_RENDERS[old]
+        _FILE_RENDERS[key] = rendered
+    return rendered
+
+
+def has_tiktoken():
+    import importlib.util
+    return importlib.util.find_spec("tiktoken") is not None
+
+
+def count_tokens(text, model=None):
+    """
+    Counts tokens with tiktoken when it is installed (cl100k/o200k by model),
+    otherwise estimates: one token per punctuation mark (quotes included), per
+    4 characters of each word and per whitespace run that is not merged into
+    the following word.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        tiktoken = None
+
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return len(encoding.encode(text))
+
+    words = sum(math.ceil(len(piece) / 4) for piece in _TOKEN_RE.findall(text))
+    return words + len(_SPACE_RE.findall(text))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from .data_loader import load_json_safe_from_subject, get_verbs_for_bloom_level, find_mapping_file
+    from .book_ingest import load_mapping
+    from .prompt_builder import build_questions_prompt, build_AnswerRubrics_prompt
+
+    parser = argparse.ArgumentParser(description="Report tokens saved by compact prompt sections.")
+    parser.add_argument("--subject", default="biology")
+    parser.add_argument("--mapping", help="CSV with cur_topic,cur_subtopic columns (defaults to the subject's mapping.csv).")
+    parser.add_argument("--format", default=DEFAULT_SECTION_FORMAT, choices=[f for f in SECTION_FORMATS if f != "repr"])
+    parser.add_argument("--bloom-level", default="Understanding")
+    parser.add_argument("--model", default=None, help="Tokenizer model name (used when tiktoken is installed).")
+    args = parser.parse_args()
+
+    textbook = load_json_safe_from_subject(args.subject, 'book.json')
+    curriculum = load_json_safe_from_subject(args.subject, 'curriculum.json')
+    examples = load_json_safe_from_subject(args.subject, 'examples.json')
+    rubrics = load_json_safe_from_subject(args.subject, 'rubrics.json')
+    verbs = {args.bloom_level: get_verbs_for_bloom_level(args.bloom_level, args.subject)}
+
+    totals = {"questions": [0, 0], "answer_rubric": [0, 0]}
+    print(f"{'Subtopic':<60} {'Q legacy':>9} {'Q new':>7} {'A legacy':>9} {'A new':>7}")
+    for topic, subtopic in load_mapping(args.mapping or find_mapping_file(args.subject)):
+        params = {"subject": args.subject, "topic": topic, "subtopic": subtopic,
+                  "bloom_level": args.bloom_level, "num_questions": 4}
+        row = []
+        for name, build in (
+            ("questions", lambda fmt: build_questions_prompt(params, textbook, curriculum, examples, verbs, section_format=fmt)),
+            ("answer_rubric", lambda fmt: build_AnswerRubrics_prompt(
+                f"Explain {subtopic}.", args.bloom_level, "", rubrics, section_format=fmt)),
+        ):
+            legacy = count_tokens(build("repr"), args.model)
+            compact = count_tokens(build(args.format), args.model)
+            totals[name][0] += legacy
+            totals[name][1] += compact
+            row += [legacy, compact]
+        print(f"{subtopic[:60]:<60} {row[0]:>9} {row[1]:>7} {row[2]:>9} {row[3]:>7}")
+
+    for name, (legacy, compact) in totals.items():
+        saved = legacy - compact
+        pct = 100 * saved / legacy if legacy else 0
+        print(f"{name}: {legacy} -> {compact} tokens ({saved} saved, {pct:.1f}%)")
+    print("Token counts are " + ("from tiktoken." if has_tiktoken() else "estimated (tiktoken not installed)."))
@@ -0,0 +1,145 @@
+# Per-section token attribution for prompts: which parts of a template the input tokens are spent on
+
+import os
+import csv
+import glob
+import datetime
+import threading
+
+from .prompt_render import count_tokens
+from .pricing import call_cost
+from .token_logger import append_csv_row
+
+SECTIONS_LOG = "prompt_sections.csv"
+# Whatever no named section covers: the template's fixed wording
+INSTRUCTIONS = "instructions"
+
+_LOG_LOCK = threading.Lock()
+
+
+class Prompt(str):
+    """
+    A prompt string that carries its section manifest: (name, start, end)
+    character spans of the parts inserted into the template. Appending text
+    keeps the spans (the added text counts as instructions).
+    """
+    sections = ()
+
+    def __add__(self, other):
+        result = Prompt(str.__add__(self, other))
+        result.sections = self.sections
+        return result
+
+
+def with_sections(prompt, **sections):
+    """
+    Returns prompt as a Prompt with the span of each named section, found
+    in keyword order (the order they appear in the template). Empty or
+    missing sections are left out.
+    """
+    result = Prompt(prompt)
+    spans, pos = [], 0
+    for name, text in sections.items():
+        text = str(text or "")
+        start = prompt.find(text, pos) if text else -1
+        if start < 0:
+            continue
+        spans.append((name, start, start + len(text)))
+        pos = start + len(text)
+    result.sections = tuple(spans)
+    return result
+
+
+def section_manifest(prompt, model=None):
+    """
+    [{"section", "start", "end", "chars", "tokens"}] for each named section
+    of a Prompt plus one "instructions" entry for the rest, with tokens
+    counted by the model's tokenizer (see count_tokens).
+    """
+    manifest, rest, pos = [], [], 0
+    for name, start, end in getattr(prompt, "sections", ()):
+        rest.append(prompt[pos:start])
+        pos = end
+        manifest.append({"section": name, "start": start, "end": end, "chars": end - start,
+                         "tokens": count_tokens(prompt[start:end], model)})
+    rest.append(prompt[pos:])
+    fixed = "".join(rest)
+    manifest.append({"section": INSTRUCTIONS, "start": None, "end": None, "chars": len(fixed),
+                     "tokens": count_tokens(fixed, model)})
+    return manifest
+
+
+def log_prompt_sections(prompt, model, stage, bloom_level, prompt_tokens, log_path):
+    """
+    Appends one row per section of a call's prompt, with the provider's
+    prompt_tokens split over the sections in proportion to their local counts.
+    Prompts without a manifest are not logged.
+    """
+    if not getattr(prompt, "sections", None):
+        return
+    manifest = section_manifest(prompt, model)
+    local_total = sum(entry["tokens"] for entry in manifest) or 1
+    timestamp = datetime.datetime.now().isoformat()
+    with _LOG_LOCK:
+        for entry in manifest:
+            append_csv_row(log_path, {
+                "timestamp": timestamp,
+                "model": model,
+                "stage": stage,
+                "bloom_level": bloom_level or "",
+                "section": entry["section"],
+                "start": "" if entry["start"] is None else entry["start"],
+                "end": "" if entry["end"] is None else entry["end"],
+                "chars": entry["chars"],
+                "tokens": entry["tokens"],
+                "prompt_tokens": prompt_tokens,
+                "attributed_tokens": round(prompt_tokens * entry["tokens"] / local_total, 1) if prompt_tokens else "",
+            })
+
+
+def aggregate(paths):
+    """Totals per (stage, section) over section logs: calls, local tokens and attributed provider tokens by model."""
+    totals = {}
+    for path in paths:
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                entry = totals.setdefault((row["stage"], row["section"]), {"calls": 0, "tokens": 0, "attributed": {}})
+                entry["calls"] += 1
+                entry["tokens"] += int(row["tokens"] or 0)
+                attributed = float(row["attributed_tokens"] or row["tokens"] or 0)
+                entry["attributed"][row["model"]] = entry["attributed"].get(row["model"], 0) + attributed
+    return totals
+
+
+def print_report(totals, prices=None):
+    stage_totals = {}
+    for (stage, _), entry in totals.items():
+        stage_totals[stage] = stage_totals.get(stage, 0) + sum(entry["attributed"].values())
+    print(f"{'Stage':<22} {'Section':<18} {'Calls':>7} {'Mean tok':>9} {'Input tok':>11} {'Share':>7} {'Cost $':>9}")
+    ranked = sorted(totals.items(), key=lambda kv: (kv[0][0], -sum(kv[1]["attributed"].values())))
+    for (stage, section), entry in ranked:
+        attributed = sum(entry["attributed"].values())
+        costs = [call_cost(model, tokens, 0, prices or {}) for model, tokens in entry["attributed"].items()]
+        cost = f"{sum(costs):.4f}" if costs and None not in costs else "-"
+        share = 100 * attributed / stage_totals[stage] if stage_totals[stage] else 0.0
+        print(f"{stage:<22} {section:<18} {entry['calls']:>7} {entry['tokens'] / entry['calls']:>9.0f} "
+              f"{attributed:>11.0f} {share:>6.1f}% {cost:>9}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from .config_loader import read_config_file
+    from .data_loader import DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Report input-token spend per prompt section across runs.")
+    parser.add_argument("--logs", default=os.path.join(DATA_DIR, '*', 'results', '**', SECTIONS_LOG),
+                        help="Glob of prompt_sections.csv files (default: every results folder).")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.logs, recursive=True))
+    if not paths:
+        print(f"No section logs match {args.logs}")
+    else:
+        print(f"{len(paths)} section logs.")
+        print_report(aggregate(paths), read_config_file().get('prices'))
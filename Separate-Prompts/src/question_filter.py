@@ -0,0 +1,195 @@
+# Local checks on generated questions (Bloom verbs, length, self-containedness) run before Step 2
+
+import re
+import os
+import json
+import threading
+
+from .data_loader import load_glossary_verbs
+
+FILTER_DEFAULTS = {
+    "enabled": False,
+    "require_level_verb": True,    # any inflection or -ise/-ize spelling of a level's glossary verbs
+    "min_words": 3,
+    "max_words": 80,
+    "regenerate": False,           # each regeneration round is an extra paid call
+    "max_rounds": 1,
+}
+
+# Questions that only make sense next to the passage they were written from
+NOT_SELF_CONTAINED_RE = re.compile(
+    r"\b(?:according to|based on|from|in|using) the (?:above |given |provided |following )?"
+    r"(?:text|passage|extract|excerpt|source|article|reading|textbook|context)\b"
+    r"|\b(?:the|this) (?:passage|extract|excerpt)\b"
+    r"|\bthe above\b"
+    r"|\bas (?:mentioned|stated|described|discussed|shown) (?:above|earlier|previously|in the)\b",
+    re.IGNORECASE,
+)
+
+# References to material the student will not see, or prompt internals
+LEAKED_REFERENCE_RE = re.compile(
+    r"\b(?:figure|fig\.|table|page|section|chapter|diagram)\s*\d"
+    r"|\[\d+\]"
+    r"|\bsource_text\b|\bfocused[ _]context\b|\bbloom'?s? (?:taxonomy|level)\b"
+    r"|https?://",
+    re.IGNORECASE,
+)
+
+WORD_RE = re.compile(r"\b\w[\w'-]*\b")
+
+# Verbs of more than one syllable that double their final consonant
+# (British spelling; the undoubled American forms are kept as well)
+DOUBLED_FINAL = {"model", "label", "level", "signal", "travel", "control", "refer", "transfer", "omit", "compel"}
+# Single-syllable consonant-vowel-consonant stems: plan -> planned, planning
+CVC_RE = re.compile(r"^[^aeiou]*[aeiou][^aeiouwxy]$")
+
+_VERB_PATTERNS = {}
+_VERB_LOCK = threading.Lock()
+
+
+def verb_forms(verb):
+    """
+    Inflected and spelling-variant forms of a glossary verb, e.g. 'Analyse' ->
+    analyse, analyses, analysed, analysing, analyze, analyzes, ...; 'Plan' ->
+    plan, plans, planned, planning. 'Evaluate (data)' is treated as 'evaluate'.
+    """
+    base = re.sub(r"\(.*?\)", "", verb).strip().lower()
+    if not base:
+        return set()
+    stems = {base}
+    # British/American spellings: -ise/-yse <-> -ize/-yze
+    if re.search(r"[iy]se$", base):
+        stems.add(base[:-2] + "ze")
+    elif re.search(r"[iy]ze$", base):
+        stems.add(base[:-2] + "se")
+
+    forms = set()
+    for stem in stems:
+        forms.add(stem)
+        if stem.endswith("e"):
+            forms.update({stem + "s", stem + "d", stem[:-1] + "ing"})
+        elif stem.endswith("y") and stem[-2:-1] not in "aeiou":
+            forms.update({stem[:-1] + "ies", stem[:-1] + "ied", stem + "ing"})
+        elif CVC_RE.match(stem):
+            forms.update({stem + "s", stem + stem[-1] + "ed", stem + stem[-1] + "ing"})
+        else:
+            forms.update({stem + ("es" if re.search(r"(?:s|x|z|ch|sh)$", stem) else "s"), stem + "ed", stem + "ing"})
+            if stem in DOUBLED_FINAL:
+                forms.update({stem + stem[-1] + "ed", stem + stem[-1] + "ing"})
+    return forms
+
+
+def compile_verb_patterns(subject):
+    """
+    Builds (once per subject) one regex per Bloom level matching any form of
+    that level's glossary verbs. Alternatives are longest first, so the regex
+    engine's alternation acts as a keyword automaton over the question.
+    """
+    with _VERB_LOCK:
+        if subject not in _VERB_PATTERNS:
+            verbs_by_level = load_glossary_verbs(subject).get("glossary_verbs_by_bloom_level", {})
+            patterns = {}
+            for level, verbs in verbs_by_level.items():
+                forms = set()
+                for verb in verbs:
+                    forms |= verb_forms(verb)
+                if forms:
+                    alternation = "|".join(re.escape(f) for f in sorted(forms, key=len, reverse=True))
+                    patterns[level] = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+            _VERB_PATTERNS[subject] = patterns
+        return _VERB_PATTERNS[subject]
+
+
+def check_question(question, bloom_level, verb_patterns, settings=None):
+    """
+    Returns the list of reasons a question fails the local checks (empty if it passes).
+    """
+    settings = dict(FILTER_DEFAULTS, **(settings or {}))
+    reasons = []
+    words = WORD_RE.findall(question or "")
+    if len(words) < settings["min_words"]:
+        reasons.append("too_short")
+    elif len(words) > settings["max_words"]:
+        reasons.append("too_long")
+
+    pattern = verb_patterns.get(bloom_level)
+    if settings["require_level_verb"] and pattern is not None and not pattern.search(question):
+        reasons.append("no_level_verb")
+    if NOT_SELF_CONTAINED_RE.search(question):
+        reasons.append("not_self_contained")
+    if LEAKED_REFERENCE_RE.search(question):
+        reasons.append("leaked_reference")
+    return reasons
+
+
+def question_key(question):
+    """Normalised form of a question used to spot duplicates."""
+    return " ".join(WORD_RE.findall((question or "").lower()))
+
+
+def filter_questions(questions_by_bloom, subject, settings=None, seen=None):
+    """
+    Runs check_question over every question object. Returns
+    (kept_by_bloom, rejected) where rejected is a list of
+    {"bloom_level", "question", "reasons"}. seen (a set of normalised
+    questions) is used to reject duplicates across calls.
+    """
+    verb_patterns = compile_verb_patterns(subject)
+    seen = set() if seen is None else seen
+    kept, rejected = {}, []
+    for bloom_level, questions in questions_by_bloom.items():
+        kept[bloom_level] = []
+        for q_obj in questions if isinstance(questions, list) else []:
+            if not isinstance(q_obj, dict) or not q_obj.get('question'):
+                continue
+            question = q_obj['question']
+            reasons = check_question(question, bloom_level, verb_patterns, settings)
+            key = question_key(question)
+            if key in seen:
+                reasons.append("duplicate")
+            if reasons:
+                rejected.append({"bloom_level": bloom_level, "question": question, "reasons": reasons})
+                continue
+            seen.add(key)
+            kept[bloom_level].append(q_obj)
+    return kept, rejected
+
+
+def record_rejections(job, stage, checked, rejected_count, reasons=None, **extra):
+    """Adds a stage's rejection counts to job["rejections"] (reported at the end of a run)."""
+    entry = job.setdefault("rejections", {}).setdefault(stage, {"checked": 0, "rejected": 0, "reasons": {}})
+    entry["checked"] += checked
+    entry["rejected"] += rejected_count
+    for reason in reasons or []:
+        entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+    for key, value in extra.items():
+        entry[key] = entry.get(key, 0) + value
+
+
+def report_rejections(job):
+    """Prints each stage's rejection rate and writes rejections.json to the job's output folder."""
+    rejections = job.get("rejections", {})
+    if not rejections:
+        return
+    print(f"{'Stage':<20} {'Checked':>8} {'Rejected':>8} {'Rate':>7}  Reasons")
+    for stage, entry in rejections.items():
+        rate = 100 * entry["rejected"] / entry["checked"] if entry["checked"] else 0.0
+        reasons = ", ".join(f"{k}={v}" for k, v in sorted(entry["reasons"].items(), key=lambda kv: -kv[1]))
+        print(f"{stage:<20} {entry['checked']:>8} {entry['rejected']:>8} {rate:>6.1f}%  {reasons}")
+    with open(os.path.join(job["output_folder_path"], 'rejections.json'), 'w') as f:
+        json.dump(rejections, f, indent=2)
+
+
+if __name__ == '__main__':
+    samples = [
+        ("Remembering", "Identify the organelle responsible for producing ATP in eukaryotic cells."),
+        ("Remembering", "What is the function of the nucleus?"),
+        ("Understanding", "According to the text, explain why enzymes are specific to their substrates."),
+        ("Analyzing", "Compare the data in Table 2 with the results of the control experiment."),
+        ("Analyzing", "Analyze how restriction enzymes and ligase are used together to produce recombinant DNA."),
+        ("Creating", "Design."),
+    ]
+    patterns = compile_verb_patterns("biology")
+    for level, question in samples:
+        reasons = check_question(question, level, patterns, {"require_level_verb": True})
+        print(f"{'PASS' if not reasons else 'FAIL'} [{level}] {question} {reasons or ''}")
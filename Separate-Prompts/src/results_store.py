@@ -0,0 +1,589 @@
+# Append-only question bank backed by SQLite (with FTS5 full-text search over questions)
+
+import os
+import re
+import csv
+import glob
+import json
+import uuid
+import sqlite3
+import datetime
+import threading
+import argparse
+
+from .data_loader import DATA_DIR
+from .output_processor import iter_qna_items
+
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "question_bank.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    strategy TEXT,
+    subject TEXT,
+    topic TEXT,
+    subtopic TEXT,
+    model TEXT,
+    output_folder TEXT,
+    params_json TEXT,
+    raw_output_json TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    subject TEXT,
+    topic TEXT,
+    subtopic TEXT,
+    bloom_level TEXT,
+    model TEXT,
+    question TEXT,
+    answer TEXT,
+    source_text TEXT,
+    payload_json TEXT,
+    status TEXT DEFAULT 'generated',
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_key
+    ON items (subject, topic, subtopic, bloom_level, model, run_id);
+CREATE INDEX IF NOT EXISTS idx_items_run ON items (run_id);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER,
+    run_id TEXT
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts
+    USING fts5(question, content='items', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, question) VALUES (new.id, new.question);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, question) VALUES ('delete', old.id, old.question);
+END;
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF question ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, question) VALUES ('delete', old.id, old.question);
+    INSERT INTO items_fts(rowid, question) VALUES (new.id, new.question);
+END;
+"""
+
+KEY_FIELDS = ("subject", "topic", "subtopic", "bloom_level", "model", "run_id")
+
+
+def new_run_id(output_folder=None):
+    """
+    Returns a sortable, unique run ID (timestamp + short random suffix).
+    """
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    suffix = uuid.uuid4().hex[:6]
+    if not output_folder:
+        return f"{stamp}-{suffix}"
+    folder = re.sub(r'[^A-Za-z0-9._-]+', '-', output_folder).strip('-')
+    return f"{stamp}-{folder}-{suffix}"
+
+
+class ResultsStore:
+    """
+    Append-only store for generated Q&As.
+
+    Items are written one at a time as they complete, keyed by
+    subject, topic, subtopic, Bloom level, model and run ID.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            print("Warning: SQLite FTS5 not available — falling back to LIKE search.")
+            self.has_fts = False
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def start_run(self, run_id, params, model, strategy, output_folder=None):
+        """Registers a run before any of its items are streamed in."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, strategy, subject, topic, subtopic, model, "
+                "output_folder, params_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, strategy,
+                    str(params.get('subject', '')).lower(),
+                    params.get('topic', ''),
+                    params.get('subtopic', ''),
+                    model,
+                    output_folder,
+                    json.dumps(params, ensure_ascii=False),
+                    datetime.datetime.now().isoformat(),
+                )
+            )
+            self.conn.commit()
+
+    def set_raw_output(self, run_id, data):
+        """Stores a run's full parsed model output (used by Single-Prompt)."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE runs SET raw_output_json = ? WHERE run_id = ?",
+                (json.dumps(data, ensure_ascii=False), run_id)
+            )
+            self.conn.commit()
+
+    def add_item(self, run_id, params, model, bloom_level, qna):
+        """
+        Appends a single completed Q&A and returns its item ID.
+        """
+        item = qna if isinstance(qna, dict) else {"question": str(qna)}
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO items (run_id, subject, topic, subtopic, bloom_level, model, question, "
+                "answer, source_text, payload_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    str(params.get('subject', '')).lower(),
+                    params.get('topic', ''),
+                    params.get('subtopic', ''),
+                    bloom_level,
+                    model,
+                    item.get('question', ''),
+                    _as_text(item.get('answer')),
+                    _as_text(item.get('source_text')),
+                    json.dumps(item, ensure_ascii=False),
+                    datetime.datetime.now().isoformat(),
+                )
+            )
+            self.conn.commit()
+            return cur.lastrowid
+
+    def index_results(self, results_glob=None):
+        """
+        Imports Q&As from output.json files in earlier results folders, keyed
+        by the parameters in the token_log.csv next to them. Files already
+        indexed and unchanged (same mtime and size), and files exported from
+        this bank, are skipped, so re-indexing only reads new or changed
+        folders. Returns the number of items imported.
+        """
+        pattern = results_glob or os.path.join(DATA_DIR, '*', 'results', '**', 'output.json')
+        with self._lock:
+            known = {r["path"]: (r["mtime"], r["size"], r["run_id"])
+                     for r in self.conn.execute("SELECT * FROM indexed_files")}
+
+        imported, files = 0, 0
+        for path in glob.glob(pattern, recursive=True):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            previous = known.get(path)
+            if previous and previous[0] == stat.st_mtime and previous[1] == stat.st_size:
+                continue
+            if previous and not previous[2].startswith("import-"):
+                # Exported from this bank and edited since: the bank stays authoritative
+                continue
+            params = _params_from_token_log(os.path.join(os.path.dirname(path), 'token_log.csv'))
+            if not params:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: could not index {path}: {e}")
+                continue
+
+            bloom_levels = [b.strip() for b in str(params.get('bloom_level', '')).split(',') if b.strip()]
+            default_level = bloom_levels[0] if len(bloom_levels) == 1 else None
+            run_id = "import-" + new_run_id()
+            now = datetime.datetime.now().isoformat()
+            rows = [
+                (run_id, str(params.get('subject', '')).lower(), params.get('topic', ''), params.get('subtopic', ''),
+                 level or default_level, params.get('model', ''), qna.get('question', ''),
+                 _as_text(qna.get('answer')), _as_text(qna.get('source_text')),
+                 json.dumps(qna, ensure_ascii=False), now)
+                for level, qna in iter_qna_items(data, bloom_levels) if isinstance(qna, dict)
+            ]
+            with self._lock:
+                # A changed legacy file replaces what was imported from it before
+                if previous:
+                    self.conn.execute("DELETE FROM items WHERE run_id = ?", (previous[2],))
+                    self.conn.execute("DELETE FROM runs WHERE run_id = ?", (previous[2],))
+                self.conn.execute(
+                    "INSERT INTO runs (run_id, strategy, subject, topic, subtopic, model, output_folder, "
+                    "params_json, created_at) VALUES (?, 'import', ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, str(params.get('subject', '')).lower(), params.get('topic', ''),
+                     params.get('subtopic', ''), params.get('model', ''),
+                     os.path.relpath(os.path.dirname(path), DATA_DIR), json.dumps(params, ensure_ascii=False), now)
+                )
+                self.conn.executemany(
+                    "INSERT INTO items (run_id, subject, topic, subtopic, bloom_level, model, question, "
+                    "answer, source_text, payload_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO indexed_files (path, mtime, size, run_id) VALUES (?, ?, ?, ?)",
+                    (path, stat.st_mtime, stat.st_size, run_id)
+                )
+                self.conn.commit()
+            imported += len(rows)
+            files += 1
+        if files:
+            print(f"Indexed {imported} Q&As from {files} earlier results folders.")
+        return imported
+
+    def find_reusable(self, subject, topic, subtopic, bloom_level, limit, keywords=None, exclude_run_id=None):
+        """
+        Returns up to limit earlier Q&As for the same subject/topic/subtopic/Bloom
+        level that were not rejected: accepted ones first, then newest. With
+        keywords, only Q&As mentioning at least one of them are returned.
+        Questions asked more than once are returned once.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM items WHERE subject = ? AND topic = ? AND subtopic = ? AND bloom_level = ? "
+                "AND status != 'rejected' AND run_id != ? "
+                "ORDER BY (status = 'accepted') DESC, id DESC",
+                (str(subject).lower(), topic, subtopic, bloom_level, exclude_run_id or "")
+            ).fetchall()
+
+        terms = [k.strip().lower() for k in re.split(r'[,;]', keywords or '') if k.strip()]
+        found, seen = [], set()
+        for row in rows:
+            item = _row_to_item(row)
+            key = " ".join(re.findall(r"\w+", item["question"].lower()))
+            if not key or key in seen or not item["answer"]:
+                continue
+            if terms and not any(t in f"{item['question']} {item['answer']}".lower() for t in terms):
+                continue
+            seen.add(key)
+            found.append(item)
+            if len(found) >= limit:
+                break
+        return found
+
+    def delete_run(self, run_id):
+        """Removes a run and its items (e.g. a batch-mode pass that is replayed later)."""
+        with self._lock:
+            self.conn.execute("DELETE FROM items WHERE run_id = ?", (run_id,))
+            self.conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            self.conn.commit()
+
+    def set_status(self, item_id, status):
+        """Marks an item (e.g. 'accepted', 'rejected') without rewriting it. Returns False if there is no such item."""
+        with self._lock:
+            cur = self.conn.execute("UPDATE items SET status = ? WHERE id = ?", (status, item_id))
+            self.conn.commit()
+            return cur.rowcount == 1
+
+    def set_run_status(self, run_id, status):
+        """Marks every item of a run. Returns the number of items marked."""
+        with self._lock:
+            cur = self.conn.execute("UPDATE items SET status = ? WHERE run_id = ?", (status, run_id))
+            self.conn.commit()
+            return cur.rowcount
+
+    def update_payload(self, item_id, payload):
+        """Rewrites an item's Q&A (e.g. once a lazy rubric is generated), keeping its ID and status."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE items SET payload_json = ?, answer = ? WHERE id = ?",
+                (json.dumps(payload, ensure_ascii=False), _as_text(payload.get('answer')), item_id)
+            )
+            self.conn.commit()
+
+    def merge_from(self, other_db_path):
+        """
+        Copies every run and item from another question bank (e.g. a sweep
+        worker's) that this bank does not have yet. Returns the number of items added.
+        """
+        with self._lock:
+            self.conn.execute("ATTACH DATABASE ? AS other", (other_db_path,))
+            try:
+                self.conn.execute("INSERT OR IGNORE INTO runs SELECT * FROM other.runs")
+                self.conn.execute("INSERT OR IGNORE INTO indexed_files SELECT * FROM other.indexed_files")
+                cur = self.conn.execute(
+                    "INSERT INTO items (run_id, subject, topic, subtopic, bloom_level, model, question, answer, "
+                    "source_text, payload_json, status, created_at) "
+                    "SELECT run_id, subject, topic, subtopic, bloom_level, model, question, answer, "
+                    "source_text, payload_json, status, created_at FROM other.items "
+                    "WHERE run_id NOT IN (SELECT DISTINCT run_id FROM main.items)"
+                )
+                self.conn.commit()
+                return cur.rowcount
+            finally:
+                self.conn.execute("DETACH DATABASE other")
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def query(self, limit=None, **filters):
+        """
+        Returns items matching the given key fields (subject, topic, subtopic,
+        bloom_level, model, run_id, status) as dicts.
+        """
+        where, args = _build_where(filters)
+        sql = f"SELECT * FROM items{where} ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        return [_row_to_item(r) for r in rows]
+
+    def status_fingerprint(self, subject, status):
+        """
+        (count, answered, max ID, ID sum) of a subject's items with a status:
+        changes whenever such an item is added, marked or unmarked, or gets
+        its answer. One aggregate query, for cache checks.
+        """
+        with self._lock:
+            return tuple(self.conn.execute(
+                "SELECT COUNT(*), COUNT(NULLIF(answer, '')), COALESCE(MAX(id), 0), COALESCE(SUM(id), 0) "
+                "FROM items WHERE subject = ? AND status = ?", (subject, status)
+            ).fetchone())
+
+    def search(self, text, limit=50, **filters):
+        """
+        Full-text search over questions, optionally restricted by key fields.
+        """
+        where, args = _build_where(filters, prefix="items.")
+        if self.has_fts:
+            sql = ("SELECT items.* FROM items_fts JOIN items ON items.id = items_fts.rowid "
+                   f"WHERE items_fts MATCH ?{where.replace(' WHERE ', ' AND ')} "
+                   "ORDER BY bm25(items_fts) LIMIT ?")
+            args = [_fts_query(text)] + args + [int(limit)]
+        else:
+            sql = (f"SELECT * FROM items WHERE question LIKE ?{where.replace(' WHERE ', ' AND ')} "
+                   "ORDER BY id LIMIT ?")
+            args = [f"%{text}%"] + args + [int(limit)]
+        with self._lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        return [_row_to_item(r) for r in rows]
+
+    def iter_items(self, after_id=0, batch_size=1000):
+        """
+        Yields every item with an ID above after_id in ID order, with its run's
+        created_at as "run_created_at". Reads in batches, so the whole bank
+        is never held in memory.
+        """
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT items.*, runs.created_at AS run_created_at FROM items "
+                    "LEFT JOIN runs ON runs.run_id = items.run_id WHERE items.id > ? ORDER BY items.id LIMIT ?",
+                    (after_id, int(batch_size))
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _row_to_item(row)
+            after_id = rows[-1]["id"]
+
+    def get_item(self, item_id):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM items WHERE id = ?", (item_id,)).fetchone()
+        return _row_to_item(row) if row else None
+
+    def get_run(self, run_id):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest_run_id(self, output_folder=None, subject=None):
+        """Returns the most recent run ID, optionally for an output folder/subject."""
+        where, args = _build_where({"output_folder": output_folder, "subject": subject})
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT run_id FROM runs{where} ORDER BY created_at DESC LIMIT 1", args
+            ).fetchone()
+        return row["run_id"] if row else None
+
+    def latest_runs(self, strategy=None, subject=None):
+        """The most recent run of each output folder, optionally for a strategy/subject."""
+        where, args = _build_where({"strategy": strategy, "subject": subject})
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM runs{where} ORDER BY created_at DESC", args
+            ).fetchall()
+        latest = {}
+        for row in rows:
+            latest.setdefault(row["output_folder"], dict(row))
+        return list(latest.values())
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+    def build_output(self, run_id):
+        """
+        Rebuilds the legacy output.json document for a run:
+        {"Output": {bloom_level: [qna, ...]}} for itemised runs, or the
+        stored raw model output for Single-Prompt runs.
+        """
+        run = self.get_run(run_id)
+        if run and run.get("raw_output_json"):
+            return json.loads(run["raw_output_json"])
+
+        # Keep the Bloom levels in the order they were requested
+        grouped = {}
+        if run and run.get("params_json"):
+            requested = json.loads(run["params_json"]).get("bloom_level", "")
+            if isinstance(requested, str):
+                requested = requested.split(",")
+            for level in requested:
+                if level.strip():
+                    grouped[level.strip()] = []
+        for item in self.query(run_id=run_id):
+            grouped.setdefault(item["bloom_level"], []).append(item["payload"])
+        return {"Output": grouped}
+
+    def export_output_json(self, run_id, output_file):
+        """Writes a run in today's output.json layout (atomically, via a temporary file)."""
+        tmp = f"{output_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.build_output(run_id), f, indent=2)
+        os.replace(tmp, output_file)
+        # Its items are already in the bank: index_results must not import them again
+        stat = os.stat(output_file)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO indexed_files (path, mtime, size, run_id) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(output_file), stat.st_mtime, stat.st_size, run_id)
+            )
+            self.conn.commit()
+        return output_file
+
+
+def _as_text(value):
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _build_where(filters, prefix=""):
+    clauses, args = [], []
+    for key, value in filters.items():
+        if value is None:
+            continue
+        clauses.append(f"{prefix}{key} = ?")
+        args.append(value.lower() if key == "subject" else value)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+def _params_from_token_log(log_path):
+    """Generation parameters (and model) from the first row of a token_log.csv, or None."""
+    if not os.path.exists(log_path):
+        return None
+    with open(log_path, newline='') as f:
+        row = next(csv.DictReader(f), None)
+    if not row or not row.get('subtopic') or not row.get('bloom_level'):
+        return None
+    return row
+
+
+def _fts_query(text):
+    # Quote each term so punctuation in user input is never parsed as FTS syntax
+    terms = [t.replace('"', '') for t in text.split() if t.strip('"')]
+    return " ".join(f'"{t}"' for t in terms) or '""'
+
+
+def _row_to_item(row):
+    item = dict(row)
+    item["payload"] = json.loads(item.pop("payload_json") or "{}")
+    return item
+
+
+def main():
+    """The question bank CLI (search, export, columnar, index, status)."""
+    from .columnar_export import EXPORT_FORMATS, STATE_FILE, export_columnar
+
+    parser = argparse.ArgumentParser(description="Query and export the question bank.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Path to the question bank database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_search = sub.add_parser("search", help="Full-text search over questions.")
+    p_search.add_argument("text")
+    p_search.add_argument("--limit", type=int, default=20)
+    for field in KEY_FIELDS:
+        p_search.add_argument(f"--{field}")
+
+    p_export = sub.add_parser("export", help="Write a run in the legacy output.json layout.")
+    p_export.add_argument("--run-id", help="Defaults to the latest run (for --output-folder if given).")
+    p_export.add_argument("--output-folder")
+    p_export.add_argument("--out", required=True)
+    p_export.add_argument("--rubrics", action="store_true",
+                          help="First generate the run's pending lazy rubrics (makes API calls).")
+
+    p_columnar = sub.add_parser("columnar", help="Append new Q&As to a columnar export (one row per rubric level).")
+    p_columnar.add_argument("--out", default=os.path.join(DATA_DIR, "exports", "question_bank"))
+    p_columnar.add_argument("--format", choices=EXPORT_FORMATS,
+                            help="Defaults to the folder's existing format, else parquet (with pyarrow) or csv.")
+    p_columnar.add_argument("--rubrics", action="store_true",
+                            help="First generate the pending lazy rubrics of the Q&As to export (makes API calls).")
+
+    p_index = sub.add_parser("index", help="Import Q&As from earlier results folders (new or changed ones only).")
+    p_index.add_argument("--glob", help="output.json glob (defaults to data/*/results/**/output.json).")
+
+    p_status = sub.add_parser("status", help="Mark items, e.g. accepted (few-shot examples, preferred for reuse) or rejected.")
+    p_status.add_argument("status", help="e.g. accepted, rejected or generated")
+    p_status.add_argument("item_ids", nargs="*", type=int)
+    p_status.add_argument("--run-id", help="Mark every item of this run.")
+
+    args = parser.parse_args()
+    with ResultsStore(args.db) as store:
+        if args.command == "search":
+            filters = {f: getattr(args, f) for f in KEY_FIELDS}
+            for item in store.search(args.text, limit=args.limit, **filters):
+                print(f"[{item['run_id']}] {item['bloom_level']} | {item['subtopic']} | {item['question']}")
+        elif args.command == "columnar":
+            start = datetime.datetime.now()
+            if args.rubrics:
+                from .config_loader import load_config
+                from .lazy_rubrics import materialize_items
+                state_path = os.path.join(args.out, STATE_FILE)
+                after_id = 0
+                if os.path.exists(state_path):
+                    with open(state_path) as f:
+                        after_id = json.load(f)["last_item_id"]
+                materialize_items(store, store.iter_items(after_id=after_id), load_config())
+            rows = export_columnar(store, args.out, args.format)
+            print(f"Exported {rows} rows to {args.out} in {(datetime.datetime.now() - start).total_seconds():.2f}s")
+        elif args.command == "status":
+            if not args.item_ids and not args.run_id:
+                raise SystemExit("Give item IDs or --run-id.")
+            marked = sum(store.set_status(item_id, args.status) for item_id in args.item_ids)
+            marked += store.set_run_status(args.run_id, args.status) if args.run_id else 0
+            print(f"Marked {marked} items {args.status}.")
+        elif args.command == "index":
+            start = datetime.datetime.now()
+            count = store.index_results(args.glob)
+            print(f"Imported {count} Q&As in {(datetime.datetime.now() - start).total_seconds():.2f}s")
+        elif args.command == "export":
+            run_id = args.run_id or store.latest_run_id(output_folder=args.output_folder)
+            if not run_id:
+                raise SystemExit("No matching run found.")
+            if args.rubrics:
+                from .config_loader import load_config
+                from .lazy_rubrics import materialize_items
+                materialize_items(store, store.query(run_id=run_id), load_config())
+            store.export_output_json(run_id, args.out)
+            print(f"Exported run {run_id} to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
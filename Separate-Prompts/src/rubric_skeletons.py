@@ -0,0 +1,113 @@
+# Rubric skeletons: one shared 4-level rubric per subtopic and Bloom level, completed per question
+
+import os
+import json
+import threading
+
+from .data_loader import DATA_DIR
+from .input_tracking import content_hash
+
+SKELETON_DEFAULTS = {
+    "enabled": False,
+    "cache_file": None,       # defaults to data/rubric_skeletons.json
+}
+DEFAULT_CACHE_FILE = os.path.join(DATA_DIR, 'rubric_skeletons.json')
+
+# One SkeletonCache per file, shared by every job in the process
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def skeleton_key(subject, subtopic, bloom_level, rubrics, template_version, model):
+    """A skeleton is reused until the subtopic, level, rubrics.json, template or model changes."""
+    return "|".join([subject, subtopic, bloom_level, content_hash(rubrics), template_version, model])
+
+
+class SkeletonCache:
+    """
+    Skeletons on disk (one JSON file, rewritten atomically). Each skeleton is
+    generated once: concurrent requests for the same key wait for the first.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_CACHE_FILE
+        self.skeletons = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.skeletons = json.load(f)
+
+    def get_or_create(self, key, generate):
+        """Returns the skeleton for key, calling generate() to create it if it is not cached."""
+        with self._lock:
+            if key in self.skeletons:
+                return self.skeletons[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self.skeletons:
+                    return self.skeletons[key]
+            skeleton = generate()
+            with self._lock:
+                self.skeletons[key] = skeleton
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, 'w') as f:
+                    json.dump(self.skeletons, f, indent=1, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            return skeleton
+
+
+def get_skeleton_cache(path=None):
+    path = path or DEFAULT_CACHE_FILE
+    with _CACHES_LOCK:
+        if path not in _CACHES:
+            _CACHES[path] = SkeletonCache(path)
+        return _CACHES[path]
+
+
+def skeleton_levels(parsed):
+    """The level list of a skeleton response ({"rubric": {"levels": [...]}} or {"levels": [...]})."""
+    rubric = parsed.get("rubric", parsed) if isinstance(parsed, dict) else {}
+    levels = rubric.get("levels") if isinstance(rubric, dict) else None
+    levels = [lvl for lvl in levels or [] if isinstance(lvl, dict) and lvl.get("level")]
+    if not levels:
+        raise ValueError("no rubric levels in the skeleton response")
+    return [{"level": str(lvl["level"]), "description": str(lvl.get("description", ""))} for lvl in levels]
+
+
+def assemble_rubric(skeleton, criteria):
+    """
+    The full rubric: each skeleton level's shared description followed by
+    the question's criterion for that level (matched by level name or its
+    first word, e.g. "Competent"), if there is one.
+    """
+    criteria = criteria if isinstance(criteria, dict) else {}
+    by_name = {str(name).strip().lower(): str(text).strip() for name, text in criteria.items() if text}
+    levels = []
+    for lvl in skeleton:
+        name = lvl["level"].strip().lower()
+        criterion = by_name.get(name) or by_name.get(name.split()[0] if name else "")
+        description = lvl["description"]
+        if criterion:
+            description = f"{description} For this question: {criterion}"
+        levels.append({"level": lvl["level"], "description": description})
+    return {"levels": levels}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List cached rubric skeletons.")
+    parser.add_argument("--cache-file", default=DEFAULT_CACHE_FILE)
+    parser.add_argument("--subtopic", help="Show the skeletons of this subtopic in full.")
+    args = parser.parse_args()
+
+    cache = SkeletonCache(args.cache_file)
+    print(f"{len(cache.skeletons)} skeletons in {cache.path}")
+    for key, skeleton in cache.skeletons.items():
+        subject, subtopic, bloom_level, _, _, model = key.split("|")
+        print(f"{subject:<10} {subtopic[:50]:<50} {bloom_level:<14} {model}")
+        if args.subtopic and args.subtopic == subtopic:
+            for lvl in skeleton:
+                print(f"    {lvl['level']}: {lvl['description']}")
@@ -0,0 +1,655 @@
+# Stage functions and the graph configurations for each generation strategy
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .data_loader import (
+    DATA_DIR,
+    load_json_safe_from_subject,
+    find_subtopic_text,
+    find_topic_text,
+    find_focused_context,
+    get_verbs_for_bloom_level
+)
+from .prompt_builder import (
+    build_questions_prompt,
+    build_level_questions_prompt,
+    build_AnswerRubrics_prompt,
+    build_answer_prompt,
+    build_rubric_skeleton_prompt,
+    build_answer_criteria_prompt,
+    build_prompt
+)
+from .llm_api_client import call_llm_api
+from .output_processor import (
+    parse_questions_response,
+    parse_qna_response,
+    safe_json_parse,
+    save_questions_with_content,
+    iter_qna_items
+)
+from .token_logger import log_token_usage
+from .results_store import new_run_id
+from .grounding import get_grounding_indexes, validate_questions
+from .cascade import CASCADE_DEFAULTS, CascadeStats, check_qna, expected_rubric_levels
+from .model_router import route_model, config_for_model
+from .question_filter import FILTER_DEFAULTS, filter_questions, record_rejections, question_key
+from .input_tracking import item_inputs, changed_inputs, rebuild_action, template_version
+from .example_index import examples_for
+from .prompt_sections import SECTIONS_LOG, log_prompt_sections
+from .prompt_render import render_subject_file
+from .rubric_skeletons import SKELETON_DEFAULTS, get_skeleton_cache, skeleton_key, skeleton_levels, assemble_rubric
+from .lazy_rubrics import LAZY_RUBRICS_DEFAULTS
+
+_SUBJECT_DATA = {}
+_SUBJECT_DATA_LOCK = threading.Lock()
+
+BANK_FIRST_DEFAULTS = {
+    "enabled": False,
+    "index_results": True,
+    "match_keywords": True,
+}
+FAN_OUT_DEFAULTS = {
+    "enabled": False,
+    "max_workers": 6,
+    "retries": 1,
+}
+# Usage-record fields logged to token_log.csv next to the token and duration columns
+USAGE_LOG_FIELDS = ("cached_tokens", "reasoning_tokens", "ttft_sec", "tok_per_sec")
+_INDEXED_BANKS = set()
+_INDEXED_LOCK = threading.Lock()
+
+
+def split_bloom_levels(bloom_levels_raw):
+    if isinstance(bloom_levels_raw, list):
+        return [b.strip() for b in bloom_levels_raw if b.strip()]
+    return [b.strip() for b in (bloom_levels_raw or '').split(',') if b.strip()]
+
+
+def load_subject_data(subject):
+    """Loads (once per process) every data file for a subject."""
+    with _SUBJECT_DATA_LOCK:
+        if subject not in _SUBJECT_DATA:
+            print(f"Loading data files for {subject}...")
+            _SUBJECT_DATA[subject] = {
+                "textbook": load_json_safe_from_subject(subject, 'book.json'),
+                "curriculum": load_json_safe_from_subject(subject, 'curriculum.json'),
+                "examples": load_json_safe_from_subject(subject, 'examples.json'),
+                "rubrics": load_json_safe_from_subject(subject, 'rubrics.json'),
+            }
+        return _SUBJECT_DATA[subject]
+
+
+def prepare_job(params, config, store, strategy, output_folder=None, data_dir=None):
+    """
+    Creates a job (one parameters.json-style request): sets up its output
+    folder (under data_dir, default this tree's data/) and token log and
+    registers its run in the question bank.
+    """
+    subject = params.get('subject', 'biology').lower()
+    output_folder = output_folder or params.get('output_folder', 'default')
+    output_folder_path = os.path.join(data_dir or DATA_DIR, subject, 'results', output_folder)
+    os.makedirs(output_folder_path, exist_ok=True)
+
+    run_id = new_run_id(output_folder)
+    store.start_run(run_id, params, config['model'], strategy, output_folder)
+    return {
+        "params": params,
+        "subject": subject,
+        "run_id": run_id,
+        "output_folder_path": output_folder_path,
+        "log_file": os.path.join(output_folder_path, 'token_log.csv'),
+    }
+
+
+def call_and_log(prompt, job, ctx, stage, bloom_level=None, model=None, route=None):
+    """
+    Calls the model routed for this stage/Bloom level (or the given model)
+    with a max_tokens sized from history, and appends the call to the job's
+    token log. The model used is returned in response["routed_model"] and
+    the call's usage record (tokens, cached/reasoning tokens, time to first
+    token, duration) in response["call_usage"]. In batch mode (ctx["batch"])
+    the response comes from a downloaded batch result instead.
+    """
+    params = job["params"]
+    bloom_level = bloom_level or ", ".join(job.get("bloom_levels", []))
+    if model is None:
+        model, route = route_model(ctx["config"], stage, bloom_level, job["subject"])
+    config = config_for_model(ctx["config"], model)
+    budget = ctx.get("token_budget")
+    max_tokens = budget.limit_for(config['model'], stage, bloom_level, params.get('num_questions')) if budget else None
+
+    progress = ctx.get("progress")
+    batch = ctx.get("batch")
+    if batch is not None:
+        # Batch mode: answered from downloaded batch results, or queued for the next batch (raises BatchPending)
+        response, tokens, duration, first = batch.call(prompt, config, stage, max_tokens)
+        if progress and first:
+            progress.call_started()
+            progress.record_call(config['model'], tokens[0], tokens[1], duration)
+    else:
+        first = True
+        if progress:
+            progress.call_started()
+        try:
+            response, tokens, duration = call_llm_api(prompt, config, params, max_tokens=max_tokens)
+        except Exception:
+            if progress:
+                progress.record_call(config['model'], 0, 0, 0.0, failed=True)
+            raise
+        if progress:
+            progress.record_call(config['model'], tokens[0], tokens[1], duration)
+    truncated = response.get("finish_reason") == "length"
+    if budget and first:
+        budget.observe(config['model'], stage, bloom_level, params.get('num_questions'), tokens[1], max_tokens, truncated)
+
+    extra = {
+        "stage": stage,
+        "call_bloom_level": bloom_level,
+        "route": route,
+        "max_tokens": max_tokens or "",
+        "finish_reason": response.get("finish_reason") or "",
+    }
+    usage = response.get("usage") or {}
+    for key in USAGE_LOG_FIELDS:
+        extra[key] = usage.get(key)
+    extra.update(response.get("metrics") or {})
+    # A batch result replayed for a later pass of the same job is only logged once
+    if first:
+        log_token_usage(config['model'], *tokens, duration, params, job["log_file"], extra=extra)
+        # The same call's input tokens split by prompt section (textbook, examples, rubric, ...)
+        log_prompt_sections(prompt, config['model'], stage, bloom_level, tokens[0],
+                            os.path.join(os.path.dirname(job["log_file"]), SECTIONS_LOG))
+    response["routed_model"] = config['model']
+    response["call_usage"] = dict(usage, prompt_tokens=tokens[0], completion_tokens=tokens[1], duration_sec=duration)
+    return response
+
+
+# =========================
+# Shared stages
+# =========================
+def load_stage(job, ctx):
+    job["data"] = load_subject_data(job["subject"])
+    yield job
+
+
+def retrieve_stage(job, ctx):
+    params = job["params"]
+    data = job["data"]
+    subtopic = params.get('subtopic', 'Unknown Subtopic')
+    job["bloom_levels"] = split_bloom_levels(params.get('bloom_level', 'Analyzing, Evaluating'))
+    job["full_subtopic_text"] = find_subtopic_text(data["textbook"], subtopic) or ""
+    if not job["full_subtopic_text"]:
+        print(f"Warning: Could not find content for subtopic '{subtopic}'. Using general knowledge.")
+    job["curriculum_content"] = find_topic_text(data["curriculum"], params.get('topic', ''))
+    job["glossary_verbs"] = {
+        level: get_verbs_for_bloom_level(level, job["subject"]) for level in job["bloom_levels"]
+    }
+    yield job
+
+
+def bank_lookup_stage(job, ctx):
+    """
+    Bank-first mode: serves each Bloom level from earlier, non-rejected Q&As
+    in the question bank and leaves only the shortfall to be generated.
+    """
+    settings = dict(BANK_FIRST_DEFAULTS, **(ctx["config"].get('bank_first') or {}))
+    if not settings["enabled"]:
+        yield job
+        return
+
+    params = job["params"]
+    wanted = int(params.get('num_questions') or 0)
+    job["reused"] = {}
+    job["shortfall"] = {}
+
+    store = ctx["store"]
+    if settings["index_results"]:
+        # Only new or changed results folders are read, once per process
+        with _INDEXED_LOCK:
+            if store.db_path not in _INDEXED_BANKS:
+                store.index_results()
+                _INDEXED_BANKS.add(store.db_path)
+
+    keywords = params.get('user_keywords') if settings["match_keywords"] else None
+    for level in job["bloom_levels"]:
+        found = store.find_reusable(job["subject"], params.get('topic', ''), params.get('subtopic', ''),
+                                    level, wanted, keywords, exclude_run_id=job["run_id"])
+        job["reused"][level] = found
+        job["shortfall"][level] = wanted - len(found)
+    served = sum(len(items) for items in job["reused"].values())
+    print(f"Bank-first: {served} Q&As reused, {sum(job['shortfall'].values())} to generate.")
+    yield job
+
+
+def plan_rebuild(job, config, store, old_items):
+    """
+    Sorts a run's Q&As by what changed since they were generated: unchanged
+    and untracked ones are carried over as "reused", those with only new
+    Step 2 inputs go to "regenerate_answers", and those with new Step 1
+    inputs count towards the "shortfall" of new questions per Bloom level.
+    Returns {action: [(item, changed input names)]} for reporting.
+    """
+    job["reused"], job["regenerate_answers"] = {}, {}
+    job["shortfall"] = {level: 0 for level in job["bloom_levels"]}
+    current = {}
+    plan = {"unchanged": [], "untracked": [], "answers": [], "questions": []}
+    for old in old_items:
+        level = old["bloom_level"]
+        if level not in current:
+            current[level] = item_inputs(job, level, config)
+        recorded = old["payload"].get("inputs")
+        action = rebuild_action(recorded, current[level])
+        plan[action].append((old, changed_inputs(recorded, current[level]) if recorded else []))
+        if action == "questions":
+            job["shortfall"][level] = job["shortfall"].get(level, 0) + 1
+        elif action == "answers":
+            job["regenerate_answers"].setdefault(level, []).append(old)
+        else:
+            job["reused"].setdefault(level, []).append(old)
+    return plan
+
+
+def rebuild_plan_stage(job, ctx):
+    """Replaces bank_lookup in rebuilds: plans which Q&As of job["rebuild_from"] to regenerate."""
+    old_items = ctx["store"].query(run_id=job["rebuild_from"])
+    plan = plan_rebuild(job, ctx["config"], ctx["store"], old_items)
+    print(f"Rebuild of {job['rebuild_from']}: {len(plan['unchanged']) + len(plan['untracked'])} Q&As kept, "
+          f"{len(plan['answers'])} answers and {len(plan['questions'])} questions to regenerate.")
+    yield job
+
+
+def persist_stage(item, ctx):
+    job = item["job"]
+    item["item_id"] = ctx["store"].add_item(
+        job["run_id"], job["params"], item.get("model", ctx["config"]['model']), item["bloom_level"], item["qna"]
+    )
+    yield item
+
+
+# =========================
+# Separate-Prompts stages
+# =========================
+def generate_level_questions(job, ctx, bloom_level, num_questions):
+    """One Step 1 call for a single Bloom level; returns its list of question objects."""
+    data = job["data"]
+    prompt = build_level_questions_prompt(
+        dict(job["params"], num_questions=num_questions), data["textbook"], data["curriculum"],
+        examples_for(job, ctx["config"], ctx["store"], [bloom_level]),
+        bloom_level, section_format=ctx["config"].get('prompt_format')
+    )
+    response = call_and_log(prompt, job, ctx, "generate_questions", bloom_level)
+    parsed = parse_questions_response(response)
+    questions = parsed.get(bloom_level)
+    if questions is None and len(parsed) == 1:
+        questions = next(iter(parsed.values()))
+    if not isinstance(questions, list) or not questions:
+        raise ValueError(f"no questions returned for {bloom_level}")
+    return questions[:num_questions]
+
+
+def generate_questions_fan_out(job, ctx, counts, settings):
+    """
+    Generates each Bloom level in its own parallel call and merges the
+    results into the usual {bloom_level: [questions]} structure. A level
+    whose call fails is retried on its own.
+    """
+    questions_by_bloom, failed = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, min(len(counts), settings["max_workers"]))) as pool:
+        futures = {pool.submit(generate_level_questions, job, ctx, level, n): level for level, n in counts.items()}
+        for future in as_completed(futures):
+            level = futures[future]
+            try:
+                questions_by_bloom[level] = future.result()
+            except Exception as e:
+                print(f"Question generation for {level} failed: {e}")
+                failed.append(level)
+
+    for level in failed:
+        for attempt in range(1, settings["retries"] + 1):
+            try:
+                print(f"Retrying {level} (attempt {attempt}/{settings['retries']})...")
+                questions_by_bloom[level] = generate_level_questions(job, ctx, level, counts[level])
+                break
+            except Exception as e:
+                print(f"Question generation for {level} failed again: {e}")
+    if not questions_by_bloom:
+        raise ValueError("question generation failed for every Bloom level")
+    # Keep the requested level order
+    return {level: questions_by_bloom[level] for level in counts if level in questions_by_bloom}
+
+
+def generate_questions_stage(job, ctx):
+    data = job["data"]
+    shortfall = {level: n for level, n in job.get("shortfall", {}).items() if n > 0}
+    if "shortfall" in job and not shortfall:
+        print("Every Bloom level is already covered (question bank or rebuild); no questions to generate.")
+        job["questions_by_bloom"] = {}
+        yield job
+        return
+
+    fan_out = dict(FAN_OUT_DEFAULTS, **(ctx["config"].get('fan_out_levels') or {}))
+    counts = shortfall or {level: int(job["params"].get('num_questions') or 0) for level in job["bloom_levels"]}
+    if fan_out["enabled"] and len(counts) > 1:
+        job["questions_by_bloom"] = generate_questions_fan_out(job, ctx, counts, fan_out)
+    else:
+        params = job["params"]
+        if shortfall:
+            params = dict(params, bloom_level=", ".join(shortfall), num_questions=max(shortfall.values()))
+        questions_prompt = build_questions_prompt(
+            params, data["textbook"], data["curriculum"],
+            examples_for(job, ctx["config"], ctx["store"], list(shortfall) or job["bloom_levels"]), job["glossary_verbs"],
+            section_format=ctx["config"].get('prompt_format')
+        )
+        response = call_and_log(questions_prompt, job, ctx, "generate_questions", ", ".join(shortfall) or None)
+        job["questions_by_bloom"] = parse_questions_response(response)
+        if shortfall:
+            job["questions_by_bloom"] = {
+                level: questions[:shortfall[level]] if isinstance(questions, list) else questions
+                for level, questions in job["questions_by_bloom"].items() if level in shortfall
+            }
+
+    questions_file_with_content = os.path.join(job["output_folder_path"], 'questions_with_content.json')
+    save_questions_with_content(job["questions_by_bloom"], questions_file_with_content)
+    yield job
+
+
+def prefilter_stage(job, ctx):
+    """
+    Rejects questions that fail the local checks (Bloom verbs, length,
+    self-containedness, leaked references) before any Step 2 call, and asks
+    the model for replacements for up to max_rounds rounds.
+    """
+    settings = dict(FILTER_DEFAULTS, **(ctx["config"].get('prefilter') or {}))
+    if not settings["enabled"]:
+        yield job
+        return
+
+    # Questions reused from the bank (or kept by a rebuild) count as already asked
+    seen = {question_key(item["question"]) for items in job.get("reused", {}).values() for item in items}
+    seen |= {question_key(item["question"]) for items in job.get("regenerate_answers", {}).values() for item in items}
+    kept, rejected = filter_questions(job["questions_by_bloom"], job["subject"], settings, seen)
+    record_rejections(job, "prefilter", sum(len(q) for q in kept.values()) + len(rejected),
+                      len(rejected), [r for item in rejected for r in item["reasons"]])
+    for item in rejected:
+        print(f"  Rejected ({', '.join(item['reasons'])}): {item['question'][:60]}...")
+
+    needed = {}
+    for item in rejected:
+        needed[item["bloom_level"]] = needed.get(item["bloom_level"], 0) + 1
+    rounds = settings["max_rounds"] if settings["regenerate"] else 0
+    for _ in range(rounds):
+        missing = {level: count for level, count in needed.items() if count > 0}
+        if not missing:
+            break
+        print(f"Regenerating {sum(missing.values())} rejected questions ({', '.join(missing)})...")
+
+        params = dict(job["params"], bloom_level=", ".join(missing), num_questions=max(missing.values()))
+        data = job["data"]
+        prompt = build_questions_prompt(
+            params, data["textbook"], data["curriculum"],
+            examples_for(job, ctx["config"], ctx["store"], list(missing)), job["glossary_verbs"],
+            section_format=ctx["config"].get('prompt_format')
+        )
+        problems = "\n".join(f"- \"{item['question']}\" ({', '.join(item['reasons'])})" for item in rejected)
+        prompt += ("\n\nThese earlier questions were rejected; do not repeat them or their problems "
+                   "(each question must use a glossary verb for its level and make sense without the text):\n" + problems)
+        response = call_and_log(prompt, job, ctx, "regenerate_questions", ", ".join(missing))
+
+        new_kept, new_rejected = filter_questions(parse_questions_response(response), job["subject"], settings, seen)
+        replaced = 0
+        for bloom_level, count in missing.items():
+            replacements = new_kept.get(bloom_level, [])[:count]
+            kept.setdefault(bloom_level, []).extend(replacements)
+            needed[bloom_level] -= len(replacements)
+            replaced += len(replacements)
+        record_rejections(job, "regenerate", sum(len(q) for q in new_kept.values()) + len(new_rejected),
+                          len(new_rejected), [r for item in new_rejected for r in item["reasons"]], replaced=replaced)
+        rejected += new_rejected
+
+    job["questions_by_bloom"] = kept
+    yield job
+
+
+def ground_stage(job, ctx):
+    """Checks every source_text against the textbook, then fans out one item per question."""
+    config = ctx["config"]
+    params = job["params"]
+    indexes = get_grounding_indexes(
+        job["data"]["textbook"], job["data"]["curriculum"], params.get('subtopic', ''), params.get('topic', '')
+    )
+    questions_by_bloom, stats = validate_questions(
+        job["questions_by_bloom"],
+        indexes,
+        min_score=config.get('grounding_min_score', 0.6),
+        drop_ungrounded=config.get('drop_ungrounded', False)
+    )
+    print(f"Grounding check: {stats['checked']} questions checked, {stats['dropped']} dropped as ungrounded.")
+    record_rejections(job, "ground", stats['checked'], stats['dropped'], ["ungrounded"] * stats['dropped'])
+
+    for bloom_level, questions in questions_by_bloom.items():
+        for q_obj in questions:
+            if not isinstance(q_obj, dict) or not q_obj.get('question'):
+                print(f"Skipping malformed question object: {q_obj}")
+                continue
+            yield {"job": job, "bloom_level": bloom_level, "q_obj": q_obj, "keep_question": True}
+
+    # Q&As served from the bank already have an answer and rubric
+    for bloom_level, items in job.get("reused", {}).items():
+        for reused in items:
+            qna = dict(reused["payload"], reused_from=reused["id"])
+            yield {"job": job, "bloom_level": bloom_level, "q_obj": {"question": reused["question"]},
+                   "qna": qna, "model": reused["model"]}
+
+    # Rebuilds: questions that are kept but need a new answer and rubric
+    for bloom_level, items in job.get("regenerate_answers", {}).items():
+        for old in items:
+            q_obj = {"question": old["question"], "source_text": old["payload"].get("source_text", "N/A")}
+            if "grounding" in old["payload"]:
+                q_obj["grounding"] = old["payload"]["grounding"]
+            yield {"job": job, "bloom_level": bloom_level, "q_obj": q_obj}
+
+
+def cascade_answer(prompt, item, ctx, settings, focused_context):
+    """
+    Generates the answer/rubric with each cascade model in turn (cheapest
+    first) until one passes the local checks. Returns (qna, response) of the
+    last call made.
+    """
+    job = item["job"]
+    stats = ctx.setdefault("cascade_stats", CascadeStats(settings["models"], ctx["config"].get('prices')))
+    expected_levels = expected_rubric_levels(job["data"]["rubrics"])
+    attempts, qna_pair, passed = [], None, False
+    for step, model in enumerate(settings["models"], start=1):
+        response = call_and_log(prompt, job, ctx, "answer_rubric", item["bloom_level"],
+                                model=model, route=f"cascade {step}")
+        try:
+            qna_pair = parse_qna_response(response)
+        except ValueError:
+            qna_pair = None
+        reasons = check_qna(qna_pair, focused_context, expected_levels, settings)
+        attempts.append(dict(response["call_usage"], model=response["routed_model"], reasons=reasons))
+        if not reasons:
+            passed = True
+            break
+        if step < len(settings["models"]):
+            print(f"  Escalating ({', '.join(reasons)}) from {model}: {item['q_obj']['question'][:50]}...")
+
+    stats.record(item["bloom_level"], item["q_obj"]['question'], attempts, passed)
+    return qna_pair if isinstance(qna_pair, dict) else {}, response
+
+
+def lazy_answer(item, ctx, settings, focused_context):
+    """
+    Lazy rubrics: generates only the answer (or nothing) and leaves a rubric
+    thunk, everything needed to write the rubric when it is first requested
+    (see lazy_rubrics.py). Returns (qna, response or None).
+    """
+    job = item["job"]
+    question = item["q_obj"]['question']
+    section_format = ctx["config"].get('prompt_format')
+    response = None
+    qna_pair = {"question": question, "answer": None}
+    if settings["answers"]:
+        prompt = build_answer_prompt(question, item["bloom_level"], focused_context, section_format=section_format)
+        response = call_and_log(prompt, job, ctx, "answer", item["bloom_level"])
+        qna_pair = parse_qna_response(response)
+    qna_pair['rubric'] = None
+    qna_pair['rubric_thunk'] = {
+        "question": question,
+        "bloom_level": item["bloom_level"],
+        "focused_context": focused_context,
+        "section_format": section_format,
+        "template_version": template_version("rubric" if settings["answers"] else "answer_rubric",
+                                             job["subject"], section_format),
+        "with_answer": not settings["answers"],
+    }
+    return qna_pair, response
+
+
+def skeleton_answer(item, ctx, settings, focused_context):
+    """
+    Rubric skeleton mode: the 4 shared level descriptions for the subtopic and
+    Bloom level come from the skeleton cache (generated on first use), so the
+    per-question call writes only the answer and a short criterion per level.
+    Returns (qna with the assembled rubric, response).
+    """
+    job = item["job"]
+    config = ctx["config"]
+    bloom_level = item["bloom_level"]
+    section_format = config.get('prompt_format')
+    skeleton_model, skeleton_route = route_model(config, "rubric_skeleton", bloom_level, job["subject"])
+    key = skeleton_key(job["subject"], job["params"].get('subtopic', ''), bloom_level, job["data"]["rubrics"],
+                       template_version("rubric_skeleton", job["subject"], section_format), skeleton_model)
+
+    def generate():
+        prompt = build_rubric_skeleton_prompt(
+            job["params"], bloom_level, job["glossary_verbs"].get(bloom_level) or [],
+            render_subject_file(job["subject"], 'rubrics.json', section_format), section_format=section_format
+        )
+        response = call_and_log(prompt, job, ctx, "rubric_skeleton", bloom_level,
+                                model=skeleton_model, route=skeleton_route)
+        return skeleton_levels(parse_qna_response(response))
+
+    skeleton = get_skeleton_cache(settings["cache_file"]).get_or_create(key, generate)
+    prompt = build_answer_criteria_prompt(item["q_obj"]['question'], bloom_level, focused_context, skeleton,
+                                          section_format=section_format)
+    # Routed like a full answer/rubric call, logged under its own stage
+    model, route = route_model(config, "answer_rubric", bloom_level, job["subject"])
+    response = call_and_log(prompt, job, ctx, "answer_criteria", bloom_level, model=model, route=route)
+    qna_pair = parse_qna_response(response)
+    qna_pair['rubric'] = assemble_rubric(skeleton, qna_pair.pop('criteria', None))
+    qna_pair['rubric_skeleton'] = key
+    return qna_pair, response
+
+
+def answer_rubric_stage(item, ctx):
+    if "qna" in item:
+        yield item
+        return
+    job = item["job"]
+    question = item["q_obj"]['question']
+    focused_context = find_focused_context(question, job["full_subtopic_text"])
+    lazy = dict(LAZY_RUBRICS_DEFAULTS, **(ctx["config"].get('lazy_rubrics') or {}))
+    cascade = dict(CASCADE_DEFAULTS, **(ctx["config"].get('cascade') or {}))
+    skeletons = dict(SKELETON_DEFAULTS, **(ctx["config"].get('rubric_skeletons') or {}))
+    if lazy["enabled"]:
+        qna_pair, response = lazy_answer(item, ctx, lazy, focused_context)
+    elif skeletons["enabled"]:
+        qna_pair, response = skeleton_answer(item, ctx, skeletons, focused_context)
+    else:
+        section_format = ctx["config"].get('prompt_format')
+        qna_prompt = build_AnswerRubrics_prompt(
+            question, item["bloom_level"], focused_context,
+            render_subject_file(job["subject"], 'rubrics.json', section_format), section_format=section_format
+        )
+        if cascade["enabled"] and cascade["models"]:
+            qna_pair, response = cascade_answer(qna_prompt, item, ctx, cascade, focused_context)
+        else:
+            response = call_and_log(qna_prompt, job, ctx, "answer_rubric", item["bloom_level"])
+            qna_pair = parse_qna_response(response)
+
+    if item.get("keep_question"):
+        qna_pair['question'] = question
+    qna_pair['source_text'] = item["q_obj"].get('source_text', 'N/A')
+    if 'grounding' in item["q_obj"]:
+        qna_pair['grounding'] = item["q_obj"]['grounding']
+    if response is not None:
+        # Kept with the Q&A for reporting (e.g. the columnar export)
+        qna_pair['usage'] = {key: response["call_usage"].get(key)
+                             for key in ("prompt_tokens", "completion_tokens", "cached_tokens", "reasoning_tokens", "duration_sec")}
+        item["model"] = response["routed_model"]
+    # Hashes of everything the Q&A was generated from, for rebuild.py
+    qna_pair['inputs'] = item_inputs(job, item["bloom_level"], ctx["config"])
+    item["focused_context"] = focused_context
+    item["qna"] = qna_pair
+    yield item
+
+
+def validate_qna_stage(item, ctx):
+    qna = item["qna"]
+    # A lazy rubric without an answer gets both when the rubric is first requested
+    answer_later = isinstance(qna, dict) and (qna.get('rubric_thunk') or {}).get('with_answer')
+    if not isinstance(qna, dict) or not (qna.get('answer') or answer_later):
+        raise ValueError(f"Q&A for '{item['q_obj']['question'][:30]}...' has no answer.")
+    yield item
+
+
+# =========================
+# Single-Prompt stages
+# =========================
+def generate_single_stage(job, ctx):
+    """One call for every Bloom level; fans out one item per Q&A found in the response."""
+    data = job["data"]
+    section_format = ctx["config"].get('prompt_format')
+    prompt = build_prompt(
+        job["params"], data["textbook"], data["curriculum"],
+        examples_for(job, ctx["config"], ctx["store"], job["bloom_levels"]),
+        render_subject_file(job["subject"], 'rubrics.json', section_format), section_format=section_format
+    )
+    response = call_and_log(prompt, job, ctx, "generate")
+    parsed = safe_json_parse(response['choices'][0]['message']['content'])
+    ctx["store"].set_raw_output(job["run_id"], parsed)
+
+    for bloom_level, qna in iter_qna_items(parsed, job["bloom_levels"]):
+        yield {"job": job, "bloom_level": bloom_level, "qna": qna, "model": response["routed_model"]}
+
+
+def validate_single_stage(item, ctx):
+    if not isinstance(item["qna"], dict) or not item["qna"].get('question'):
+        raise ValueError("Q&A item has no question.")
+    yield item
+
+
+# Graph configurations: (stage name, function, default concurrency)
+SEPARATE_PROMPTS_GRAPH = [
+    ("load", load_stage, 1),
+    ("retrieve", retrieve_stage, 1),
+    ("bank_lookup", bank_lookup_stage, 1),
+    ("generate_questions", generate_questions_stage, 2),
+    ("prefilter", prefilter_stage, 1),
+    ("ground", ground_stage, 1),
+    ("answer_rubric", answer_rubric_stage, 4),
+    ("validate", validate_qna_stage, 1),
+    ("persist", persist_stage, 1),
+]
+
+# Incremental rebuild of an earlier Separate-Prompts run (see rebuild.py)
+REBUILD_GRAPH = [
+    ("rebuild_plan", rebuild_plan_stage, 1) if name == "bank_lookup" else (name, fn, concurrency)
+    for name, fn, concurrency in SEPARATE_PROMPTS_GRAPH
+]
+
+SINGLE_PROMPT_GRAPH = [
+    ("load", load_stage, 1),
+    ("retrieve", retrieve_stage, 1),
+    ("generate", generate_single_stage, 2),
+    ("validate", validate_single_stage, 1),
+    ("persist", persist_stage, 1),
+]
+
+STRATEGIES = {
+    "separate-prompts": SEPARATE_PROMPTS_GRAPH,
+    "single-prompt": SINGLE_PROMPT_GRAPH,
+}
@@ -0,0 +1,127 @@
+# Sizes each call's max_tokens from completion lengths observed in past token logs
+
+import os
+import csv
+import glob
+import math
+import datetime
+import threading
+
+from .data_loader import DATA_DIR
+from .llm_api_client import DEFAULT_MAX_TOKENS, GEMINI_DEFAULT_MAX_TOKENS
+from .token_logger import append_csv_row
+
+BUDGET_DEFAULTS = {
+    "enabled": True,
+    "percentile": 0.99,
+    "margin": 1.2,
+    "min_margin_tokens": 256,
+    "min_samples": 5,
+    "floor": 512,
+    # Output cap per model name or prefix (longest match wins), e.g.
+    # {"gpt-4o": 16384, "claude-3-5-sonnet": 8192}. Models not listed are
+    # capped at the provider default, which every model accepts.
+    "ceilings": {},
+    "truncation_multiplier": 2.0,
+}
+
+
+def budget_key(model, stage, bloom_level, num_questions):
+    return (str(model), str(stage), str(bloom_level or ""), str(num_questions or ""))
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(p * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class TokenBudget:
+    """
+    Per-call output limit: p99 of completion tokens seen for the same
+    (model, stage, Bloom level, num_questions), plus a margin. Keys with too
+    little history keep the provider default. A truncated response raises the
+    limit for the key's next call and is recorded in token_budget_events.csv.
+    """
+
+    def __init__(self, settings=None, log_root=None):
+        self.settings = dict(BUDGET_DEFAULTS, **(settings or {}))
+        self.log_root = log_root or DATA_DIR
+        self.events_file = os.path.join(self.log_root, 'token_budget_events.csv')
+        self.history = {}
+        self.raised = {}
+        self._lock = threading.Lock()
+        if self.settings["enabled"]:
+            self.load_history()
+
+    def load_history(self):
+        """Reads completion tokens from every token_log.csv with a 'stage' column."""
+        pattern = os.path.join(self.log_root, '*', 'results', '**', 'token_log.csv')
+        for path in glob.glob(pattern, recursive=True):
+            with open(path, newline='') as f:
+                for row in csv.DictReader(f):
+                    if not row.get("stage") or not row.get("completion_tokens"):
+                        continue
+                    bloom_level = row.get("call_bloom_level") or row.get("bloom_level")
+                    key = budget_key(row.get("model"), row["stage"], bloom_level, row.get("num_questions"))
+                    self.history.setdefault(key, []).append(int(float(row["completion_tokens"])))
+        for values in self.history.values():
+            values.sort()
+
+    def _ceiling(self, model):
+        """The model's configured output cap, or its provider default."""
+        matches = [prefix for prefix in self.settings["ceilings"] if str(model).startswith(prefix)]
+        if matches:
+            return int(self.settings["ceilings"][max(matches, key=len)])
+        return self._default(model)
+
+    def _default(self, model):
+        return GEMINI_DEFAULT_MAX_TOKENS if "gemini" in model else DEFAULT_MAX_TOKENS
+
+    def limit_for(self, model, stage, bloom_level, num_questions):
+        """Returns the max_tokens to request, or None to keep the provider default."""
+        if not self.settings["enabled"]:
+            return None
+        key = budget_key(model, stage, bloom_level, num_questions)
+        with self._lock:
+            if key in self.raised:
+                return self.raised[key]
+            values = self.history.get(key, [])
+            if len(values) < self.settings["min_samples"]:
+                return None
+            p = percentile(values, self.settings["percentile"])
+        limit = max(int(p * self.settings["margin"]), p + self.settings["min_margin_tokens"])
+        return max(self.settings["floor"], min(limit, self._ceiling(model)))
+
+    def observe(self, model, stage, bloom_level, num_questions, completion_tokens, max_tokens, truncated):
+        """
+        Records a finished call. On truncation the key's next limit is raised
+        (multiplied, up to the model's ceiling) and the event is appended to the events file.
+        """
+        key = budget_key(model, stage, bloom_level, num_questions)
+        with self._lock:
+            values = self.history.setdefault(key, [])
+            values.append(int(completion_tokens or 0))
+            values.sort()
+            if not truncated:
+                return None
+            current = max_tokens or self._default(model)
+            new_limit = min(int(current * self.settings["truncation_multiplier"]), self._ceiling(model))
+            self.raised[key] = max(new_limit, self.raised.get(key, 0))
+            append_csv_row(self.events_file, {
+                "timestamp": datetime.datetime.now().isoformat(),
+                "model": model,
+                "stage": stage,
+                "bloom_level": bloom_level or "",
+                "num_questions": num_questions or "",
+                "max_tokens": current,
+                "completion_tokens": completion_tokens,
+                "new_max_tokens": self.raised[key],
+            })
+        if self.raised[key] > current:
+            print(f"⚠️ Output truncated at {current} tokens ({model}, {stage}, {bloom_level}); "
+                  f"next limit raised to {self.raised[key]}.")
+        else:
+            print(f"⚠️ Output truncated at {current} tokens ({model}, {stage}, {bloom_level}), "
+                  f"the model's ceiling; add it to token_budget.ceilings to allow more.")
+        return self.raised[key]
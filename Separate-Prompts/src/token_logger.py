@@ -3,13 +3,18 @@
 import datetime
 import csv
 import os
+import threading
 
 # BASE_DIR is defined relative to this file's location
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def log_token_usage(model, prompt_tokens, completion_tokens, total_tokens, duration_sec, params_data, log_file=None):
+# Pipeline stages log from several threads at once
+_LOG_LOCK = threading.Lock()
+
+def log_token_usage(model, prompt_tokens, completion_tokens, total_tokens, duration_sec, params_data, log_file=None, extra=None):
     """
     Logs token usage and generation parameters to a CSV file.
+    extra holds optional per-call metrics (e.g. Ollama timings) logged as additional columns.
     """
     log_file = log_file or "token_log.csv"
     # Ensure log_path is relative to the project root if BASE_DIR is project root
@@ -44,15 +49,44 @@ def log_token_usage(model, prompt_tokens, completion_tokens, total_tokens, durat
         else:
             data_row[field] = value if value is not None else ""
 
-    is_first_time = not os.path.exists(log_path)
-    fieldnames = list(data_row.keys())
+    for field, value in (extra or {}).items():
+        data_row[field] = value if value is not None else ""
 
-    with open(log_path, 'a', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if is_first_time:
+    with _LOG_LOCK:
+        append_csv_row(log_path, data_row)
+    # print(f"Logged token usage to {log_path}") # Optional: for debugging
+
+def append_csv_row(log_path, data_row):
+    """
+    Appends a row to a CSV log. If the row has columns the existing header
+    lacks, the file is rewritten once with the widened header.
+    """
+    header = None
+    if os.path.exists(log_path):
+        with open(log_path, newline='') as f:
+            header = next(csv.reader(f), None)
+
+    if header is None:
+        with open(log_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(data_row.keys()))
             writer.writeheader()
+            writer.writerow(data_row)
+        return
+
+    new_fields = [k for k in data_row if k not in header]
+    if new_fields:
+        with open(log_path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        header = header + new_fields
+        with open(log_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=header, restval="")
+            writer.writeheader()
+            writer.writerows(rows)
+
+    with open(log_path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=header, restval="", extrasaction='ignore')
         writer.writerow(data_row)
-    # print(f"Logged token usage to {log_path}") # Optional: for debugging
+
 
 if __name__ == '__main__':
     # Example usage:
@@ -0,0 +1,279 @@
+# Shared SQLite work queue for sweeps run by several worker processes/hosts
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import datetime
+import threading
+
+from .data_loader import DATA_DIR
+
+SWEEPS_DIR = os.path.join(DATA_DIR, "sweeps")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT UNIQUE NOT NULL,
+    subject TEXT,
+    topic TEXT,
+    subtopic TEXT,
+    bloom_level TEXT,
+    model TEXT,
+    params_json TEXT,
+    status TEXT DEFAULT 'pending',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER DEFAULT 0,
+    run_id TEXT,
+    error TEXT,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started_at REAL,
+    last_heartbeat REAL,
+    jobs_done INTEGER DEFAULT 0,
+    jobs_failed INTEGER DEFAULT 0,
+    busy_sec REAL DEFAULT 0
+);
+"""
+
+JOB_FIELDS = ("subject", "topic", "subtopic", "bloom_level", "model")
+
+
+def job_key(subject, topic, subtopic, bloom_level, model):
+    return "|".join(str(v) for v in (subject.lower(), topic, subtopic, bloom_level, model))
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Jobs (subject x subtopic x Bloom level x model) shared by every worker of a sweep.
+
+    A worker claims a job by taking a lease and renews it with heartbeats.
+    A job whose lease has expired (its worker crashed or lost the network) is
+    pending again and is stolen by the next worker that asks for work.
+
+    The database is opened in rollback-journal mode: WAL needs shared memory
+    and does not work on network filesystems.
+    """
+
+    def __init__(self, db_path, lease_sec=300, max_attempts=3):
+        self.db_path = db_path
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, fn):
+        """Runs fn(conn) in a write transaction taken up front, so claims never race."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.conn)
+                self.conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------------------------------
+    # Coordinator
+    # ------------------------------------------------------------------
+    def enqueue(self, jobs):
+        """
+        Adds jobs (dicts with JOB_FIELDS and a 'params' dict). Jobs already
+        in the queue are left as they are. Returns the number added.
+        """
+        def insert(conn):
+            added = 0
+            for job in jobs:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (job_key, subject, topic, subtopic, bloom_level, model, params_json) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_key(*(job[f] for f in JOB_FIELDS)), *(job[f] for f in JOB_FIELDS),
+                     json.dumps(job.get("params", {}), ensure_ascii=False))
+                )
+                added += cur.rowcount
+            return added
+        return self._write(insert)
+
+    def retry_failed(self):
+        """Puts failed jobs back in the queue with a fresh attempt count."""
+        return self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, error = NULL WHERE status = 'failed'"
+        ).rowcount)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def register_worker(self, worker_id):
+        now = time.time()
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO workers (worker_id, host, pid, started_at, last_heartbeat) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET last_heartbeat = excluded.last_heartbeat",
+            (worker_id, socket.gethostname(), os.getpid(), now, now)
+        ))
+
+    def claim(self, worker_id):
+        """
+        Leases the next job: a pending one, or one whose lease has expired.
+        Returns the job as a dict (with 'params'), or None if nothing is claimable.
+        """
+        def take(conn):
+            now = time.time()
+            # Expired leases that have used every attempt are given up on
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "AND attempts < ? ORDER BY attempts, id LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "leased":
+                print(f"Stealing job {row['id']} from {row['worker_id']} (lease expired).")
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1, "
+                "started_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_sec, now, row["id"])
+            )
+            conn.execute("UPDATE workers SET last_heartbeat = ? WHERE worker_id = ?", (now, worker_id))
+            job = dict(row)
+            job["params"] = json.loads(job.pop("params_json") or "{}")
+            job["attempts"] += 1
+            return job
+        return self._write(take)
+
+    def heartbeat(self, worker_id, job_id=None):
+        """
+        Renews the worker's lease on job_id. Returns False if the job has
+        been taken over by another worker (our lease had already expired).
+        """
+        def beat(conn):
+            now = time.time()
+            conn.execute("UPDATE workers SET last_heartbeat = ? WHERE worker_id = ?", (now, worker_id))
+            if job_id is None:
+                return True
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (now + self.lease_sec, job_id, worker_id)
+            )
+            return cur.rowcount == 1
+        return self._write(beat)
+
+    def complete(self, job_id, worker_id, run_id=None):
+        """Marks a job done. Returns False if another worker owns it now."""
+        def done(conn):
+            now = time.time()
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'done', run_id = ?, finished_at = ?, error = NULL "
+                "WHERE id = ? AND worker_id = ?",
+                (run_id, now, job_id, worker_id)
+            )
+            if cur.rowcount:
+                conn.execute(
+                    "UPDATE workers SET jobs_done = jobs_done + 1, last_heartbeat = ?, "
+                    "busy_sec = busy_sec + ? - (SELECT started_at FROM jobs WHERE id = ?) WHERE worker_id = ?",
+                    (now, now, job_id, worker_id)
+                )
+            return cur.rowcount == 1
+        return self._write(done)
+
+    def fail(self, job_id, worker_id, error):
+        """
+        Records a failed attempt. The job goes back to pending until it has
+        used max_attempts, then it is marked failed.
+        """
+        def failed(conn):
+            now = time.time()
+            cur = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, finished_at = ?, lease_expires = NULL WHERE id = ? AND worker_id = ?",
+                (self.max_attempts, str(error)[:1000], now, job_id, worker_id)
+            )
+            if cur.rowcount:
+                conn.execute(
+                    "UPDATE workers SET jobs_failed = jobs_failed + 1, last_heartbeat = ?, "
+                    "busy_sec = busy_sec + ? - (SELECT started_at FROM jobs WHERE id = ?) WHERE worker_id = ?",
+                    (now, now, job_id, worker_id)
+                )
+            return cur.rowcount == 1
+        return self._write(failed)
+
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+    def is_drained(self):
+        """True when no job is pending or leased (everything is done or failed)."""
+        with self._lock:
+            row = self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()
+        return row[0] == 0
+
+    def progress(self):
+        """
+        Returns sweep progress: job counts by status, and per worker the jobs
+        done/failed, throughput (jobs per hour of wall time), share of time
+        spent on jobs and whether it is alive.
+        """
+        now = time.time()
+        with self._lock:
+            counts = {r["status"]: r["n"] for r in self.conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            )}
+            first = self.conn.execute("SELECT MIN(started_at) FROM jobs").fetchone()[0]
+            workers = [dict(r) for r in self.conn.execute("SELECT * FROM workers ORDER BY started_at")]
+            current = {r["worker_id"]: r["subtopic"] + " / " + r["bloom_level"] + " / " + r["model"]
+                       for r in self.conn.execute("SELECT * FROM jobs WHERE status = 'leased'")}
+
+        total = sum(counts.values())
+        for w in workers:
+            elapsed = max(now - w["started_at"], 1e-6)
+            w["jobs_per_hour"] = round(3600 * w["jobs_done"] / elapsed, 2)
+            w["busy_pct"] = round(min(100 * w["busy_sec"] / elapsed, 100), 1)
+            w["alive"] = now - w["last_heartbeat"] < self.lease_sec
+            w["current_job"] = current.get(w["worker_id"], "")
+            w["last_heartbeat"] = datetime.datetime.fromtimestamp(w["last_heartbeat"]).isoformat(timespec="seconds")
+            w["started_at"] = datetime.datetime.fromtimestamp(w["started_at"]).isoformat(timespec="seconds")
+        done = counts.get("done", 0)
+        return {
+            "total": total,
+            "counts": counts,
+            "percent_done": round(100 * done / total, 1) if total else 0.0,
+            "jobs_per_hour": round(3600 * done / max(now - first, 1e-6), 2) if first else 0.0,
+            "workers": workers,
+        }
+
+    def failures(self, limit=20):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, subtopic, bloom_level, model, attempts, error FROM jobs "
+                "WHERE error IS NOT NULL ORDER BY finished_at DESC LIMIT ?", (int(limit),)
+            ).fetchall()
+        return [dict(r) for r in rows]
@@ -0,0 +1,353 @@
+import os
+import re
+import glob
+import json
+import time
+import argparse
+import threading
+
+from src.config_loader import load_config, read_config_file
+from src.data_loader import load_json_safe_from_base, find_mapping_file
+from src.book_ingest import load_mapping
+from src.results_store import ResultsStore
+from src.pipeline import build_pipeline
+from src.strategies import STRATEGIES, prepare_job
+from src.token_budget import TokenBudget
+from src.question_filter import report_rejections
+from src.progress import ProgressReporter, PROGRESS_DEFAULTS
+from src.work_queue import WorkQueue, SWEEPS_DIR, default_worker_id
+from src.batch_api import BATCH_DEFAULTS, BatchState, BatchPending, serve
+
+BLOOM_LEVELS = ["Remembering", "Understanding", "Applying", "Analyzing", "Evaluating", "Creating"]
+
+
+class LeaseLost(Exception):
+    """Another worker took over the job's lease while it was running."""
+
+
+def slug(text):
+    """Filesystem-safe folder name (e.g. 'models/gemini-2.5-flash' -> 'gemini-2.5-flash')."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', str(text).split('/')[-1]).strip('_')[:80]
+
+
+def sweep_dir(args):
+    return os.path.dirname(os.path.abspath(args.queue)) if args.queue else os.path.join(SWEEPS_DIR, args.sweep)
+
+
+def open_queue(args, file_config):
+    path = args.queue or os.path.join(sweep_dir(args), 'queue.db')
+    return WorkQueue(
+        path,
+        lease_sec=file_config.get('sweep_lease_sec', 300),
+        max_attempts=file_config.get('sweep_max_attempts', 3)
+    )
+
+
+class Heartbeat:
+    """Renews a job's lease in the background; .lost is set if another worker took it over."""
+
+    def __init__(self, work_queue, worker_id, job_id, interval):
+        self.work_queue = work_queue
+        self.worker_id = worker_id
+        self.job_id = job_id
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.work_queue.heartbeat(self.worker_id, self.job_id):
+                    self.lost.set()
+                    return
+            except Exception as e:
+                print(f"Heartbeat failed (will retry): {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_sweep_job(job, sweep, strategy, store, budget, progress=None, batch=None, lost=None):
+    """
+    Generates one subject x subtopic x Bloom level x model job into its own folder:
+    <subject>/results/<sweep>/<model>/<subtopic>/<bloom_level>/. Returns the run ID.
+    With batch (a JobBatch), calls are answered from batch results; if any had
+    to be queued instead, the pass is discarded and BatchPending is raised.
+    lost is the Heartbeat's event: once it is set the job stops at the next
+    stage, its partial run is deleted and LeaseLost is raised.
+    """
+    config = load_config(job['model'])
+    # A sweep job names its model; routing rules would send its calls elsewhere
+    config.pop('routing', None)
+    params = dict(job['params'])
+    output_folder = os.path.join(sweep, slug(config['model']), slug(job['subtopic']), job['bloom_level'])
+    prepared = prepare_job(params, config, store, strategy, output_folder=output_folder)
+
+    pipeline = build_pipeline(STRATEGIES[strategy], config)
+    ctx = {"config": config, "store": store, "token_budget": budget}
+    if progress:
+        pipeline.add_listener(progress)
+        ctx["progress"] = progress
+    if batch is not None:
+        ctx["batch"] = batch
+    if lost is not None:
+        ctx["cancel"] = lost
+    results = pipeline.run([prepared], ctx)
+    if lost is not None and lost.is_set():
+        store.delete_run(prepared['run_id'])
+        raise LeaseLost(f"lease on job {job['id']} was lost")
+    if batch is not None and batch.deferred:
+        store.delete_run(prepared['run_id'])
+        raise BatchPending(f"{batch.deferred} requests waiting for a batch")
+    report_rejections(prepared)
+    if "cascade_stats" in ctx:
+        ctx["cascade_stats"].report(prepared['output_folder_path'])
+    if not results:
+        raise RuntimeError("no Q&As were produced")
+
+    # Written atomically: a worker that lost its lease may still be finishing the same job
+    store.export_output_json(prepared['run_id'], os.path.join(prepared['output_folder_path'], 'output.json'))
+    return prepared['run_id']
+
+
+def enqueue(args, file_config):
+    params = load_json_safe_from_base('parameters.json')
+    subject = (args.subject or params.get('subject', 'biology')).lower()
+    try:
+        mapping = args.mapping or find_mapping_file(subject)
+    except FileNotFoundError as e:
+        raise SystemExit(f"{e} (use --mapping)")
+    if not os.path.exists(mapping):
+        raise SystemExit(f"Mapping file not found: {mapping} (use --mapping)")
+
+    models = [m.strip() for m in (args.models or ",".join(file_config.get('sweep_models', []))
+                                  or file_config.get('model', '')).split(",") if m.strip()]
+    bloom_levels = [b.strip() for b in (args.bloom_levels or ",".join(BLOOM_LEVELS)).split(",") if b.strip()]
+
+    jobs = []
+    for topic, subtopic in load_mapping(mapping):
+        for bloom_level in bloom_levels:
+            for model in models:
+                job_params = dict(params, subject=subject, topic=topic, subtopic=subtopic,
+                                  bloom_level=bloom_level, output_folder=args.sweep)
+                jobs.append({"subject": subject, "topic": topic, "subtopic": subtopic,
+                             "bloom_level": bloom_level, "model": model, "params": job_params})
+
+    with open_queue(args, file_config) as work_queue:
+        added = work_queue.enqueue(jobs)
+        if args.retry_failed:
+            print(f"Re-queued {work_queue.retry_failed()} failed jobs.")
+    print(f"Queued {added} new jobs ({len(jobs) - added} already present) in {sweep_dir(args)}")
+
+
+def work(args, file_config):
+    worker_id = args.worker_id or default_worker_id()
+    strategy = file_config.get('strategy', 'separate-prompts')
+    # Each worker owns its question bank; `merge` combines them afterwards
+    bank = os.path.join(sweep_dir(args), 'banks', f"{slug(worker_id)}.db")
+    budget = TokenBudget(file_config.get('token_budget'))
+    done = 0
+
+    # Per-worker live status, polled from data/sweeps/<sweep>/workers/<worker>.json
+    progress = None
+    progress_settings = dict(PROGRESS_DEFAULTS, **(file_config.get('progress') or {}))
+    if progress_settings['enabled']:
+        progress = ProgressReporter(
+            [name for name, _, _ in STRATEGIES[strategy]],
+            status_file=os.path.join(sweep_dir(args), 'workers', f"{slug(worker_id)}.json"),
+            prices=file_config.get('prices'),
+            interval_sec=progress_settings['interval_sec'],
+            window=progress_settings['window'],
+        ).start()
+
+    with open_queue(args, file_config) as work_queue, ResultsStore(bank) as store:
+        work_queue.register_worker(worker_id)
+        print(f"Worker {worker_id} started (strategy {strategy}, bank {bank}).")
+        while args.max_jobs is None or done < args.max_jobs:
+            job = work_queue.claim(worker_id)
+            if job is None:
+                if work_queue.is_drained():
+                    break
+                # Remaining jobs are leased by other workers; wait in case one of them dies
+                work_queue.heartbeat(worker_id)
+                time.sleep(args.poll_sec)
+                continue
+
+            label = f"{job['subtopic']} / {job['bloom_level']} / {job['model']}"
+            print(f"\n[{worker_id}] Job {job['id']} (attempt {job['attempts']}): {label}")
+            try:
+                with Heartbeat(work_queue, worker_id, job['id'], work_queue.lease_sec / 3) as beat:
+                    run_id = run_sweep_job(job, args.sweep, strategy, store, budget, progress, lost=beat.lost)
+                if not work_queue.complete(job['id'], worker_id, run_id):
+                    raise LeaseLost(f"lease on job {job['id']} was lost")
+                done += 1
+                print(f"[{worker_id}] Done: {label} (run {run_id})")
+            except LeaseLost:
+                print(f"[{worker_id}] Lease on job {job['id']} was lost; another worker owns it now.")
+            except Exception as e:
+                work_queue.fail(job['id'], worker_id, e)
+                print(f"[{worker_id}] Failed: {label}: {e}")
+
+    if progress:
+        progress.stop()
+    print(f"Worker {worker_id} finished after {done} jobs.")
+
+
+def batch(args, file_config):
+    """
+    Runs the sweep through provider batch APIs. Every claimed job is replayed
+    in passes: each pass answers what it can from downloaded batch results and
+    queues the rest, which are submitted together; the next pass starts when a
+    batch has finished. A job is done once a pass needs no new requests.
+    """
+    settings = dict(BATCH_DEFAULTS, **(file_config.get('batch') or {}))
+    if args.backend:
+        settings['backend'] = args.backend
+    worker_id = args.worker_id or default_worker_id()
+    strategy = file_config.get('strategy', 'separate-prompts')
+    bank = os.path.join(sweep_dir(args), 'banks', f"{slug(worker_id)}.db")
+    state = BatchState(os.path.join(sweep_dir(args), 'batches'), settings)
+    budget = TokenBudget(file_config.get('token_budget'))
+
+    # The local stand-in answers batches from a thread unless it runs as its own process
+    stop_server = threading.Event()
+    if settings['backend'] == 'local' and not args.no_local_server:
+        threading.Thread(target=serve, args=(state.settings['local_dir'], args.local_model, stop_server),
+                         daemon=True).start()
+
+    with open_queue(args, file_config) as work_queue, ResultsStore(bank) as store:
+        work_queue.register_worker(worker_id)
+        jobs = []
+        while args.max_jobs is None or len(jobs) < args.max_jobs:
+            job = work_queue.claim(worker_id)
+            if job is None:
+                break
+            jobs.append(job)
+        print(f"Batch worker {worker_id}: {len(jobs)} jobs (backend {settings['backend']}, bank {bank}).")
+
+        lost = set()
+
+        def renew_leases():
+            for job in jobs:
+                if job['id'] not in lost and not work_queue.heartbeat(worker_id, job['id']):
+                    lost.add(job['id'])
+
+        done, rounds = 0, 0
+        while jobs:
+            rounds += 1
+            waiting = []
+            for job in jobs:
+                label = f"{job['subtopic']} / {job['bloom_level']} / {job['model']}"
+                if job['id'] in lost:
+                    print(f"[{worker_id}] Lease on job {job['id']} was lost; another worker owns it now.")
+                    continue
+                try:
+                    run_id = run_sweep_job(job, args.sweep, strategy, store, budget, batch=state.for_job(job['id']))
+                except BatchPending:
+                    waiting.append(job)
+                    continue
+                except Exception as e:
+                    work_queue.fail(job['id'], worker_id, e)
+                    print(f"[{worker_id}] Failed: {label}: {e}")
+                    continue
+                if work_queue.complete(job['id'], worker_id, run_id):
+                    done += 1
+                    print(f"[{worker_id}] Done: {label} (run {run_id})")
+            jobs = waiting
+            if not jobs:
+                break
+            if rounds >= settings['max_rounds']:
+                for job in jobs:
+                    work_queue.fail(job['id'], worker_id, f"still waiting for batch results after {rounds} passes")
+                break
+
+            state.submit_pending()
+            print(f"Pass {rounds}: {len(jobs)} jobs waiting on {len(state.in_flight())} batches.")
+            if not state.in_flight():
+                raise RuntimeError("Jobs are waiting but no batch is in flight.")
+            state.wait(tick=renew_leases, tick_sec=work_queue.lease_sec / 3)
+
+    stop_server.set()
+    print(f"Batch worker {worker_id} finished: {done} jobs done after {rounds} passes.")
+
+
+def status(args, file_config):
+    with open_queue(args, file_config) as work_queue:
+        progress = work_queue.progress()
+        failures = work_queue.failures()
+    if args.json:
+        print(json.dumps(dict(progress, failures=failures), indent=2))
+        return
+
+    counts = progress['counts']
+    print(f"Sweep {args.sweep}: {counts.get('done', 0)}/{progress['total']} done "
+          f"({progress['percent_done']}%), {counts.get('leased', 0)} running, "
+          f"{counts.get('pending', 0)} pending, {counts.get('failed', 0)} failed; "
+          f"{progress['jobs_per_hour']} jobs/hour overall")
+    print(f"\n{'Worker':<32} {'Host':<16} {'Done':>5} {'Failed':>6} {'Jobs/h':>7} {'Busy %':>6}  {'Alive':<5} Current job")
+    for w in progress['workers']:
+        print(f"{w['worker_id'][:32]:<32} {w['host'][:16]:<16} {w['jobs_done']:>5} {w['jobs_failed']:>6} "
+              f"{w['jobs_per_hour']:>7} {w['busy_pct']:>6.0f}  {'yes' if w['alive'] else 'no':<5} {w['current_job']}")
+    if failures:
+        print("\nRecent errors:")
+        for f in failures:
+            print(f"  job {f['id']} ({f['subtopic']} / {f['bloom_level']} / {f['model']}, "
+                  f"attempt {f['attempts']}): {f['error']}")
+
+
+def merge(args, file_config):
+    banks = sorted(glob.glob(os.path.join(sweep_dir(args), 'banks', '*.db')))
+    with ResultsStore(file_config.get('results_db')) as store:
+        for bank in banks:
+            print(f"Merged {store.merge_from(bank)} items from {os.path.basename(bank)}")
+    print(f"Merged {len(banks)} worker banks into {store.db_path}")
+
+
+def main():
+    file_config = read_config_file()
+    parser = argparse.ArgumentParser(
+        description="Run a subject x subtopic x Bloom level x model sweep with workers on several processes or hosts."
+    )
+    parser.add_argument("--sweep", default="sweep", help="Sweep name (results folder and queue directory).")
+    parser.add_argument("--queue", help="Queue database path (defaults to data/sweeps/<sweep>/queue.db). "
+                                        "Put it on a filesystem every worker can reach.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_enqueue = sub.add_parser("enqueue", help="Add the sweep's jobs to the queue.")
+    p_enqueue.add_argument("--subject")
+    p_enqueue.add_argument("--mapping", help="CSV with cur_topic,cur_subtopic (defaults to the subject's mapping.csv).")
+    p_enqueue.add_argument("--models", help="Comma-separated models (defaults to config 'sweep_models', then 'model').")
+    p_enqueue.add_argument("--bloom-levels", help="Comma-separated Bloom levels (defaults to all six).")
+    p_enqueue.add_argument("--retry-failed", action="store_true", help="Also re-queue jobs that failed.")
+
+    p_work = sub.add_parser("work", help="Pull and run jobs until the queue is drained.")
+    p_work.add_argument("--worker-id", help="Defaults to <hostname>-<pid>.")
+    p_work.add_argument("--max-jobs", type=int)
+    p_work.add_argument("--poll-sec", type=float, default=10)
+
+    p_status = sub.add_parser("status", help="Show sweep progress and per-worker throughput.")
+    p_status.add_argument("--json", action="store_true")
+
+    p_batch = sub.add_parser("batch", help="Run the queued jobs through provider batch APIs (cheaper, not interactive).")
+    p_batch.add_argument("--worker-id", help="Defaults to <hostname>-<pid>.")
+    p_batch.add_argument("--max-jobs", type=int)
+    p_batch.add_argument("--backend", choices=["auto", "openai", "anthropic", "local"],
+                         help="Defaults to config batch.backend ('auto': by provider).")
+    p_batch.add_argument("--local-model", help="With --backend local: answer every request with this model (e.g. llama3).")
+    p_batch.add_argument("--no-local-server", action="store_true",
+                         help="With --backend local: don't answer batches in-process (run `python -m src.batch_api` instead).")
+
+    sub.add_parser("merge", help="Merge every worker's question bank into results_db.")
+
+    args = parser.parse_args()
+    {"enqueue": enqueue, "work": work, "batch": batch, "status": status, "merge": merge}[args.command](args, file_config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import re
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.config_loader import load_config, read_config_file
+from src.data_loader import load_json_safe_from_base, load_json_safe_from_subject, DATA_DIR
+from src.prompt_builder import build_prompt
+from src.llm_api_client import call_llm_api
+from src.output_processor import parse_and_save_response, iter_qna_items
+from src.results_store import ResultsStore, new_run_id
+from src.cost_report import generate_report, BLOOM_ORDER
+
+
+def model_slug(model_name):
+    """Filesystem-safe folder name for a model (e.g. 'models/gemini-2.5-flash' -> 'gemini-2.5-flash')."""
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', model_name.split('/')[-1])
+
+
+def run_job(model_name, bloom_level, base_params, sources, comparison_dir, store, semaphores, default_limit):
+    """
+    Generates one model x Bloom level output, written to
+    <comparison_dir>/<model>/<bloom_level>/{output.json, token_log.csv}.
+    """
+    config = load_config(model_name)
+    params = dict(base_params, bloom_level=bloom_level)
+    job_dir = os.path.join(comparison_dir, model_slug(config['model']), bloom_level)
+    os.makedirs(job_dir, exist_ok=True)
+
+    prompt = build_prompt(params, *sources)
+    semaphore = semaphores.setdefault(config['provider'], threading.Semaphore(default_limit))
+    with semaphore:
+        response = call_llm_api(prompt, config, params, log_file=os.path.join(job_dir, 'token_log.csv'))
+
+    data = parse_and_save_response(response, os.path.join(job_dir, 'output.json'))
+    run_id = new_run_id(f"compare-{model_slug(config['model'])}")
+    store.start_run(run_id, params, config['model'], 'single-prompt', os.path.relpath(job_dir, DATA_DIR))
+    store.set_raw_output(run_id, data)
+    for level, qna in iter_qna_items(data, [bloom_level]):
+        store.add_item(run_id, params, config['model'], level or bloom_level, qna)
+    return model_name, bloom_level
+
+
+def main():
+    file_config = read_config_file()
+    parser = argparse.ArgumentParser(
+        description="Run the same parameters against several models concurrently and build a cost/speed report."
+    )
+    parser.add_argument("--models", help="Comma-separated model names (defaults to config 'comparison_models').")
+    parser.add_argument("--bloom-levels", help="Comma-separated Bloom levels (defaults to all six).")
+    parser.add_argument("--output-folder",
+                        help="Folder under results/ (defaults to a new model-comparison-<timestamp> folder).")
+    parser.add_argument("--max-workers", type=int, default=file_config.get("comparison_max_workers", 8))
+    parser.add_argument("--report-only", action="store_true", help="Only rebuild the report from existing logs.")
+    args = parser.parse_args()
+
+    if args.report_only and not args.output_folder:
+        parser.error("--report-only needs the --output-folder of an earlier comparison")
+    output_folder = args.output_folder or f"model-comparison-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}"
+
+    params = load_json_safe_from_base('parameters.json')
+    subject = params.get('subject', 'general').lower()
+    comparison_dir = os.path.join(DATA_DIR, subject, 'results', output_folder)
+    # A new comparison must not overwrite the report of an earlier one
+    if not args.report_only and os.path.exists(os.path.join(comparison_dir, "model_token_costs.csv")):
+        parser.error(f"{comparison_dir} already holds a report; choose another --output-folder "
+                     "or rebuild it with --report-only")
+    os.makedirs(comparison_dir, exist_ok=True)
+
+    if not args.report_only:
+        models = [m.strip() for m in (args.models or ",".join(file_config.get("comparison_models", []))).split(",") if m.strip()]
+        if not models:
+            parser.error("no models given: use --models or set 'comparison_models' in config.json")
+        bloom_levels = [b.strip() for b in (args.bloom_levels or ",".join(BLOOM_ORDER)).split(",") if b.strip()]
+
+        sources = (
+            load_json_safe_from_subject(subject, 'book.json'),
+            load_json_safe_from_subject(subject, 'curriculum.json'),
+            load_json_safe_from_subject(subject, 'examples.json'),
+            load_json_safe_from_subject(subject, 'rubrics.json'),
+        )
+        # Per-provider limits keep one provider's rate limit from stalling the others
+        default_limit = file_config.get("provider_concurrency_default", 4)
+        semaphores = {
+            provider: threading.Semaphore(limit)
+            for provider, limit in file_config.get("provider_concurrency", {}).items()
+        }
+
+        print(f"Comparing {len(models)} models x {len(bloom_levels)} Bloom levels -> {comparison_dir}")
+        with ResultsStore(file_config.get('results_db')) as store, \
+                ThreadPoolExecutor(max_workers=args.max_workers) as pool:
+            futures = {
+                pool.submit(run_job, model, level, params, sources, comparison_dir, store, semaphores, default_limit): (model, level)
+                for model in models for level in bloom_levels
+            }
+            for future in as_completed(futures):
+                model, level = futures[future]
+                try:
+                    future.result()
+                    print(f"  Done: {model} / {level}")
+                except Exception as e:
+                    print(f"  Failed: {model} / {level}: {e}")
+
+    generate_report(comparison_dir, file_config.get("prices", {}))
+
+
+if __name__ == "__main__":
+    main()
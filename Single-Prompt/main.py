@@ -1,12 +1,14 @@
+# Entry point script: runs the Single-Prompt strategy of the shared pipeline (Separate-Prompts/src)
 import os
-from src.config_loader import load_config
-from src.data_loader import load_json_safe_from_base, load_json_safe_from_subject, DATA_DIR
-from src.prompt_builder import build_prompt
-from src.llm_api_client import call_llm_api
-from src.output_processor import parse_and_save_response
 
+from src.config_loader import load_config
+from src.data_loader import load_json_safe_from_base, DATA_DIR
+from src.results_store import ResultsStore
+from src import shared  # noqa: F401  (registers separate_prompts_src)
+from separate_prompts_src.pipeline import build_pipeline
+from separate_prompts_src.strategies import STRATEGIES, prepare_job
+from separate_prompts_src.token_budget import TokenBudget
 
-# token_logger is imported within llm_api_client implicitly, no direct import needed here
 
 def main():
     print("Starting content generation process...")
@@ -15,48 +17,23 @@ def main():
     params = load_json_safe_from_base('parameters.json')
     config = load_config()
 
-    subject = params.get('subject', 'general').lower()
-    custom_output_folder = params.get('output_folder', 'default')
-
-    # Create output directory
-    subject_dir = os.path.join(DATA_DIR, subject)  # DATA_DIR from data_loader
-    output_folder_path = os.path.join(subject_dir, 'results', custom_output_folder)
-    os.makedirs(output_folder_path, exist_ok=True)
-    log_file_path = os.path.join(output_folder_path, 'token_log.csv')
-
-    print(f"Subject: {subject}, Output Folder: {output_folder_path}")
-
-    # 2. Load all data sources
-    print("Loading data files...")
-    textbook_data = load_json_safe_from_subject(subject, 'book.json')
-    curriculum_data = load_json_safe_from_subject(subject, 'curriculum.json')
-    examples_data = load_json_safe_from_subject(subject, 'examples.json')
-    rubric_data = load_json_safe_from_subject(subject, 'rubrics.json')
-    print("Data files loaded.")
-
-    # 3. Build the prompt
-    print("Building prompt for the LLM...")
-    prompt = build_prompt(params, textbook_data, curriculum_data, examples_data, rubric_data)
-    # print(f"Generated prompt (first 500 chars):\n{prompt[:500]}...") # For debugging
-
-    # 4. Call the LLM API
-    print(f"Calling LLM: {config.get('model')}...")
-    try:
-        response = call_llm_api(prompt, config, params, log_file=log_file_path)
-        print("LLM call successful.")
-    except Exception as e:
-        print(f"An error occurred during the LLM API call: {e}")
-        return  # Exit if API call fails
-
-    # 5. Parse and save the response
-    output_file = os.path.join(output_folder_path, 'output.json')
-    try:
-        parse_and_save_response(response, output_file)
-        print(f"Process completed successfully. Output saved to {output_file}")
-    except Exception as e:
-        print(f"An error occurred during parsing and saving the response: {e}")
+    # 2. One call for every Bloom level; results stay under this tree's data/<subject>/results/
+    with ResultsStore(config.get('results_db')) as store:
+        job = prepare_job(params, config, store, 'single-prompt', data_dir=DATA_DIR)
+        print(f"Subject: {job['subject']}, Output Folder: {job['output_folder_path']}")
+
+        pipeline = build_pipeline(STRATEGIES['single-prompt'], config)
+        ctx = {"config": config, "store": store, "token_budget": TokenBudget(config.get('token_budget'))}
+        results = pipeline.run([job], ctx)
+        pipeline.print_summary()
+
+        # 3. output.json is the model's output, as stored with the run
+        output_file = os.path.join(job['output_folder_path'], 'output.json')
+        store.export_output_json(job['run_id'], output_file)
+
+    print(f"Stored {len(results)} Q&As in the question bank (run {job['run_id']}).")
+    print(f"Process completed successfully. Output saved to {output_file}")
 
 
 if __name__ == "__main__":
     main()
-# Entry point script
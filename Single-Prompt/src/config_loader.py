@@ -3,9 +3,41 @@ import json
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def load_config():
+def read_config_file():
+    """
+    Reads config.json (allowing // and # comments) and returns it as a dict.
+    Returns an empty dict if the file does not exist.
+    """
+    file_path = os.path.join(PROJECT_ROOT, "config.json")
+    if not os.path.exists(file_path):
+        return {}
+
+    cleaned_lines = []
+    with open(file_path, 'r') as f:
+        for line in f:
+            stripped_line = line.strip()
+            if stripped_line.startswith('//') or stripped_line.startswith('#'):
+                continue
+            if '//' in stripped_line:
+                stripped_line = stripped_line.split('//')[0]
+            if '#' in stripped_line:
+                stripped_line = stripped_line.split('#')[0]
+            cleaned_lines.append(stripped_line)
+
+    cleaned_json_string = "\n".join(cleaned_lines)
+
+    try:
+        return json.loads(cleaned_json_string)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing config.json after comment stripping: {e}")
+        print("Problematic content:\n", cleaned_json_string)
+        raise
+
+
+def load_config(model_name=None):
     """
     Load model config and determine the correct API key based on provider prefix.
+    If model_name is given it overrides the model set in config.json.
     """
     # Load environment variables
     mistral_api_key_env = os.getenv("MISTRAL_API_KEY")
@@ -13,34 +45,11 @@ def load_config():
     gemini_api_key_env = os.getenv("GEMINI_API_KEY")
     claude_api_key_env = os.getenv("ANTHROPIC_API_KEY")
 
-    config = {}
-    file_path = os.path.join(PROJECT_ROOT, "config.json")
-
-    config_from_file = {}
-    if os.path.exists(file_path):
-        cleaned_lines = []
-        with open(file_path, 'r') as f:
-            for line in f:
-                stripped_line = line.strip()
-                if stripped_line.startswith('//') or stripped_line.startswith('#'):
-                    continue
-                if '//' in stripped_line:
-                    stripped_line = stripped_line.split('//')[0]
-                if '#' in stripped_line:
-                    stripped_line = stripped_line.split('#')[0]
-                cleaned_lines.append(stripped_line)
-
-        cleaned_json_string = "\n".join(cleaned_lines)
-
-        try:
-            config_from_file = json.loads(cleaned_json_string)
-            config['model'] = config_from_file.get('model')
-        except json.JSONDecodeError as e:
-            print(f"Error parsing config.json after comment stripping: {e}")
-            print("Problematic content:\n", cleaned_json_string)
-            raise
+    config_from_file = read_config_file()
+    # Carry through pipeline settings; API keys are resolved below
+    config = {k: v for k, v in config_from_file.items() if not k.endswith('_api_key')}
 
-    model_name = config.get('model', config_from_file.get('model', '')).lower()
+    model_name = (model_name or config.get('model') or '').lower()
 
     # Determine provider from model prefix
     if model_name.startswith("mistral"):
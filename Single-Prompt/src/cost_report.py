@@ -0,0 +1,178 @@
+# Builds the model cost/speed comparison table and charts from logged token usage
+
+import os
+import csv
+import glob
+import argparse
+from collections import defaultdict
+
+from . import shared  # noqa: F401  (registers separate_prompts_src)
+from separate_prompts_src.pricing import call_costs
+
+BLOOM_ORDER = ["Remembering", "Understanding", "Applying", "Analyzing", "Evaluating", "Creating"]
+
+COST_FIELDS = [
+    "model", "prompt_tokens", "completion_tokens", "total_tokens", "duration_sec",
+    "bloom_level", "num_questions", "_Input Cost ($)", "Output Cost ($)", "Total Cost ($)"
+]
+
+
+def read_token_logs(results_dir):
+    """Reads every token_log.csv below results_dir into a list of rows."""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(results_dir, '**', 'token_log.csv'), recursive=True)):
+        with open(path, newline='') as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+
+def build_cost_rows(log_rows, prices):
+    """
+    Converts token log rows into rows of model_token_costs.csv.
+    Models without a configured price get empty cost columns.
+    """
+    cost_rows = []
+    for row in log_rows:
+        model = row.get("model", "")
+        prompt_tokens = int(float(row.get("prompt_tokens") or 0))
+        completion_tokens = int(float(row.get("completion_tokens") or 0))
+        split = call_costs(model, prompt_tokens, completion_tokens, prices)
+        if split:
+            input_cost, output_cost = split
+            costs = [round(input_cost, 4), round(output_cost, 4), round(input_cost + output_cost, 4)]
+        else:
+            costs = ["", "", ""]
+        cost_rows.append(dict(zip(COST_FIELDS, [
+            model,
+            prompt_tokens,
+            completion_tokens,
+            int(float(row.get("total_tokens") or 0)),
+            float(row.get("duration_sec") or 0),
+            row.get("bloom_level", ""),
+            row.get("num_questions", ""),
+            *costs,
+        ])))
+    return cost_rows
+
+
+def summarize(cost_rows):
+    """
+    Aggregates cost rows per model: calls, mean/p95 latency, mean total tokens,
+    total cost, and mean total tokens per Bloom level.
+    """
+    by_model = defaultdict(list)
+    for row in cost_rows:
+        by_model[row["model"]].append(row)
+
+    summary = {}
+    for model, rows in by_model.items():
+        durations = sorted(r["duration_sec"] for r in rows)
+        per_level = defaultdict(list)
+        for r in rows:
+            per_level[r["bloom_level"]].append(r["total_tokens"])
+        costs = [r["Total Cost ($)"] for r in rows if r["Total Cost ($)"] != ""]
+        summary[model] = {
+            "calls": len(rows),
+            "mean_duration_sec": sum(durations) / len(durations),
+            "p95_duration_sec": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+            "mean_total_tokens": sum(r["total_tokens"] for r in rows) / len(rows),
+            "total_cost": round(sum(costs), 4) if costs else None,
+            "tokens_per_bloom_level": {lvl: sum(v) / len(v) for lvl, v in per_level.items()},
+        }
+    return summary
+
+
+def write_cost_csv(cost_rows, output_file):
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COST_FIELDS)
+        writer.writeheader()
+        writer.writerows(cost_rows)
+
+
+def plot_charts(summary, output_dir):
+    """
+    Writes 'Price and Speed.png' and 'Average_Total_Tokens_per_Bloom_Level.png'.
+    Requires matplotlib; skipped with a message if it is not installed.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib not installed — skipping charts.")
+        return []
+
+    written = []
+    models = sorted(summary)
+
+    priced = [m for m in models if summary[m]["total_cost"] is not None]
+    if priced:
+        fig, ax = plt.subplots(figsize=(9, 6))
+        for m in priced:
+            ax.scatter(summary[m]["mean_duration_sec"], summary[m]["total_cost"], s=80)
+            ax.annotate(m, (summary[m]["mean_duration_sec"], summary[m]["total_cost"]),
+                        textcoords="offset points", xytext=(5, 5), fontsize=8)
+        ax.set_xlabel("Mean duration per call (s)")
+        ax.set_ylabel("Total cost ($)")
+        ax.set_title("Price and Speed")
+        ax.grid(True, alpha=0.3)
+        path = os.path.join(output_dir, "Price and Speed.png")
+        fig.tight_layout()
+        fig.savefig(path, dpi=150)
+        plt.close(fig)
+        written.append(path)
+
+    levels = [lvl for lvl in BLOOM_ORDER if any(lvl in summary[m]["tokens_per_bloom_level"] for m in models)]
+    levels += sorted({lvl for m in models for lvl in summary[m]["tokens_per_bloom_level"]} - set(levels))
+    if levels:
+        fig, ax = plt.subplots(figsize=(11, 6))
+        width = 0.8 / max(len(models), 1)
+        for i, m in enumerate(models):
+            values = [summary[m]["tokens_per_bloom_level"].get(lvl, 0) for lvl in levels]
+            ax.bar([x + i * width for x in range(len(levels))], values, width=width, label=m)
+        ax.set_xticks([x + width * (len(models) - 1) / 2 for x in range(len(levels))])
+        ax.set_xticklabels(levels)
+        ax.set_ylabel("Average total tokens")
+        ax.set_title("Average Total Tokens per Bloom Level")
+        ax.legend(fontsize=8)
+        path = os.path.join(output_dir, "Average_Total_Tokens_per_Bloom_Level.png")
+        fig.tight_layout()
+        fig.savefig(path, dpi=150)
+        plt.close(fig)
+        written.append(path)
+    return written
+
+
+def generate_report(results_dir, prices, output_dir=None):
+    """
+    Reads all token logs below results_dir and writes model_token_costs.csv
+    plus charts into output_dir (defaults to results_dir). Returns the summary.
+    """
+    output_dir = output_dir or results_dir
+    os.makedirs(output_dir, exist_ok=True)
+    cost_rows = build_cost_rows(read_token_logs(results_dir), prices)
+    if not cost_rows:
+        print(f"No token logs found under {results_dir}.")
+        return {}
+
+    write_cost_csv(cost_rows, os.path.join(output_dir, "model_token_costs.csv"))
+    summary = summarize(cost_rows)
+    plot_charts(summary, output_dir)
+
+    print(f"{'Model':<32} {'Calls':>5} {'Mean s':>8} {'p95 s':>8} {'Tokens':>8} {'Cost $':>8}")
+    for model in sorted(summary, key=lambda m: summary[m]["mean_duration_sec"]):
+        s = summary[model]
+        cost = f"{s['total_cost']:.4f}" if s["total_cost"] is not None else "n/a"
+        print(f"{model:<32} {s['calls']:>5} {s['mean_duration_sec']:>8.2f} {s['p95_duration_sec']:>8.2f} "
+              f"{s['mean_total_tokens']:>8.0f} {cost:>8}")
+    return summary
+
+
+if __name__ == '__main__':
+    from .config_loader import read_config_file
+
+    parser = argparse.ArgumentParser(description="Build the model cost/speed report from token logs.")
+    parser.add_argument("results_dir", help="Folder containing per-model token_log.csv files.")
+    parser.add_argument("--out", help="Where to write the CSV and charts (defaults to results_dir).")
+    args = parser.parse_args()
+    generate_report(args.results_dir, read_config_file().get("prices", {}), args.out)
@@ -10,14 +10,14 @@ import anthropic
 # Relative import assumes this file is part of a package
 from .token_logger import log_token_usage
 
-def call_mistral_api(prompt, api_key, params_data, log_file=None):
+def call_mistral_api(prompt, api_key, model_name, params_data, log_file=None):
     url = "https://api.mistral.ai/v1/chat/completions"
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}"
     }
     data = {
-        "model": "mistral-large-latest",
+        "model": model_name,
         "messages": [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
@@ -43,7 +43,7 @@ def call_mistral_api(prompt, api_key, params_data, log_file=None):
     total_tokens = usage.get("total_tokens", 0)
 
     if log_file:
-        log_token_usage("mistral-large-latest", prompt_tokens, completion_tokens, total_tokens, duration, params_data, log_file)
+        log_token_usage(model_name, prompt_tokens, completion_tokens, total_tokens, duration, params_data, log_file)
 
     return result
 
@@ -212,7 +212,7 @@ def call_llm_api(prompt, config, params_data, log_file=None):
     if "claude" in model_name:
         return call_claude_api(prompt, api_key, model_name, params_data, log_file=log_file)
     elif "mistral" in model_name:
-        return call_mistral_api(prompt, api_key, params_data, log_file=log_file)
+        return call_mistral_api(prompt, api_key, model_name, params_data, log_file=log_file)
     elif "gpt" in model_name or model_name.startswith("o"):
         return call_openai_api(prompt, api_key, model_name, params_data, log_file=log_file)
     elif "gemini" in model_name:
@@ -1,6 +1,10 @@
 import json
 import re
 
+from . import shared  # noqa: F401  (registers separate_prompts_src)
+# Walks a parsed output for its Q&As; shared with Separate-Prompts and the question bank
+from separate_prompts_src.output_processor import iter_qna_items  # noqa: F401
+
 def basic_json_cleanup(bad_json):
     """
     Fix common JSON mistakes:
@@ -61,3 +65,4 @@ def parse_and_save_response(response_json, output_file):
         json.dump(data, f, indent=2)
 
     print(f" Q&As and rubrics saved to {output_file}")
+    return data
@@ -0,0 +1,18 @@
+# The question bank is shared with Separate-Prompts: this re-exports its results_store
+# module, so both pipelines write one database (Separate-Prompts/data/question_bank.db
+# unless config 'results_db' says otherwise) with one schema.
+
+from . import shared  # noqa: F401  (registers separate_prompts_src)
+from separate_prompts_src.results_store import (
+    DEFAULT_DB_PATH,
+    SCHEMA,
+    KEY_FIELDS,
+    ResultsStore,
+    new_run_id,
+    main,
+)
+
+
+if __name__ == '__main__':
+    # Same CLI as Separate-Prompts: python -m src.results_store search/export/index/columnar
+    main()
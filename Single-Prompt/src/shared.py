@@ -0,0 +1,24 @@
+# Access to modules shared with Separate-Prompts (question bank, pricing), so they live in one place
+
+import os
+import sys
+import importlib.util
+
+SHARED_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Separate-Prompts', 'src')
+# Both trees name their package "src", so the shared one is loaded under its own name
+SHARED_PACKAGE = "separate_prompts_src"
+
+
+def load_shared_package():
+    """Imports Separate-Prompts/src as the package separate_prompts_src (once)."""
+    if SHARED_PACKAGE not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            SHARED_PACKAGE, os.path.join(SHARED_SRC, '__init__.py'), submodule_search_locations=[SHARED_SRC]
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[SHARED_PACKAGE] = package
+        spec.loader.exec_module(package)
+    return sys.modules[SHARED_PACKAGE]
+
+
+load_shared_package()